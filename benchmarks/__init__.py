@@ -0,0 +1 @@
+'''Benchmarks for cartouche, run from the root of the source tree.'''
@@ -0,0 +1,7 @@
+import sys
+
+from .suite import main
+
+__author__ = 'Robert Smallshire'
+
+sys.exit(main())
@@ -0,0 +1,159 @@
+'''Docstrings on which to run the benchmarks.
+
+Each corpus is a list of docstrings, and each docstring is a list of lines
+prepared as autodoc prepares them, with the common indent removed and a
+terminal blank line, so that cartouche and napoleon receive the same input.
+'''
+
+import ast
+import inspect
+import os
+
+from cartouche.parser import CartoucheSyntaxError, parse_cartouche_text
+
+__author__ = 'Robert Smallshire'
+
+COMMENT_TESTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             'cartouche', 'test', 'test_comments.py')
+
+
+def prepare(text):
+    '''Split a docstring into lines in the way autodoc does.'''
+    return inspect.cleandoc(text).splitlines() + ['']
+
+
+def comment_docstrings():
+    '''The docstrings used as source in the cartouche test suite.
+
+    Only those docstrings which the default parser accepts are included.
+    '''
+    with open(COMMENT_TESTS, encoding='utf-8') as test_file:
+        module = ast.parse(test_file.read(), COMMENT_TESTS)
+    docstrings = []
+    for node in ast.walk(module):
+        if not isinstance(node, ast.Assign):
+            continue
+        if not any(isinstance(target, ast.Name) and target.id == 'source'
+                   for target in node.targets):
+            continue
+        if not (isinstance(node.value, ast.Constant) and isinstance(node.value.value, str)):
+            continue
+        lines = prepare(node.value.value)
+        try:
+            parse_cartouche_text(lines)
+        except CartoucheSyntaxError:
+            continue
+        docstrings.append(lines)
+    return docstrings
+
+
+def synthetic_docstring(num_args):
+    '''A docstring with a summary, num_args arguments, a return and raises.'''
+    lines = ["Summarise the function.",
+             "",
+             "    A longer description of what the function does, which runs",
+             "    to a second line.",
+             "",
+             "    Args:"]
+    for i in range(num_args):
+        lines.append("        arg{i} (int): The argument number {i}, which has a".format(i=i))
+        lines.append("            description running onto a second line.")
+    lines.extend(["",
+                  "    Returns:",
+                  "        The result of the function.",
+                  "",
+                  "    Raises:",
+                  "        ValueError: If any argument is out of range.",
+                  ""])
+    return lines
+
+
+def nested_docstring(depth):
+    '''A docstring with a description nested depth levels deep, and a
+    few arguments, each with a nested description.'''
+    lines = ["Summarise the function.", ""]
+    for level in range(depth):
+        indent = ' ' * (4 * level)
+        lines.extend([indent + "A paragraph nested at level {level}, which runs".format(level=level),
+                      indent + "to a second line.",
+                      ""])
+    lines.append("Args:")
+    for i in range(4):
+        lines.append("    arg{i} (int): The argument number {i}.".format(i=i))
+        for level in range(depth):
+            indent = ' ' * (8 + 4 * level)
+            lines.append(indent + "Detail at level {level}.".format(level=level))
+    lines.extend(["",
+                  "Returns:",
+                  "    The result of the function.",
+                  ""])
+    return lines
+
+
+SECTION_ENTRIES = {
+    'Args': "    arg{i} (int): The argument number {i}.",
+    'Attributes': "    attr{i} (int): The attribute number {i}.",
+    'Raises': "    Error{i}: If condition number {i} holds.",
+    'Returns': "    The result, which is described at length on line {i}.",
+    'Yields': "    The items, which are described at length on line {i}.",
+    'Note': "    A note, which is described at length on line {i}.",
+    'Warning': "    A warning, which is described at length on line {i}.",
+    'Usage': "    result = function({i})",
+}
+
+
+def section_docstring(heading, num_entries=16):
+    '''A docstring with a summary and a single section of num_entries lines.'''
+    lines = ["Summarise the function.", "", heading + ":"]
+    lines.extend(SECTION_ENTRIES[heading].format(i=i) for i in range(num_entries))
+    lines.append("")
+    return lines
+
+
+PLAIN_DOCSTRINGS = [
+    ["Return the number of items in the collection.", ""],
+    ["Close the connection.", ""],
+    ["Create a new widget.",
+     "",
+     "The widget is not displayed until it has been added to a window, at",
+     "which point it takes on the style of that window.",
+     ""],
+    ["Parse the configuration file at the given path.",
+     "",
+     "Settings which appear in more than one section are taken from the last",
+     "section in which they appear. Unknown settings are ignored, although a",
+     "warning is logged for each of them.",
+     "",
+     "Relative paths within the file are interpreted relative to the",
+     "directory containing it.",
+     ""],
+    ["True if the cache holds no entries, otherwise False.", ""],
+    ["The name of the user who created the record.", ""],
+    ["Flush any buffered output to the underlying stream.",
+     "",
+     "This is called automatically when the stream is closed.",
+     ""],
+]
+
+
+def mixed_docstrings(count=100, plain_fraction=0.7):
+    '''A corpus in which plain_fraction of the docstrings have no sections,
+    and the remainder are those of comment_docstrings().'''
+    sectioned = comment_docstrings()
+    num_plain = int(round(count * plain_fraction))
+    docstrings = [PLAIN_DOCSTRINGS[i % len(PLAIN_DOCSTRINGS)] for i in range(num_plain)]
+    docstrings.extend(sectioned[i % len(sectioned)] for i in range(count - num_plain))
+    return docstrings
+
+
+def corpora():
+    '''All of the corpora, as a list of (name, docstrings) pairs.'''
+    result = [('comments', comment_docstrings()),
+              ('mixed', mixed_docstrings())]
+    for num_args in (1, 16, 256):
+        result.append(('args-{0}'.format(num_args), [prepare('\n'.join(synthetic_docstring(num_args)))]))
+    for depth in (2, 8, 32):
+        result.append(('depth-{0}'.format(depth), [nested_docstring(depth)]))
+    for heading in sorted(SECTION_ENTRIES):
+        result.append(('section-{0}'.format(heading.lower()), [section_docstring(heading)]))
+    return result
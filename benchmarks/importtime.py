@@ -0,0 +1,70 @@
+'''Measure the time taken to import cartouche.
+
+Run from the root of the source tree with::
+
+  $ python -m benchmarks.importtime
+
+Each module is imported in a fresh interpreter run with ``-X importtime``,
+several times over, and the fastest total import time is reported together
+with the number of modules imported and the slowest of them. Set
+PYTHONDONTWRITEBYTECODE beforehand to include the cost of compiling the
+source.
+'''
+
+import argparse
+import subprocess
+import sys
+
+__author__ = 'Robert Smallshire'
+
+MODULES = ['cartouche', 'cartouche.parser', 'cartouche.cli', 'cartouche.sphinxext']
+
+
+def import_times(module):
+    '''Import a module in a fresh interpreter.
+
+    Returns:
+        A list of (self_microseconds, cumulative_microseconds, name) tuples,
+        one for each module imported, excluding those imported by the
+        interpreter at startup.
+    '''
+    baseline = set(name for _, _, name in _run('pass'))
+    return [entry for entry in _run('import ' + module) if entry[2] not in baseline]
+
+
+def _run(statement):
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                             stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    entries = []
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        try:
+            entries.append((int(fields[0]), int(fields[1]), fields[2].strip()))
+        except ValueError:
+            continue  # The header line
+    return entries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.importtime',
+                                     description="Measure the import time of cartouche.")
+    parser.add_argument('modules', nargs='*', default=MODULES, metavar='MODULE',
+                        help="The modules to import.")
+    parser.add_argument('--repeat', type=int, default=5, help="The number of repeats.")
+    parser.add_argument('--slowest', type=int, default=5,
+                        help="The number of slowest modules to list.")
+    args = parser.parse_args(argv)
+
+    for module in args.modules:
+        runs = [import_times(module) for _ in range(args.repeat)]
+        best = min(runs, key=lambda entries: sum(entry[0] for entry in entries))
+        total = sum(entry[0] for entry in best)
+        print("{0:<24} {1:>8.1f} ms {2:>5} modules".format(module, total / 1000, len(best)))
+        for self_time, _, name in sorted(best, reverse=True)[:args.slowest]:
+            print("    {0:<40} {1:>8.1f} ms".format(name, self_time / 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+'''Compare the memory used by the Node object graph with that of the Arena.
+
+Run from the root of the source tree with::
+
+  $ python -m benchmarks.memory
+
+For docstrings of increasing size this reports, for each representation, the
+peak memory traced while grouping paragraphs into a parse tree, and the memory
+retained by the converted syntax tree.
+'''
+
+import tracemalloc
+
+from cartouche.parser import (iter_paragraphs, group_paragraphs,
+                              group_paragraphs_in_arena, convert_arena)
+
+from .corpus import synthetic_docstring
+
+__author__ = 'Robert Smallshire'
+
+
+def traced(function, *args):
+    '''Call a function, returning its result with the peak and retained
+    memory in bytes which it allocated.'''
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        result = function(*args)
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, peak - before, retained - before
+
+
+def converted_arena(paragraphs):
+    arena = group_paragraphs_in_arena(paragraphs)
+    convert_arena(arena)
+    return arena
+
+
+def main():
+    row = "{:>6} {:>6} | {:>12} {:>12} | {:>12} {:>12}"
+    header = row.format('args', 'lines', 'graph peak', 'arena peak',
+                        'graph kept', 'arena kept')
+    print("Bytes per docstring. Peak: grouping the parse tree. "
+          "Kept: the converted syntax tree.")
+    print(header)
+    print('-' * len(header))
+    for num_args in (0, 1, 4, 16, 64, 256):
+        lines = synthetic_docstring(num_args)
+        paragraphs = list(iter_paragraphs(lines))
+        _, graph_peak, _ = traced(group_paragraphs, paragraphs)
+        _, arena_peak, _ = traced(group_paragraphs_in_arena, paragraphs)
+        arena, _, arena_kept = traced(converted_arena, paragraphs)
+        _, _, graph_kept = traced(arena.to_node)
+        print(row.format(num_args, len(lines), graph_peak, arena_peak,
+                         graph_kept, arena_kept))
+
+
+if __name__ == '__main__':
+    main()
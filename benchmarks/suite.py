@@ -0,0 +1,273 @@
+'''Time each stage of the cartouche parser over a set of corpora.
+
+Run from the root of the source tree with::
+
+  $ python -m benchmarks run --output before.json
+  $ git checkout some-other-revision
+  $ python -m benchmarks run --output after.json
+  $ python -m benchmarks compare before.json after.json
+
+Each benchmark times one stage of the pipeline - from unindent() through
+extract_structure() to rendering - or the whole of parse_cartouche_text(),
+over one corpus. Where Sphinx is installed, sphinx.ext.napoleon is timed on
+the same inputs for comparison, as is the time taken by Sphinx to read the
+reStructuredText rendered by cartouche in the default and compact styles. Results are the time per pass over the
+corpus, taken as the minimum and median of several repeats, each of enough
+loops to be measured reliably. Results are only comparable when run on the
+same machine.
+'''
+
+import argparse
+import atexit
+import json
+import platform
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from cartouche.nodes import RstRenderer, ensure_terminal_blank
+from cartouche.parser import (CartoucheParser, parse_cartouche_text, unindent, pad_blank_lines,
+                              first_paragraph_indent, gather_lines,
+                              iter_paragraphs, group_paragraphs_in_arena,
+                              extract_structure)
+from cartouche.version import __version__
+
+from .corpus import corpora
+
+__author__ = 'Robert Smallshire'
+
+
+def render(arena):
+    result = []
+    RstRenderer(result).render(arena)
+    ensure_terminal_blank(result)
+    return result
+
+
+def parse_without_prescan(lines):
+    '''Parse a docstring through every stage, even if it has no sections.'''
+    return render(extract_structure(group_paragraphs_in_arena(iter_paragraphs(lines))))
+
+
+def napoleon_parser():
+    '''A function which converts lines with napoleon, or None if Sphinx is
+    not installed.'''
+    try:
+        from sphinx.ext.napoleon import Config
+        from sphinx.ext.napoleon.docstring import GoogleDocstring
+    except ImportError:
+        return None
+    config = Config(napoleon_use_param=True, napoleon_use_rtype=True)
+    return lambda lines: GoogleDocstring(lines, config).lines()
+
+
+def sphinx_reader():
+    '''A function which reads rendered lines with Sphinx, as the body of a
+    function description, or None if Sphinx is not installed.
+
+    The docutils parse and the Sphinx transforms, including the
+    transformation of :param: and :type: fields, are included in the time.
+    '''
+    try:
+        from sphinx.application import Sphinx
+        from sphinx.testing.restructuredtext import parse
+    except ImportError:
+        return None
+    directory = tempfile.mkdtemp()
+    atexit.register(shutil.rmtree, directory, True)
+    app = Sphinx(directory, None, directory + '/_build', directory + '/_doctrees', 'dummy',
+                 status=None, warning=None)
+    heading = '.. py:function:: f(*args, **kwargs)\n   :noindex:\n\n'
+    return lambda lines: parse(app, heading + '\n'.join('   ' + line for line in lines))
+
+
+class Stage(object):
+    '''One step of the pipeline to be timed.
+
+    Args:
+        name: The name of the stage.
+
+        prepare: A function which, given a docstring, returns the input to
+            the stage by running the preceding stages.
+
+        run: The function to be timed, which is given the prepared input.
+
+        consumes: True if run modifies its input, so that fresh input must be
+            prepared for every call.
+    '''
+
+    def __init__(self, name, prepare, run, consumes=False):
+        self.name = name
+        self.prepare = prepare
+        self.run = run
+        self.consumes = consumes
+
+
+def stages():
+    '''The stages to be timed, in pipeline order.'''
+    identity = lambda lines: lines
+    result = [
+        Stage('unindent', identity, unindent),
+        Stage('pad_blank_lines', unindent, pad_blank_lines),
+        Stage('first_paragraph_indent',
+              lambda lines: pad_blank_lines(unindent(lines)),
+              first_paragraph_indent),
+        Stage('gather_lines',
+              lambda lines: first_paragraph_indent(pad_blank_lines(unindent(lines))),
+              gather_lines),
+        Stage('iter_paragraphs', identity, lambda lines: list(iter_paragraphs(lines))),
+        Stage('group_paragraphs', lambda lines: list(iter_paragraphs(lines)),
+              group_paragraphs_in_arena),
+        Stage('extract_structure',
+              lambda lines: group_paragraphs_in_arena(iter_paragraphs(lines)),
+              extract_structure, consumes=True),
+        Stage('render_rst',
+              lambda lines: extract_structure(group_paragraphs_in_arena(iter_paragraphs(lines))),
+              render),
+        Stage('parse', identity, parse_cartouche_text),
+        Stage('parse_without_prescan', identity, parse_without_prescan),
+    ]
+    napoleon = napoleon_parser()
+    if napoleon is not None:
+        result.append(Stage('napoleon', identity, napoleon))
+    read = sphinx_reader()
+    if read is not None:
+        compact = CartoucheParser(compact=True)
+        result.append(Stage('sphinx_read', parse_cartouche_text, read))
+        result.append(Stage('sphinx_read_compact', compact.parse, read))
+    return result
+
+
+def time_pass(stage, docstrings, loops):
+    '''Time loops passes of a stage over a corpus, returning seconds.'''
+    if stage.consumes:
+        inputs = [[stage.prepare(lines) for lines in docstrings] for _ in range(loops)]
+    else:
+        inputs = [[stage.prepare(lines) for lines in docstrings]] * loops
+    run = stage.run
+    start = time.perf_counter()
+    for prepared in inputs:
+        for item in prepared:
+            run(item)
+    return time.perf_counter() - start
+
+
+def measure(stage, docstrings, repeat=7, min_time=0.02):
+    '''Measure the time of one pass of a stage over a corpus.
+
+    The number of loops is doubled until a repeat takes at least min_time
+    seconds.
+
+    Returns:
+        A dictionary containing the 'min' and 'median' time per pass in
+        seconds, and the number of 'loops' per repeat.
+    '''
+    loops = 1
+    while time_pass(stage, docstrings, loops) < min_time:
+        loops *= 2
+    timings = [time_pass(stage, docstrings, loops) / loops for _ in range(repeat)]
+    return dict(min=min(timings), median=statistics.median(timings), loops=loops)
+
+
+def run(pattern=None, repeat=7, min_time=0.02, out=sys.stdout):
+    '''Run the benchmarks with names matching a regular expression.
+
+    Returns:
+        A dictionary of results suitable for serialising as JSON.
+    '''
+    results = {}
+    for corpus_name, docstrings in corpora():
+        for stage in stages():
+            name = '{0}/{1}'.format(stage.name, corpus_name)
+            if pattern is not None and not re.search(pattern, name):
+                continue
+            result = measure(stage, docstrings, repeat, min_time)
+            results[name] = result
+            print("{0:<40} {1:>12} {2:>12}".format(
+                name, format_time(result['min']), format_time(result['median'])),
+                file=out)
+            out.flush()
+    return dict(meta=metadata(), results=results)
+
+
+def metadata():
+    return dict(cartouche=__version__,
+                python=platform.python_version(),
+                implementation=platform.python_implementation(),
+                machine=platform.machine(),
+                node=platform.node(),
+                time=time.strftime('%Y-%m-%dT%H:%M:%S'))
+
+
+def format_time(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return '{0:.2f} {1}'.format(seconds / scale, unit)
+    return '{0:.0f} ns'.format(seconds / 1e-9)
+
+
+def compare(baseline, candidate, threshold=0.1, out=sys.stdout):
+    '''Print the change in minimum time of each benchmark in both runs.
+
+    Returns:
+        The number of benchmarks which slowed down by more than the threshold
+        fraction.
+    '''
+    regressions = 0
+    for name in sorted(set(baseline['results']) & set(candidate['results'])):
+        before = baseline['results'][name]['min']
+        after = candidate['results'][name]['min']
+        ratio = after / before
+        if ratio > 1 + threshold:
+            verdict = 'slower'
+            regressions += 1
+        elif ratio < 1 - threshold:
+            verdict = 'faster'
+        else:
+            verdict = ''
+        print("{0:<40} {1:>12} {2:>12} {3:>7.2f}x {4}".format(
+            name, format_time(before), format_time(after), ratio, verdict), file=out)
+    for name in sorted(set(baseline['results']) ^ set(candidate['results'])):
+        print("{0:<40} only in one run".format(name), file=out)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description="Benchmark the cartouche parser.")
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    run_parser = commands.add_parser('run', help="Run the benchmarks.")
+    run_parser.add_argument('-o', '--output', help="Write the results as JSON to this file.")
+    run_parser.add_argument('-k', '--pattern', help="Only run benchmarks matching this regular expression.")
+    run_parser.add_argument('--repeat', type=int, default=7, help="The number of repeats.")
+    run_parser.add_argument('--min-time', type=float, default=0.02,
+                            help="The minimum duration in seconds of each repeat.")
+
+    compare_parser = commands.add_parser('compare', help="Compare two sets of results.")
+    compare_parser.add_argument('baseline', help="The JSON results of the earlier run.")
+    compare_parser.add_argument('candidate', help="The JSON results of the later run.")
+    compare_parser.add_argument('--threshold', type=float, default=0.1,
+                                help="The fractional change regarded as significant.")
+
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        results = run(args.pattern, args.repeat, args.min_time)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as output:
+                json.dump(results, output, indent=2, sort_keys=True)
+        return 0
+
+    with open(args.baseline, encoding='utf-8') as baseline_file:
+        baseline = json.load(baseline_file)
+    with open(args.candidate, encoding='utf-8') as candidate_file:
+        candidate = json.load(candidate_file)
+    return 1 if compare(baseline, candidate, args.threshold) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,8 +1,12 @@
-# We only need to expose the setup function to Sphinx
-
-#noinspection PyUnresolvedReferences
-from cartouche.sphinxext import setup
+# We only need to expose the setup function to Sphinx. It is imported lazily
+# so that the parser may be used without the cost of importing Sphinx.
 
 #noinspection PyUnresolvedReferences
 from .version import __version__
 
+__author__ = 'Robert Smallshire'
+
+
+def setup(app):
+    from .sphinxext import setup
+    return setup(app)
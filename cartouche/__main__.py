@@ -0,0 +1,7 @@
+import sys
+
+from .cli import main
+
+__author__ = 'Robert Smallshire'
+
+sys.exit(main())
@@ -0,0 +1,337 @@
+'''Caches of rendered docstrings, both persistent and in-memory.'''
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from .version import __version__
+
+__author__ = 'Robert Smallshire'
+
+# Bump this whenever the layout of a cache entry changes, so that entries
+# written by an older cartouche are never mistaken for current ones.
+CACHE_FORMAT = 2
+
+DIGEST_SIZE = 20
+
+
+def render_digest(lines, configuration):
+    '''The digest identifying the rendering of a docstring by a parser
+    configuration and version of cartouche.
+
+    Args:
+        lines: A sequence of strings being the lines of the docstring.
+
+        configuration: A tuple of strings identifying the parser
+            configuration with which the lines are to be rendered.
+
+    Returns:
+        A bytes object of DIGEST_SIZE bytes.
+    '''
+    salt = '\0'.join((str(CACHE_FORMAT), __version__) + tuple(configuration))
+    digest = hashlib.blake2b(salt.encode('utf-8'), digest_size=DIGEST_SIZE)
+    digest.update(b'\0')
+    digest.update('\n'.join(lines).encode('utf-8', 'surrogatepass'))
+    return digest.digest()
+
+
+class RenderCache(object):
+    '''A directory of rendered docstrings keyed on a hash of their source.
+
+    Each entry lives in its own file named for the digest of the docstring
+    lines and the parser configuration which rendered them. Entries are
+    written to a temporary file and atomically renamed into place, so any
+    number of processes - such as the workers of ``sphinx-build -j N`` - may
+    share one cache directory without locking.
+
+    Args:
+        directory: The directory in which cache entries are stored. It will
+            be created if it does not exist.
+
+        max_size: The total size in bytes to which the cache will be trimmed
+            by evict(), or None for no size limit.
+
+        max_age: The age in seconds beyond which unused entries will be
+            removed by evict(), or None for no age limit.
+    '''
+
+    def __init__(self, directory, max_size=None, max_age=None):
+        self.directory = directory
+        self.max_size = max_size
+        self.max_age = max_age
+
+    def key(self, lines, configuration):
+        '''Compute the cache key for a docstring.
+
+        Args:
+            lines: A sequence of strings being the lines of the docstring.
+
+            configuration: A tuple of strings identifying the parser
+                configuration with which the lines are to be rendered.
+
+        Returns:
+            A string of hexadecimal digits identifying the entry.
+        '''
+        return render_digest(lines, configuration).hex()
+
+    def get(self, key, diagnostics=None):
+        '''Retrieve the rendered lines for a key.
+
+        Args:
+            key: A key obtained from key().
+
+            diagnostics: An optional Diagnostics to which the warnings
+                stored with the entry are added.
+
+        Returns:
+            A list of strings containing the rendered reStructuredText, or
+            None if there is no usable entry for the key.
+        '''
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as entry:
+                record = json.load(entry)
+            # Refresh the modification time so that eviction favours
+            # entries which are still in use.
+            os.utime(path, None)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(record, dict):
+            return None
+        rst = record.get('rst')
+        if rst is not None and diagnostics is not None:
+            diagnostics.extend(record.get('diagnostics', ()))
+        return rst
+
+    def put(self, key, rst, diagnostics=()):
+        '''Store the rendered lines for a key.
+
+        Failure to write the entry is not an error; the docstring will simply
+        be rendered again next time.
+
+        Args:
+            key: A key obtained from key().
+
+            rst: A list of strings containing the rendered reStructuredText.
+
+            diagnostics: The warnings, as an iterable series of Diagnostic,
+                produced while rendering.
+        '''
+        path = self._path(key)
+        bucket = os.path.dirname(path)
+        try:
+            if not os.path.isdir(bucket):
+                os.makedirs(bucket, exist_ok=True)
+            descriptor, temporary_path = tempfile.mkstemp(dir=bucket, prefix='.tmp-')
+            try:
+                with os.fdopen(descriptor, 'w', encoding='utf-8') as entry:
+                    json.dump({'rst': rst, 'diagnostics': [list(diagnostic) for diagnostic in diagnostics]},
+                              entry)
+                os.replace(temporary_path, path)
+            except BaseException:
+                os.unlink(temporary_path)
+                raise
+        except OSError:
+            pass
+
+    def evict(self, now=None):
+        '''Remove stale entries, and the oldest entries beyond the size limit.
+
+        This should be called from a single process, for example before
+        parallel workers are started, although concurrent readers and writers
+        are tolerated.
+
+        Args:
+            now: The current time as seconds since the epoch. Defaults to the
+                current system time.
+
+        Returns:
+            The number of entries removed.
+        '''
+        if now is None:
+            now = time.time()
+        entries = []
+        removed = 0
+        for path, stat in self._entries():
+            if self.max_age is not None and now - stat.st_mtime > self.max_age:
+                removed += self._remove(path)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        if self.max_size is not None:
+            total_size = sum(size for _, size, _ in entries)
+            entries.sort()
+            for _, size, path in entries:
+                if total_size <= self.max_size:
+                    break
+                removed += self._remove(path)
+                total_size -= size
+        return removed
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key[2:] + '.json')
+
+    def _entries(self):
+        try:
+            buckets = list(os.scandir(self.directory))
+        except OSError:
+            return
+        for bucket in buckets:
+            if not bucket.is_dir():
+                continue
+            try:
+                files = list(os.scandir(bucket.path))
+            except OSError:
+                continue
+            for entry in files:
+                if not entry.name.endswith('.json'):
+                    continue
+                try:
+                    yield entry.path, entry.stat()
+                except OSError:
+                    continue
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.unlink(path)
+        except OSError:
+            return 0
+        return 1
+
+
+class ParseMemo(object):
+    '''A bounded in-memory memo of rendered docstrings.
+
+    Entries are keyed on the content of the docstring lines, and the least
+    recently used entry is evicted when the memo is full. Optionally, an
+    entry may also be found through the object to which the docstring
+    belongs, held by a weak reference, which avoids hashing the lines when
+    the same object is documented repeatedly - for example as an inherited
+    member. The lines are still compared, so the memo never returns the
+    rendering of different lines.
+
+    A memo holds renderings by a single parser configuration, and may be
+    used from several threads.
+
+    Args:
+        max_size: The maximum number of entries.
+
+    Attributes:
+        hits: The number of lookups which found an entry.
+
+        identity_hits: The number of hits found through the owning object.
+
+        misses: The number of lookups which found no entry.
+
+        evictions: The number of entries evicted to make room for others.
+    '''
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self.hits = 0
+        self.identity_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._owners = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, lines, owner=None, diagnostics=None):
+        '''Retrieve the rendered lines for a docstring.
+
+        Args:
+            lines: A sequence of strings being the lines of the docstring.
+
+            owner: The optional object to which the docstring belongs.
+
+            diagnostics: An optional Diagnostics to which the warnings
+                stored with the entry are added.
+
+        Returns:
+            A list of strings containing the rendered reStructuredText, which
+            must not be modified, or None if there is no entry.
+        '''
+        with self._lock:
+            key = self._owner_key(owner, lines)
+            entry = self._entries.get(key) if key is not None else None
+            if entry is not None:
+                self.identity_hits += 1
+            else:
+                key = tuple(lines)
+                entry = self._entries.get(key)
+                if entry is None:
+                    self.misses += 1
+                    return None
+                self._remember_owner(owner, key)
+            self._entries.move_to_end(key)
+            self.hits += 1
+        rst, found = entry
+        if found and diagnostics is not None:
+            diagnostics.extend(found)
+        return rst
+
+    def put(self, lines, rst, owner=None, diagnostics=()):
+        '''Store the rendered lines for a docstring.
+
+        Args:
+            lines: A sequence of strings being the lines of the docstring.
+
+            rst: A list of strings containing the rendered reStructuredText.
+
+            owner: The optional object to which the docstring belongs.
+
+            diagnostics: The warnings, as an iterable series of Diagnostic,
+                produced while rendering.
+
+        Returns:
+            The number of entries evicted.
+        '''
+        if self.max_size <= 0:
+            return 0
+        key = tuple(lines)
+        evicted = 0
+        with self._lock:
+            self._entries[key] = (rst, tuple(diagnostics))
+            self._entries.move_to_end(key)
+            self._remember_owner(owner, key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                evicted += 1
+            self.evictions += evicted
+        return evicted
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._owners.clear()
+
+    def _owner_key(self, owner, lines):
+        if owner is None:
+            return None
+        try:
+            key = self._owners.get(owner)
+        except TypeError:
+            return None
+        if key is None or len(key) != len(lines):
+            return None
+        for stored, line in zip(key, lines):
+            if stored != line:
+                return None
+        return key
+
+    def _remember_owner(self, owner, key):
+        if owner is None:
+            return
+        try:
+            self._owners[owner] = key
+        except TypeError:
+            pass  # Not weakly referenceable, nor perhaps hashable
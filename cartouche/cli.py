@@ -0,0 +1,283 @@
+'''Conversion of docstrings from the command line, outside of Sphinx.
+
+Docstrings are read from Python source files, without importing them, or as
+JSON lines on the standard input::
+
+  $ python -m cartouche src/mypackage
+  $ python -m cartouche --format jsonl -o docstrings.jsonl src/mypackage
+  $ python -m cartouche --format sidecar -o src/mypackage/cartouche.sidecar src/mypackage
+  $ echo '{"name": "f", "docstring": "Do it.\\n\\nArgs:\\n    x: The x."}' | python -m cartouche
+
+Each input JSON line is an object with a "name" and either a "docstring"
+string or a "lines" list of strings. Each output JSON line is an object with
+the "name" and either the converted "rst" as a list of lines, or an "error".
+A sidecar holds the converted docstrings for shipping with a package, as
+described in cartouche.sidecar.
+'''
+
+import argparse
+import io
+import json
+import sys
+from collections import deque
+
+from .extract import iter_source_files, extract_many, prepare_docstring, Docstring
+from .diagnostics import ERROR
+from .errors import CartoucheError
+from .parser import CartoucheParser, make_sections, parse_many
+from .nodes import ATTRIBUTES_STYLES, DIRECTIVE_ATTRIBUTES
+from .sidecar import SidecarWriter
+
+__author__ = 'Robert Smallshire'
+
+
+def read_source_files(paths, errors, workers=None):
+    '''The docstrings found in the source files in or below paths.
+
+    Files which cannot be read or parsed are reported to the errors stream.
+    '''
+    for path, docstrings, error in extract_many(iter_source_files(paths), workers):
+        if error is not None:
+            print("{path}: cannot extract docstrings: {error}".format(path=path, error=error),
+                  file=errors)
+            continue
+        for docstring in docstrings:
+            yield docstring
+
+
+def read_json_lines(stream, errors, rejected):
+    '''The docstrings given as JSON lines in a stream.
+
+    Lines which are not docstring records are reported to the errors stream,
+    and their line numbers appended to the rejected list.
+    '''
+    for number, text in enumerate(stream, start=1):
+        if not text.strip():
+            continue
+        try:
+            lines, name = parse_json_line(text)
+        except ValueError as error:
+            print("<stdin>:{line}: {error}".format(line=number, error=error), file=errors)
+            rejected.append(number)
+            continue
+        yield Docstring(name, lines, '<stdin>', number)
+
+
+def parse_json_line(text):
+    '''The lines and name of the docstring given by a JSON line.
+
+    Raises:
+        ValueError: If the line is not a JSON object with either a
+            "docstring" string or a "lines" list of strings.
+    '''
+    record = json.loads(text)
+    if not isinstance(record, dict):
+        raise ValueError("Expected a JSON object")
+    if 'lines' in record:
+        lines = record['lines']
+        if not (isinstance(lines, list) and all(isinstance(line, str) for line in lines)):
+            raise ValueError('Expected "lines" to be a list of strings')
+    elif 'docstring' in record:
+        if not isinstance(record['docstring'], str):
+            raise ValueError('Expected "docstring" to be a string')
+        lines = prepare_docstring(record['docstring'])
+    else:
+        raise ValueError('Expected a "docstring" or "lines" member')
+    return lines, record.get('name')
+
+
+def write_rst(docstring, result, output):
+    print(".. {name}".format(name=docstring.name), file=output)
+    print("", file=output)
+    for line in result.lines:
+        print(line, file=output)
+
+
+def write_json_line(docstring, result, output):
+    if result.error is None:
+        record = dict(name=docstring.name, rst=result.lines)
+    else:
+        record = dict(name=docstring.name, error=str(result.error))
+    print(json.dumps(record), file=output)
+
+
+#noinspection PyUnusedLocal
+def add_to_sidecar(docstring, result, output):
+    output.add(docstring.lines, result)
+
+
+def parse_mapping(values):
+    '''A dictionary from the NAME=VALUE strings given for a repeated option.
+
+    Raises:
+        ValueError: If a string is not of the form NAME=VALUE.
+    '''
+    mapping = {}
+    for value in values or ():
+        name, equals, target = value.partition('=')
+        if not (equals and name.strip() and target.strip()):
+            raise ValueError("expected NAME=VALUE, not {value!r}".format(value=value))
+        mapping[name.strip()] = target.strip()
+    return mapping
+
+
+WRITERS = dict(rst=write_rst, jsonl=write_json_line, sidecar=add_to_sidecar)
+
+
+def convert(docstrings, output, errors, format='rst', workers=None, parser=None,
+            flush=False):
+    '''Convert docstrings, writing the results to an output stream.
+
+    Args:
+        docstrings: An iterable series of Docstring.
+
+        output: A text stream to which the results are written, or for the
+            'sidecar' format a SidecarWriter.
+
+        errors: A text stream to which syntax errors and warnings are
+            reported.
+
+        format: One of 'rst', 'jsonl' or 'sidecar'.
+
+        workers: The number of worker processes, passed to parse_many().
+
+        parser: An optional CartoucheParser.
+
+        flush: Whether to flush the output after each docstring, so that the
+            results can be read as soon as they are written.
+
+    Returns:
+        The number of docstrings which could not be converted, including
+        those converted by a parser which recovered from errors in them.
+    '''
+    writer = WRITERS[format]
+    pending = deque()
+
+    def lines_of(docstrings):
+        for docstring in docstrings:
+            pending.append(docstring)
+            yield docstring.lines
+
+    failures = 0
+    for result in parse_many(lines_of(docstrings), workers=workers, parser=parser):
+        docstring = pending.popleft()
+        for diagnostic in result.diagnostics:
+            print("{path}:{line}: {name}: {level}: {message}".format(
+                path=docstring.path, line=docstring.line, name=docstring.name,
+                level=diagnostic.level, message=diagnostic.message), file=errors)
+        if result.error is not None or any(diagnostic.level == ERROR
+                                           for diagnostic in result.diagnostics):
+            failures += 1
+        if result.error is not None:
+            print("{path}:{line}: {name}: {error}".format(
+                path=docstring.path, line=docstring.line, name=docstring.name,
+                error=result.error), file=errors)
+            if format != 'jsonl':
+                continue
+        writer(docstring, result, output)
+        if flush:
+            output.flush()
+    return failures
+
+
+def main(argv=None, stdin=None, stdout=None, stderr=None):
+    stdin = stdin if stdin is not None else sys.stdin
+    stdout = stdout if stdout is not None else sys.stdout
+    stderr = stderr if stderr is not None else sys.stderr
+
+    argument_parser = argparse.ArgumentParser(
+        prog='python -m cartouche',
+        description="Convert cartouche docstrings to reStructuredText.")
+    argument_parser.add_argument(
+        'paths', nargs='*', metavar='PATH',
+        help="Python source files, or directories to search for them. "
+             "If none are given, JSON lines are read from the standard input.")
+    argument_parser.add_argument(
+        '-f', '--format', choices=sorted(WRITERS), default=None,
+        help="The output format. Defaults to rst for source files, and jsonl "
+             "for the standard input. The sidecar format requires --output.")
+    argument_parser.add_argument(
+        '-o', '--output', help="The file to write. Defaults to the standard output.")
+    argument_parser.add_argument(
+        '-j', '--jobs', type=int, default=None,
+        help="The number of worker processes. Defaults to the number of CPUs. "
+             "The standard input is always converted in-process, one line at a time.")
+    argument_parser.add_argument(
+        '--bulleted-args', action='store_true', help="Accept bulleted Args entries.")
+    argument_parser.add_argument(
+        '--bulleted-raises', action='store_true', help="Accept bulleted Raises entries.")
+    argument_parser.add_argument(
+        '--max-lines', type=int, default=None,
+        help="Leave unconverted, with a warning, docstrings of more than this many lines.")
+    argument_parser.add_argument(
+        '--max-depth', type=int, default=None,
+        help="Leave unconverted, with a warning, docstrings nested more than this many levels deep.")
+    argument_parser.add_argument(
+        '--max-time', type=float, default=None,
+        help="Leave unconverted, with a warning, docstrings taking longer than this many "
+             "seconds to convert.")
+    argument_parser.add_argument(
+        '--compact', action='store_true',
+        help="Render in a compact style which is cheaper for Sphinx to process.")
+    argument_parser.add_argument(
+        '--attributes-style', choices=ATTRIBUTES_STYLES, default=DIRECTIVE_ATTRIBUTES,
+        help="Render the entries of Attributes blocks as a directive each, as fields, "
+             "or as a table. Defaults to directive.")
+    argument_parser.add_argument(
+        '--index-attributes', action='store_true',
+        help="Make an index entry for each attribute rendered as a field or table row.")
+    argument_parser.add_argument(
+        '--section-alias', action='append', metavar='HEADING=EXISTING',
+        help="Treat sections with the first heading as sections with the second, "
+             "for example Parameters=Args. May be repeated.")
+    argument_parser.add_argument(
+        '--admonition-section', action='append', metavar='HEADING=DIRECTIVE',
+        help="Render sections with the heading as the admonition directive, "
+             "for example 'See Also=seealso'. May be repeated.")
+    argument_parser.add_argument(
+        '--collect-errors', action='store_true',
+        help="Report syntax errors in a section and carry on with the rest of the "
+             "docstring, rather than leaving the docstring unconverted.")
+    args = argument_parser.parse_args(argv)
+
+    rejected = []
+    if args.paths and args.paths != ['-']:
+        docstrings = read_source_files(args.paths, stderr, args.jobs)
+        format = args.format or 'rst'
+        workers, flush = args.jobs, False
+    else:
+        # As a filter in a pipeline, each result is written as soon as its
+        # docstring has been read.
+        docstrings = read_json_lines(stdin, stderr, rejected)
+        format = args.format or 'jsonl'
+        workers, flush = 1, format != 'sidecar'
+    if format == 'sidecar' and args.output is None:
+        argument_parser.error("the sidecar format requires --output")
+
+    try:
+        sections = make_sections(parse_mapping(args.section_alias),
+                                 parse_mapping(args.admonition_section))
+    except (ValueError, CartoucheError) as error:
+        argument_parser.error(str(error))
+
+    parser = CartoucheParser(bulleted_args=args.bulleted_args,
+                             bulleted_raises=args.bulleted_raises,
+                             sections=sections,
+                             recover=args.collect_errors,
+                             max_lines=args.max_lines,
+                             max_depth=args.max_depth,
+                             max_time=args.max_time,
+                             compact=args.compact,
+                             attributes_style=args.attributes_style,
+                             index_attributes=args.index_attributes)
+
+    if format == 'sidecar':
+        sidecar = SidecarWriter(parser)
+        failures = convert(docstrings, sidecar, stderr, format, workers, parser)
+        sidecar.write(args.output)
+    elif args.output is None:
+        failures = convert(docstrings, stdout, stderr, format, workers, parser, flush)
+    else:
+        with io.open(args.output, 'w', encoding='utf-8') as output:
+            failures = convert(docstrings, output, stderr, format, workers, parser, flush)
+    return 1 if failures or rejected else 0
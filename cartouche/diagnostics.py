@@ -0,0 +1,83 @@
+'''Warnings about docstrings which were converted, but perhaps not as intended,
+and errors from which the parser recovered.'''
+
+from collections import namedtuple
+
+__author__ = 'Robert Smallshire'
+
+BULLETS = '*+-•‣⁃'
+
+WARNING = 'warning'
+ERROR = 'error'
+
+Diagnostic = namedtuple('Diagnostic', ['message', 'subject', 'level'], defaults=(WARNING,))
+Diagnostic.__doc__ = \
+'''A warning about a docstring, or an error from which the parser recovered.
+
+Attributes:
+    message: A description of the problem.
+
+    subject: The name, heading or line in the docstring to which the
+        diagnostic relates, used to locate it, or None.
+
+    level: Either WARNING or ERROR.
+'''
+
+
+class Diagnostics(object):
+    '''A collection of diagnostics in the order in which they were first
+    reported, in which each distinct diagnostic appears once.
+
+    Args:
+        diagnostics: An optional iterable series of Diagnostic, or of
+            sequences of the message, subject and optionally the level, with
+            which to begin.
+    '''
+
+    def __init__(self, diagnostics=()):
+        self._diagnostics = {}
+        self.extend(diagnostics)
+
+    def report(self, message, subject=None, level=WARNING):
+        '''Record a diagnostic, unless an identical one has been recorded.'''
+        diagnostic = Diagnostic(message, subject, level)
+        if diagnostic not in self._diagnostics:
+            self._diagnostics[diagnostic] = None
+
+    def extend(self, diagnostics):
+        for diagnostic in diagnostics:
+            self.report(*diagnostic)
+
+    def __iter__(self):
+        return iter(self._diagnostics)
+
+    def errors(self):
+        '''The diagnostics which are errors.'''
+        return [diagnostic for diagnostic in self if diagnostic.level == ERROR]
+
+    def __len__(self):
+        return len(self._diagnostics)
+
+    def __repr__(self):
+        return 'Diagnostics({0!r})'.format(list(self))
+
+
+def locate(lines, subject):
+    '''The line number within a docstring to which a warning relates.
+
+    Args:
+        lines: A sequence of strings being the lines of the docstring.
+
+        subject: The name or heading with which the line begins, or None.
+
+    Returns:
+        The one-based number of the first line beginning with the subject,
+        ignoring indentation and any bullet, or None if there is no such line.
+    '''
+    if not subject:
+        return None
+    for number, line in enumerate(lines, start=1):
+        text = line.lstrip()
+        if text.startswith(subject) or text.lstrip(BULLETS).lstrip().startswith(subject):
+            return number
+    return None
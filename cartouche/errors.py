@@ -1,5 +1,11 @@
 
-from sphinx.errors import ExtensionError
+# Only the lightweight sphinx.errors module is imported here, so that
+# CartoucheError is an ExtensionError whenever Sphinx is installed, without
+# the parser paying for the import of Sphinx proper.
+try:
+    from sphinx.errors import ExtensionError
+except ImportError:
+    ExtensionError = Exception
 
 __author__ = 'rjs'
 
@@ -0,0 +1,406 @@
+'''Extraction of docstrings from Python source files without importing them.'''
+
+import ast
+import hashlib
+import io
+import mmap
+import os
+import sys
+import tokenize
+from collections import namedtuple
+from itertools import chain, islice
+
+__author__ = 'Robert Smallshire'
+
+Docstring = namedtuple('Docstring', ['name', 'lines', 'path', 'line'])
+Docstring.__doc__ = \
+'''A docstring found in a source file.
+
+Attributes:
+    name: The fully qualified name of the object to which the docstring
+        belongs.
+
+    lines: A list of strings being the lines of the docstring, prepared as
+        autodoc prepares them.
+
+    path: The path of the source file.
+
+    line: The line number within the source file of the definition of the
+        object.
+'''
+
+
+def prepare_docstring(text, tabsize=8):
+    '''Split a docstring into lines in the way autodoc does.
+
+    Tabs are expanded, the common indent of all but the first line is
+    removed, leading blank lines are removed and a terminal blank line is
+    ensured.
+    '''
+    lines = text.expandtabs(tabsize).splitlines()
+    margin = sys.maxsize
+    for line in lines[1:]:
+        content = len(line.lstrip())
+        if content:
+            margin = min(margin, len(line) - content)
+    if lines:
+        lines[0] = lines[0].lstrip()
+    if margin < sys.maxsize:
+        lines[1:] = [line[margin:] for line in lines[1:]]
+    while lines and not lines[0]:
+        lines.pop(0)
+    if lines and lines[-1]:
+        lines.append('')
+    return lines
+
+
+def module_name(path):
+    '''The dotted name of the module in a source file, determined by the
+    enclosing package directories.'''
+    directory, filename = os.path.split(os.path.abspath(path))
+    name = os.path.splitext(filename)[0]
+    parts = [] if name == '__init__' else [name]
+    while os.path.isfile(os.path.join(directory, '__init__.py')):
+        directory, package = os.path.split(directory)
+        parts.append(package)
+    return '.'.join(reversed(parts))
+
+
+def iter_source_files(paths):
+    '''The Python source files in or below the given files and directories.'''
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for directory, subdirectories, filenames in os.walk(path):
+            subdirectories[:] = sorted(d for d in subdirectories if not d.startswith('.'))
+            for filename in sorted(filenames):
+                if filename.endswith('.py'):
+                    yield os.path.join(directory, filename)
+
+
+DEFINITIONS = (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)
+FUNCTIONS = (ast.FunctionDef, ast.AsyncFunctionDef)
+ASSIGNMENTS = (ast.Assign, ast.AnnAssign)
+
+# Files at least this large are memory-mapped rather than read.
+MMAP_THRESHOLD = 256 * 1024
+
+# Batches with fewer files than this are extracted in-process.
+PARALLEL_THRESHOLD = 64
+
+
+def extract_docstrings(source, name, path='<string>'):
+    '''Find the docstrings of a module and of the classes, functions and
+    attributes defined within it.
+
+    As with autodoc, the docstring of an attribute is either a string literal
+    immediately following its assignment, or a comment beginning ``#:`` on the
+    line of the assignment or on the lines immediately before it. Attributes
+    are those assigned at module or class level, and those assigned to self
+    within a method.
+
+    Args:
+        source: The source code of the module, as a string or as bytes, in
+            which case the encoding is determined as the interpreter would.
+
+        name: The qualified name of the module.
+
+        path: The path of the source file, used in the results.
+
+    Returns:
+        A list of Docstring in source order.
+
+    Raises:
+        SyntaxError: If the source cannot be parsed.
+    '''
+    tree = ast.parse(source, path)
+    comments = doc_comments(source)
+    docstrings = []
+    pending = [(name, tree, None)]
+    while pending:
+        qualified_name, node, owner = pending.pop()
+        text = ast.get_docstring(node, clean=False)
+        if text is not None:
+            docstrings.append(Docstring(qualified_name, prepare_docstring(text), path,
+                                        getattr(node, 'lineno', 1)))
+        if isinstance(node, FUNCTIONS):
+            if owner is not None and node.args.args:
+                self_name = node.args.args[0].arg
+                docstrings.extend(attribute_docstrings(
+                    iter_statement_lists(node.body), owner, path, comments, self_name))
+            continue
+        docstrings.extend(attribute_docstrings([node.body], qualified_name, path, comments))
+        children = [child for child in node.body if isinstance(child, DEFINITIONS)]
+        class_name = qualified_name if isinstance(node, ast.ClassDef) else None
+        for child in reversed(children):
+            child_name = child.name if not qualified_name else qualified_name + '.' + child.name
+            pending.append((child_name, child, class_name))
+    docstrings.sort(key=lambda docstring: docstring.line)
+    return docstrings
+
+
+def iter_statement_lists(body):
+    '''The statement list body, and every statement list nested within it,
+    other than those of nested classes and functions.'''
+    pending = [body]
+    while pending:
+        statements = pending.pop()
+        yield statements
+        for statement in statements:
+            if isinstance(statement, DEFINITIONS):
+                continue
+            for field in ('body', 'orelse', 'finalbody'):
+                nested = getattr(statement, field, None)
+                if nested:
+                    pending.append(nested)
+            for handler in getattr(statement, 'handlers', ()):
+                pending.append(handler.body)
+
+
+def attribute_docstrings(statement_lists, owner, path, comments, self_name=None):
+    '''Find the docstrings of attributes assigned in lists of statements.
+
+    Args:
+        statement_lists: An iterable series of lists of statements.
+
+        owner: The qualified name of the module or class which owns the
+            attributes.
+
+        path: The path of the source file, used in the results.
+
+        comments: A dictionary of doc comments, as returned by doc_comments().
+
+        self_name: If given, only assignments to attributes of this name are
+            considered, otherwise only assignments to plain names.
+
+    Yields:
+        A Docstring for each documented attribute.
+    '''
+    for statements in statement_lists:
+        for index, statement in enumerate(statements):
+            if not isinstance(statement, ASSIGNMENTS):
+                continue
+            names = assigned_names(statement, self_name)
+            if not names:
+                continue
+            following = statements[index + 1] if index + 1 < len(statements) else None
+            text = string_statement(following)
+            if text is not None:
+                lines = prepare_docstring(text)
+            else:
+                lines = comment_for(comments, statement)
+                if lines is None:
+                    continue
+            for name in names:
+                qualified_name = name if not owner else owner + '.' + name
+                yield Docstring(qualified_name, list(lines), path, statement.lineno)
+
+
+def assigned_names(statement, self_name=None):
+    '''The names assigned by an assignment statement.'''
+    targets = statement.targets if isinstance(statement, ast.Assign) else [statement.target]
+    names = []
+    for target in targets:
+        elements = target.elts if isinstance(target, ast.Tuple) else [target]
+        for element in elements:
+            if self_name is None:
+                if isinstance(element, ast.Name):
+                    names.append(element.id)
+            elif (isinstance(element, ast.Attribute)
+                  and isinstance(element.value, ast.Name)
+                  and element.value.id == self_name):
+                names.append(element.attr)
+    return names
+
+
+def doc_comments(source):
+    '''Find the comments beginning #: in source code.
+
+    The source is only tokenized if it contains such a comment.
+
+    Returns:
+        A dictionary mapping line numbers to 2-tuples of a boolean, True if
+        the comment is the only thing on its line, and the text of the
+        comment following the #: marker.
+    '''
+    marker = '#:' if isinstance(source, str) else b'#:'
+    if source.find(marker) < 0:
+        return {}
+    if isinstance(source, str):
+        readline = io.StringIO(source).readline
+        tokens = tokenize.generate_tokens(readline)
+    else:
+        readline = io.BytesIO(source).readline
+        tokens = tokenize.tokenize(readline)
+    comments = {}
+    try:
+        for token in tokens:
+            if token.type == tokenize.COMMENT and token.string.startswith('#:'):
+                row, column = token.start
+                alone = not token.line[:column].strip()
+                text = token.string[2:]
+                comments[row] = (alone, text[1:] if text.startswith(' ') else text)
+    except (tokenize.TokenError, SyntaxError):
+        pass
+    return comments
+
+
+def comment_for(comments, statement):
+    '''The lines of the doc comment for an assignment, or None.
+
+    A comment on the last line of the assignment takes precedence over a
+    block of comments on the lines immediately before it.
+    '''
+    trailing = comments.get(getattr(statement, 'end_lineno', statement.lineno))
+    if trailing is not None and not trailing[0]:
+        return [trailing[1], '']
+    lines = []
+    row = statement.lineno - 1
+    while row in comments and comments[row][0]:
+        lines.append(comments[row][1])
+        row -= 1
+    if not lines:
+        return None
+    lines.reverse()
+    lines.append('')
+    return lines
+
+
+def read_source(path):
+    '''The source code of a file as bytes, or as a read-only memory map for
+    large files, so that they are not read up front.'''
+    with open(path, 'rb') as source_file:
+        size = os.fstat(source_file.fileno()).st_size
+        if size < MMAP_THRESHOLD:
+            return source_file.read()
+        return mmap.mmap(source_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def extract_file(path):
+    '''Find the docstrings in a source file. See extract_docstrings().'''
+    source = read_source(path)
+    try:
+        return extract_docstrings(source, module_name(path), path)
+    finally:
+        if isinstance(source, mmap.mmap):
+            source.close()
+
+
+def interface_fingerprint(source, path='<string>'):
+    '''A digest of those parts of a module which autodoc renders.
+
+    The digest covers the docstrings, doc comments and signatures of the
+    module and of the classes and functions within it, and the module and
+    class level statements, but not the statements within functions other
+    than their docstrings and the attributes which they assign. Neither does
+    it depend on line numbers, so a change to the implementation of a
+    function does not change the digest.
+
+    Args:
+        source: The source code of the module, as a string or as bytes.
+
+        path: The path of the source file, used in error messages.
+
+    Returns:
+        A string of hexadecimal digits.
+
+    Raises:
+        SyntaxError: If the source cannot be parsed.
+    '''
+    tree = ast.parse(source, path)
+    functions = [node for node in ast.walk(tree) if isinstance(node, FUNCTIONS)]
+    for function in functions:
+        function.body = list(interface_statements(function.body))
+    digest = hashlib.blake2b(ast.dump(tree).encode('utf-8'), digest_size=20)
+    comments = doc_comments(source)
+    for row in sorted(comments):
+        digest.update(repr(comments[row]).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def string_statement(statement):
+    '''The string of an expression statement which is a string literal, such
+    as a docstring, or None for any other statement.
+
+    Python 3.7 parses string literals as ast.Str, and later versions as
+    ast.Constant.
+    '''
+    if not isinstance(statement, ast.Expr):
+        return None
+    value = statement.value
+    if isinstance(value, ast.Constant):
+        value = value.value
+    elif type(value).__name__ == 'Str':
+        value = value.s
+    return value if isinstance(value, str) else None
+
+
+def interface_statements(body):
+    '''The string literals within a function body, which include its
+    docstring and the docstrings of attributes, and the targets of its
+    attribute assignments.'''
+    for statements in iter_statement_lists(body):
+        for statement in statements:
+            if string_statement(statement) is not None:
+                yield statement
+            elif isinstance(statement, ASSIGNMENTS):
+                targets = statement.targets if isinstance(statement, ast.Assign) else [statement.target]
+                yield ast.Expr(ast.List([target for target in targets
+                                         if isinstance(target, (ast.Attribute, ast.Tuple))],
+                                        ast.Load()))
+
+
+def file_fingerprint(path):
+    '''The interface fingerprint of a source file. See interface_fingerprint().'''
+    source = read_source(path)
+    try:
+        return interface_fingerprint(source, path)
+    finally:
+        if isinstance(source, mmap.mmap):
+            source.close()
+
+
+def _extract_result(path):
+    try:
+        return path, extract_file(path), None
+    except (OSError, SyntaxError, ValueError) as error:
+        return path, None, error
+
+
+def extract_many(paths, workers=None, chunksize=8, threshold=PARALLEL_THRESHOLD):
+    '''Find the docstrings in many source files, yielding the results in the
+    order of the paths.
+
+    As with parse_many(), small batches are processed in the calling process
+    and larger batches over a pool of worker processes. A file which cannot
+    be read or parsed does not abort the batch.
+
+    Args:
+        paths: An iterable series of paths of Python source files.
+
+        workers: The number of worker processes. Defaults to the number of
+            CPUs. If 1, all files are processed in-process.
+
+        chunksize: The number of files sent to a worker at a time.
+
+        threshold: The number of files below which the batch is processed
+            in-process.
+
+    Yields:
+        For each path a 3-tuple of the path, a list of Docstring or None, and
+        the exception raised while extracting the docstrings or None.
+    '''
+    if workers is None:
+        workers = os.cpu_count() or 1
+    paths = iter(paths)
+    head = list(islice(paths, threshold))
+    if workers <= 1 or len(head) < threshold:
+        for path in chain(head, paths):
+            yield _extract_result(path)
+        return
+
+    import multiprocessing
+    with multiprocessing.Pool(workers) as pool:
+        for result in pool.imap(_extract_result, chain(head, paths), chunksize):
+            yield result
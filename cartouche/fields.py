@@ -0,0 +1,185 @@
+'''The field lists of converted docstrings, for building as docutils nodes
+without parsing them as reStructuredText.
+
+When enabled, each run of fields at the top level of a converted docstring,
+such as :param: and :returns:, is wrapped in a cartouche-fields directive.
+The directive splits its content into fields by their layout, builds the
+field list itself, and builds the body of each field as a paragraph
+directly where the body is plain text. Only bodies containing markup are
+parsed by docutils. This module has no dependency on docutils, so that the
+parser need not import it.
+
+The entries of Attributes blocks may likewise be rendered in the layout of
+fields within a cartouche-attributes directive, which builds a table of them
+in the same way.
+'''
+
+import re
+
+__author__ = 'Robert Smallshire'
+
+FIELDS_DIRECTIVE = 'cartouche-fields'
+ATTRIBUTES_DIRECTIVE = 'cartouche-attributes'
+
+# The marker at the start of a field, as recognised by docutils.
+FIELD_REGEX = re.compile(r':(?![: ])((?:[^:\\]|\\.|:(?![ `]|$))*)(?<! ):(?: +|$)')
+
+# The name of a field within a cartouche-attributes directive, being the name
+# of an attribute optionally followed by its type in parentheses.
+ATTRIBUTE_NAME_REGEX = re.compile(r'(\S+)(?: \((.*)\))?$')
+
+# A field name which docutils would turn into a single text node.
+PLAIN_NAME_REGEX = re.compile(r'(?:[^\W_]|(?<=[^\W_])_(?=[^\W_])|[ .])+')
+
+# A line of a paragraph which docutils would turn into a single text node,
+# once any line which might begin some other construct is excluded.
+PLAIN_TEXT_REGEX = re.compile(r'''(?:[^\W_]|(?<=[^\W_])_(?=[^\W_])|[ ,.;!?'"()\[\]{}/+=%&~$<>-])+''')
+ENUMERATOR_REGEX = re.compile(r'(?:\d+|[A-Za-z]|[IVXLCDMivxlcdm]+|#)[.)](?: |$)')
+NON_PARAGRAPH_STARTS = '-+*.(/>'
+ALPHANUMERIC_REGEX = re.compile(r'[^\W_]')
+
+
+def is_blank(line):
+    return not line.strip()
+
+
+def wrap_fields(lines):
+    '''Wrap each run of fields at the top level of converted lines in a
+    cartouche-fields directive.
+
+    A run of fields is wrapped only where it is preceded by a blank line or
+    the start of the docstring, and followed by a blank line or the end of
+    the docstring, since otherwise reStructuredText would not treat it as a
+    field list.
+
+    Args:
+        lines: A sequence of strings being the lines of a docstring converted
+            to reStructuredText.
+
+    Returns:
+        A new list of lines.
+    '''
+    result = []
+    count = len(lines)
+    start = 0
+    while start < count:
+        line = lines[start]
+        if FIELD_REGEX.match(line) is None or (result and not is_blank(result[-1])):
+            result.append(line)
+            start += 1
+            continue
+        end = start + 1
+        while end < count and (is_blank(lines[end]) or lines[end][0] == ' '
+                               or FIELD_REGEX.match(lines[end]) is not None):
+            end += 1
+        following = end
+        while is_blank(lines[end - 1]):
+            end -= 1
+        if following < count and end == following:
+            result.extend(lines[start:following])
+            start = following
+            continue
+        result.append('.. {directive}::'.format(directive=FIELDS_DIRECTIVE))
+        result.append('')
+        result.extend('   ' + line if not is_blank(line) else '' for line in lines[start:end])
+        start = end
+    return result
+
+
+def split_fields(lines):
+    '''Split the content of a cartouche-fields directive into fields, as
+    docutils would.
+
+    Each field begins with a field marker at the start of a line, and its
+    body is the text following the marker together with the indented block
+    following that line, with the common indent of the block removed.
+
+    Args:
+        lines: A sequence of strings being the content of the directive.
+
+    Returns:
+        A list of 3-tuples each containing the field name, the list of lines
+        of its body without trailing blank lines, and a list of the indexes
+        into lines from which the lines of the body were taken.
+
+    Raises:
+        ValueError: If a non-blank line at the start of a field does not
+            begin with a field marker.
+    '''
+    fields = []
+    count = len(lines)
+    start = 0
+    while start < count:
+        if is_blank(lines[start]):
+            start += 1
+            continue
+        match = FIELD_REGEX.match(lines[start])
+        if match is None:
+            raise ValueError("Expected a field at {line!r}".format(line=lines[start]))
+        end = start + 1
+        while end < count and (is_blank(lines[end]) or lines[end][0] == ' '):
+            end += 1
+        block_end = end
+        while block_end > start + 1 and is_blank(lines[block_end - 1]):
+            block_end -= 1
+        block = lines[start + 1:block_end]
+        indents = [len(line) - len(line.lstrip()) for line in block if not is_blank(line)]
+        margin = min(indents) if indents else 0
+        body = [lines[start][match.end():]] + [line[margin:] for line in block]
+        indexes = list(range(start, block_end))
+        if not body[0]:
+            body.pop(0)
+            indexes.pop(0)
+            while body and is_blank(body[0]):
+                body.pop(0)
+                indexes.pop(0)
+        fields.append((match.group(1), body, indexes))
+        start = end
+    return fields
+
+
+def split_attribute_name(name):
+    '''Split the name of a field within a cartouche-attributes directive.
+
+    Args:
+        name: The field name, such as 'x (int)'.
+
+    Returns:
+        A 2-tuple containing the name of the attribute and its type, or None
+        if no type is given.
+
+    Raises:
+        ValueError: If the name is empty.
+    '''
+    match = ATTRIBUTE_NAME_REGEX.match(name)
+    if match is None:
+        raise ValueError("Expected an attribute at {name!r}".format(name=name))
+    return match.group(1), match.group(2)
+
+
+def is_plain_name(name):
+    '''True if docutils would parse a field name into a single text node
+    equal to the name.'''
+    return PLAIN_NAME_REGEX.fullmatch(name) is not None
+
+
+def is_plain_paragraph(lines):
+    '''True if docutils would parse lines into a single paragraph holding a
+    single text node equal to the lines joined by newlines.
+
+    The test is conservative. Lines are accepted only if they contain no
+    characters used by inline markup, do not begin with anything which could
+    start a list, block or directive, contain at least one letter or digit,
+    and have no leading or trailing whitespace.
+    '''
+    if not lines:
+        return False
+    for line in lines:
+        if (not line
+                or line[0] in NON_PARAGRAPH_STARTS
+                or line[0] == ' ' or line[-1] == ' '
+                or PLAIN_TEXT_REGEX.fullmatch(line) is None
+                or ENUMERATOR_REGEX.match(line) is not None
+                or ALPHANUMERIC_REGEX.search(line) is None):
+            return False
+    return True
@@ -2,6 +2,10 @@ from __future__ import print_function
 
 __author__ = 'Robert Smallshire'
 import sys
+import weakref
+
+from cartouche.fields import ATTRIBUTES_DIRECTIVE, is_plain_paragraph
+
 
 class Node(object):
 
@@ -16,11 +20,23 @@ class Node(object):
         else:
             self.lines = []
 
-        self._parent = parent
+        self.parent = parent
 
         self.children = []
 
-    parent = property(lambda self: self._parent)
+    @property
+    def parent(self):
+        '''The parent of this node, or None for a root.
+
+        Parents are held by weak references, so a tree contains no reference
+        cycles and is freed as soon as its root is no longer referenced. A
+        node detached from a discarded tree has no parent.
+        '''
+        return self._parent() if self._parent is not None else None
+
+    @parent.setter
+    def parent(self, parent):
+        self._parent = weakref.ref(parent) if parent is not None else None
 
     def add_child(self, child):
         assert(child.parent is self)
@@ -30,12 +46,17 @@ class Node(object):
         return "Node(" + repr(self.indent) + ", " + repr(self.lines)\
                        + ", children=" + repr(self.children) + ")"
 
-    def render_rst(self, *args, **kwargs):
+    def render_rst(self, only_child=False, *args, **kwargs):
+        '''Render this node and its descendants as reStructuredText.
+
+        Args:
+            only_child: True if this node is the only child of its parent.
+
+        Returns:
+            A list of lines of reStructuredText.
+        '''
         result = []
-        prefix = ' ' * self.indent
-        result.extend(prefix + line for line in self.lines)
-        for child in self.children:
-            result.extend(child.render_rst())
+        RstRenderer(result).render(self, only_child=only_child)
         return result
 
 
@@ -49,37 +70,6 @@ class Arg(Node):
     def __repr__(self):
         return "Arg(" + repr(self.name) + ", " + repr(self.type) + ", children=" + repr(self.children) + ")"
 
-    def render_rst(self, *args, **kwargs):
-        result = []
-        indent = ' ' * self.indent
-
-        # Render the param description
-        description = []
-        for child in self.children:
-            child_lines = child.render_rst()
-            description.extend(child_lines)
-
-        name = self.name.replace('*', r'\*')
-
-        first_description = description[0].lstrip() if len(description) else ''
-        if not first_description:
-            print("Missing argument description for {name}".format(name=self.name), file=sys.stderr)
-
-        result.append("{indent}:param {name}: {first_description}".format(
-                        indent=indent, name=name,
-                        first_description=first_description))
-
-        result.extend(description[1:])
-
-        # If a type was specified render the type
-        if self.type is not None:
-            result.append("{indent}:type {name}: {type}".format(indent=indent,
-                                             name=self.name, type=self.type))
-            result.append('')
-
-        ensure_terminal_blank(result)
-
-        return result
 
 class Attribute(Node):
 
@@ -94,37 +84,6 @@ class Attribute(Node):
                             + ", children=" + repr(self.children) + ")"
 
 
-    def render_rst(self, *args, **kwargs):
-        result = []
-        indent = ' ' * self.indent
-
-        # Render the attribute description
-        description = []
-        for child in self.children:
-            child_lines = child.render_rst()
-            description.extend(child_lines)
-
-        if self.type is not None:
-            if len(description) > 0:
-                description[0] = "({t}) {desc}".format(
-                    t=self.type, desc=description[0].lstrip())
-            else:
-                description = ["({t})".format(t=self.type)]
-
-        # The description lines should be indented by three characters to line
-        # up with the directive.
-        reindented_description = ["   " + line.lstrip() for line in description]
-
-        result.append(".. py:attribute:: {name}".format(name=self.name))
-
-        if len(reindented_description) > 0:
-            result.append('')
-            result.extend(reindented_description)
-
-        ensure_terminal_blank(result)
-
-        return result
-
 class Raises(Node):
 
     def __init__(self, indent=None):
@@ -134,18 +93,6 @@ class Raises(Node):
         return "Raises(" + repr(self.indent) + ", children=" + repr(self.children) + ")"
 
 
-    def render_rst(self, *args, **kwargs):
-        result = []
-        indent = ' ' * self.indent
-        result.append(indent + ':raises:')
-        for child in self.children:
-            result.extend(child.render_rst(only_child=len(self.children) == 1))
-
-        ensure_terminal_blank(result)
-
-        return result
-
-
 class Except(Node):
 
     def __init__(self, indent, type):
@@ -157,32 +104,6 @@ class Except(Node):
         return "Except(" + repr(self.type) + ", children="\
                          + repr(self.children) + ")"
 
-    def render_rst(self, only_child=False, *args, **kwargs):
-        result = []
-        indent = ' ' * self.indent
-
-        # Render the param description
-        description = []
-        for child in self.children:
-            child_lines = child.render_rst()
-            description.extend(child_lines)
-
-        bullet = '* ' if not only_child else ''
-
-        first_description = description[0].lstrip() if len(description) else ''
-        if not first_description:
-            # TODO: Emit a warning about a missing argument description
-            pass
-        result.append("{indent}{bullet}{type} - {first_description}".format(
-                        indent=indent,
-                        bullet=bullet, type=self.type,
-                        first_description=first_description))
-
-        result.extend(description[1:])
-        ensure_terminal_blank(result)
-
-        return result
-
 
 class Returns(Node):
 
@@ -194,29 +115,6 @@ class Returns(Node):
     def __repr__(self):
         return "Returns(" + str(self.indent) + ", children=" + str(self.children) + ")"
 
-    def render_rst(self, *args, **kwargs):
-        result = []
-        indent = ' ' * self.indent
-
-        # Render the return description
-        description = [self.line] if self.line else []
-        for child in self.children:
-            child_lines = child.render_rst()
-            description.extend(child_lines)
-
-        self.render_title(description, indent, result)
-
-        result.extend(description[1:])
-
-        ensure_terminal_blank(result)
-        return result
-
-    def render_title(self, description, indent, result):
-        first_description = description[0].lstrip() if len(description) else ''
-        result.append(
-            "{indent}:returns: {first_description}".format(indent=indent,
-               first_description=first_description))
-
 
 class Yields(Node):
 
@@ -230,31 +128,6 @@ class Yields(Node):
         return "Yields(" + str(self.indent) + ", children=" + str(self.children) + ")"
 
 
-    def render_rst(self, *args, **kwargs):
-        result = []
-        indent = ' ' * self.indent
-
-        # Render the return description
-        description = [self.line] if self.line else []
-        for child in self.children:
-            child_lines = child.render_rst()
-            description.extend(child_lines)
-
-        self.render_title(description, indent, result)
-
-        result.extend(description[1:])
-
-        ensure_terminal_blank(result)
-        return result
-
-
-    def render_title(self, description, indent, result):
-        first_description = description[0].lstrip() if len(description) else ''
-        result.append(
-            "{indent}:returns: {first_description}".format(indent=indent,
-                first_description=first_description))
-
-
 class Warning(Node):
 
     def __init__(self, indent):
@@ -264,24 +137,6 @@ class Warning(Node):
     def __repr__(self):
         return "Warning(" + repr(self.indent) + ", children=" + str(self.children) + ")"
 
-    def render_rst(self, *args, **kwargs):
-        # TODO: Factor out the commonality between this and Note below
-        result = []
-        indent = ' ' * self.indent
-
-        # Render the param description
-        description = [indent + '    ' + self.line] if self.line else []
-        for child in self.children:
-            child_lines = child.render_rst()
-            description.extend(child_lines)
-
-        result.append(indent + ".. warning::")
-        result.append(indent + '')
-        result.extend(description)
-
-        ensure_terminal_blank(result)
-        return result
-
 
 class Note(Node):
 
@@ -292,23 +147,6 @@ class Note(Node):
     def __repr__(self):
         return "Note(" + repr(self.indent) + ", children=" + str(self.children) + ")"
 
-    def render_rst(self, *args, **kwargs):
-        # TODO: Factor out the commonality between this and Warning above
-        result = []
-        indent = ' ' * self.indent
-
-        # Render the param description
-        description = [indent + '    ' + self.line] if self.line else []
-        for child in self.children:
-            child_lines = child.render_rst()
-            description.extend(child_lines)
-
-        result.append(indent + ".. note::")
-        result.append(indent + '')
-        result.extend(description)
-
-        ensure_terminal_blank(result)
-        return result
 
 class Usage(Node):
 
@@ -320,31 +158,750 @@ class Usage(Node):
     def __repr__(self):
         return "Usage(" + repr(self.indent) + ")"
 
-    def render_rst(self, *args, **kwargs):
-        result = []
-        indent = ' ' * self.indent
 
-        # Render the param description
-        description = []
-        for child in self.children:
-            child_lines = child.render_rst()
-            description.extend(child_lines)
+class Admonition(Node):
+
+    def __init__(self, indent, directive):
+        super(Admonition, self).__init__(indent=indent)
+        self.directive = directive
+        self.line = ''
 
+    def __repr__(self):
+        return "Admonition(" + repr(self.indent) + ", " + repr(self.directive)\
+                             + ", children=" + str(self.children) + ")"
+
+
+# The kinds of node which may be stored in an Arena, in the same order as the
+# corresponding Node classes listed in NODE_CLASSES below.
+NODE, ARG, ATTRIBUTE, RAISES, EXCEPT, RETURNS, YIELDS, WARNING, NOTE, USAGE, ADMONITION = range(11)
+
+NODE_CLASSES = (Node, Arg, Attribute, Raises, Except, Returns, Yields, Warning, Note, Usage, Admonition)
+
+# The index used for absent nodes and texts in an Arena
+NIL = -1
+
+# The ways in which the entries of an Attributes block may be rendered
+DIRECTIVE_ATTRIBUTES, FIELD_ATTRIBUTES, TABLE_ATTRIBUTES = ATTRIBUTES_STYLES = (
+    'directive', 'fields', 'table')
+
+
+class Arena(object):
+    '''A syntax tree for a single docstring stored as parallel lists.
+
+    Rather than one object per node, each node is an integer index into a set
+    of parallel lists recording its kind, indent, parent, first and last
+    children, next sibling, and the span of its lines within a shared list of
+    texts. Strings belonging to a node, such as the name and type of an
+    argument, are likewise stored as indexes into the texts. The root of the
+    tree is always at index zero.
+
+    When built from a docstring the texts are the unindented lines of the
+    docstring in order, so the line span of a node also gives its location
+    within the docstring. Texts created during conversion are appended after
+    them.
+
+    The name list holds the names of ARG and ATTRIBUTE nodes. The type list
+    holds the declared types of ARG and ATTRIBUTE nodes, the exception type of
+    EXCEPT nodes, the language of USAGE nodes and the directive of ADMONITION
+    nodes. The line list holds the text following the heading of RETURNS,
+    YIELDS, WARNING, NOTE and ADMONITION nodes.
+    '''
+
+    __slots__ = ('texts', 'kind', 'indent', 'parent', 'first_child',
+                 'last_child', 'next_sibling', 'line_start', 'line_end',
+                 'name', 'type', 'line')
+
+    def __init__(self):
+        # Lists of small integers, which are shared objects, are quicker to
+        # append to and index than arrays, which box each value on access.
+        self.texts = []
+        self.kind = []
+        self.indent = []
+        self.parent = []
+        self.first_child = []
+        self.last_child = []
+        self.next_sibling = []
+        self.line_start = []
+        self.line_end = []
+        self.name = []
+        self.type = []
+        self.line = []
+
+    def __len__(self):
+        return len(self.kind)
+
+    @classmethod
+    def of_size(cls, count, kind=NODE):
+        '''Create an Arena of unlinked nodes, each with no lines, to be filled
+        in by the caller.
+
+        Allocating the columns at once is quicker than adding the nodes one
+        by one, when their number is known in advance.
+
+        Args:
+            count: The number of nodes.
+
+            kind: The kind of every node.
+
+        Returns:
+            An Arena with empty texts, in which every node has an indent of
+            zero, no parent, no children and no siblings.
+        '''
+        arena = cls()
+        arena.kind = [kind] * count
+        arena.indent = [0] * count
+        arena.parent = [NIL] * count
+        arena.first_child = [NIL] * count
+        arena.last_child = [NIL] * count
+        arena.next_sibling = [NIL] * count
+        arena.line_start = [0] * count
+        arena.line_end = [0] * count
+        arena.name = [NIL] * count
+        arena.type = [NIL] * count
+        arena.line = [NIL] * count
+        return arena
+
+    def add(self, kind, indent, parent=NIL, lines=(), name=None, type=None, line=None):
+        '''Add a node as the last child of a parent.
+
+        Args:
+            kind: One of the node kinds, such as NODE or ARG.
+
+            indent: The integer indent of the node.
+
+            parent: The index of the parent node, or NIL for a root.
+
+            lines: A sequence of strings which are the lines of the node.
+
+            name: An optional string which is the name of the node.
+
+            type: An optional string which is the type of the node.
+
+            line: An optional string which is the heading line of the node.
+
+        Returns:
+            The index of the new node.
+        '''
+        texts = self.texts
+        line_start = len(texts)
+        texts.extend(lines)
+        line_end = len(texts)
+        name_index = type_index = line_index = NIL
+        if name is not None:
+            name_index = len(texts)
+            texts.append(name)
+        if type is not None:
+            type_index = len(texts)
+            texts.append(type)
+        if line is not None:
+            line_index = len(texts)
+            texts.append(line)
+        kinds = self.kind
+        index = len(kinds)
+        kinds.append(kind)
+        self.indent.append(indent)
+        self.parent.append(parent)
+        self.first_child.append(NIL)
+        self.last_child.append(NIL)
+        self.next_sibling.append(NIL)
+        self.line_start.append(line_start)
+        self.line_end.append(line_end)
+        self.name.append(name_index)
+        self.type.append(type_index)
+        self.line.append(line_index)
+        if parent != NIL:
+            last_child = self.last_child
+            previous = last_child[parent]
+            if previous == NIL:
+                self.first_child[parent] = index
+            else:
+                self.next_sibling[previous] = index
+            last_child[parent] = index
+        return index
+
+    def add_text(self, text):
+        '''Add a string to the texts, returning its index or NIL for None.'''
+        if text is None:
+            return NIL
+        self.texts.append(text)
+        return len(self.texts) - 1
+
+    def text(self, text_index):
+        '''The string at an index into the texts, or None for NIL.'''
+        return self.texts[text_index] if text_index != NIL else None
+
+    def lines(self, index):
+        '''A list of the lines of a node.'''
+        return self.texts[self.line_start[index]:self.line_end[index]]
+
+    def children(self, index):
+        '''Generate the indexes of the children of a node in order.'''
+        child = self.first_child[index]
+        next_sibling = self.next_sibling
+        while child != NIL:
+            yield child
+            child = next_sibling[child]
+
+    def detach_children(self, index):
+        '''Remove all children from a node.
+
+        Returns:
+            A list of the indexes of the former children, in order.
+        '''
+        children = list(self.children(index))
+        self.first_child[index] = NIL
+        self.last_child[index] = NIL
+        return children
+
+    def move_children(self, source, destination):
+        '''Move all children of one node to the end of those of another.'''
+        first = self.first_child[source]
+        if first == NIL:
+            return
+        for child in self.children(source):
+            self.parent[child] = destination
+        previous = self.last_child[destination]
+        if previous == NIL:
+            self.first_child[destination] = first
+        else:
+            self.next_sibling[previous] = first
+        self.last_child[destination] = self.last_child[source]
+        self.first_child[source] = NIL
+        self.last_child[source] = NIL
+
+    @classmethod
+    def from_node(cls, root):
+        '''Create an Arena from a tree of Node objects.
+
+        Args:
+            root: The Node at the root of the tree.
+
+        Returns:
+            An Arena containing an equivalent tree, with its root at index
+            zero.
+        '''
+        arena = cls()
+        stack = [(root, NIL)]
+        while stack:
+            node, parent = stack.pop()
+            kind = _kind_of(node)
+            if kind == NODE:
+                index = arena.add(NODE, node.indent, parent, node.lines)
+            elif kind in (ARG, ATTRIBUTE):
+                index = arena.add(kind, node.indent, parent, name=node.name, type=node.type)
+            elif kind == EXCEPT:
+                index = arena.add(kind, node.indent, parent, type=node.type)
+            elif kind == USAGE:
+                index = arena.add(kind, node.indent, parent, type=node.lang)
+            elif kind == ADMONITION:
+                index = arena.add(kind, node.indent, parent, type=node.directive, line=node.line)
+            elif kind == RAISES:
+                index = arena.add(kind, node.indent, parent)
+            else:
+                index = arena.add(kind, node.indent, parent, line=node.line)
+            stack.extend((child, index) for child in reversed(node.children))
+        return arena
+
+    def to_node(self, index=0):
+        '''Create a tree of Node objects from the subtree at an index.
+
+        Args:
+            index: The index of the root of the subtree.
+
+        Returns:
+            The Node at the root of an equivalent tree.
+        '''
+        root = None
+        stack = [(index, None)]
+        while stack:
+            index, parent = stack.pop()
+            kind = self.kind[index]
+            indent = self.indent[index]
+            if kind == NODE:
+                node = Node(indent, self.lines(index), parent)
+            elif kind in (ARG, ATTRIBUTE):
+                node = NODE_CLASSES[kind](indent, self.text(self.name[index]))
+                node.type = self.text(self.type[index])
+            elif kind == EXCEPT:
+                node = Except(indent, self.text(self.type[index]))
+            elif kind == USAGE:
+                node = Usage(indent)
+                node.lang = self.text(self.type[index])
+            elif kind == ADMONITION:
+                node = Admonition(indent, self.text(self.type[index]))
+                node.line = self.text(self.line[index])
+            elif kind == RAISES:
+                node = Raises(indent)
+            else:
+                node = NODE_CLASSES[kind](indent)
+                node.line = self.text(self.line[index])
+            node.parent = parent
+            if parent is None:
+                root = node
+            else:
+                parent.children.append(node)
+            stack.extend((child, node) for child in reversed(list(self.children(index))))
+        return root
+
+
+def _kind_of(node):
+    node_type = type(node)
+    for cls in node_type.__mro__:
+        if cls in NODE_CLASSES:
+            return NODE_CLASSES.index(cls)
+    raise TypeError("No node kind for {t}".format(t=node_type.__name__))
+
+
+# The handler tables of RstRenderer and its subclasses, by class.
+_HANDLER_TABLES = {}
+
+
+class RstRenderer(object):
+    '''Render a syntax tree as reStructuredText into a single sink.
+
+    The tree is walked in document order using an explicit stack rather than
+    recursion, so arbitrarily deep nesting neither exhausts the interpreter
+    stack nor causes the output of descendants to be copied at each level.
+    Plain paragraphs are written directly by the walk. Each other node kind is
+    rendered by a visit_<ClassName> method called when the node is entered,
+    and a depart_<ClassName> method called when it is left, where ClassName
+    is the name of the Node class corresponding to the kind.
+
+    All lines are appended to one list. Nodes which alter the output of their
+    descendants - for example to fold the first line of a description into a
+    field heading - note the length of the list when entered, and rewrite the
+    lines beyond that mark in place when left, so each line is handled a
+    constant number of times however deep the nesting.
+
+    Args:
+        sink: Either a list to which lines will be appended, or an object
+            with a write() method, such as a file or io.StringIO, to which
+            newline terminated lines will be written once each tree has been
+            rendered.
+
+        diagnostics: An optional Diagnostics in which warnings about the
+            docstring are collected. If omitted, warnings are printed to
+            the standard error stream.
+
+        compact: If True, the type of an argument is given in its :param:
+            field rather than in a separate :type: field, runs of blank
+            lines which cannot be significant are collapsed into one, and
+            trailing whitespace is removed from fields. The output is
+            equivalent, but cheaper for docutils and Sphinx to process.
+
+        attributes_style: How the entries of an Attributes block are
+            rendered. DIRECTIVE_ATTRIBUTES renders each as a py:attribute
+            directive, FIELD_ATTRIBUTES as :ivar: and :vartype: fields, and
+            TABLE_ATTRIBUTES as a row of a single cartouche-attributes
+            directive, which builds a table.
+
+        index_attributes: If True, and attributes are not rendered as
+            directives, an index directive with an entry for each attribute
+            precedes the entries of an Attributes block.
+    '''
+
+    def __init__(self, sink, diagnostics=None, compact=False,
+                 attributes_style=DIRECTIVE_ATTRIBUTES, index_attributes=False):
+        if isinstance(sink, list):
+            self._out = sink
+            self._stream = None
+        else:
+            self._out = []
+            self._stream = sink
+        self._written = len(self._out)
+        self._compact = compact
+        self._attributes_style = attributes_style
+        self._index_attributes = index_attributes
+        # The index in the output of the first line written by the innermost
+        # node which rewrites the output of its descendants, below which
+        # ensure_terminal_blank() does not look, and those of its ancestors.
+        self._floor = len(self._out)
+        self._floors = []
+        self._diagnostics = diagnostics
+        self._arena = None
+
+    @classmethod
+    def _handler_table(cls):
+        '''The visit and depart functions for each node kind other than NODE.
+
+        The functions are looked up on the class, rather than bound to the
+        renderer, so that a renderer holds no reference to itself and is
+        freed, together with the tree it rendered, by reference counting.
+        '''
+        try:
+            return _HANDLER_TABLES[cls]
+        except KeyError:
+            table = [(getattr(cls, 'visit_' + node_class.__name__),
+                      getattr(cls, 'depart_' + node_class.__name__))
+                     if node_class is not Node else None
+                     for node_class in NODE_CLASSES]
+            _HANDLER_TABLES[cls] = table
+            return table
+
+    def render(self, tree, index=0, only_child=False):
+        '''Render a node and its descendants.
+
+        Args:
+            tree: An Arena, or the Node at the root of a tree of Node objects.
+
+            index: The index of the node within the Arena to be rendered.
+
+            only_child: True if the node is the only child of its parent.
+        '''
+        if not isinstance(tree, Arena):
+            tree = Arena.from_node(tree)
+            index = 0
+        self._arena = arena = tree
+        out = self._out
+        start = len(out)
+        append = out.append
+        extend = out.extend
+        texts = arena.texts
+        kinds = arena.kind
+        indents = arena.indent
+        line_starts = arena.line_start
+        line_ends = arena.line_end
+        first_child = arena.first_child
+        next_sibling = arena.next_sibling
+        handlers = self._handler_table()
+        root = index
+
+        # The tree is walked depth first. Entering a node with children pushes
+        # (index, only_child, mark, depart), where mark is the value returned
+        # by its visit and depart is None for a plain node, and the entry is
+        # popped once all of its children have been rendered. Only the first
+        # child of a node can be its only child, so the next sibling of a node
+        # is entered with only_child False.
+        stack = []
+        pop = stack.pop
+        push = stack.append
+        while True:
+            kind = kinds[index]
+            child = first_child[index]
+            if kind == NODE:
+                line_start = line_starts[index]
+                line_end = line_ends[index]
+                if line_start != line_end:
+                    indent = indents[index]
+                    if indent:
+                        prefix = ' ' * indent
+                        # Quicker than a comprehension for the few lines of
+                        # a typical paragraph
+                        for text in texts[line_start:line_end]:
+                            append(prefix + text)
+                    else:
+                        extend(texts[line_start:line_end])
+                if child != NIL:
+                    push((index, only_child, None, None))
+                    index = child
+                    only_child = False
+                    continue
+            else:
+                visit, depart = handlers[kind]
+                mark = visit(self, index, only_child)
+                if child != NIL:
+                    push((index, only_child, mark, depart))
+                    only_child = kind == RAISES and next_sibling[child] == NIL
+                    index = child
+                    continue
+                depart(self, index, only_child, mark)
+            # Leave the ancestors which have no further children, until one
+            # of them, or the node itself, has a next sibling.
+            while index != root:
+                sibling = next_sibling[index]
+                if sibling != NIL:
+                    break
+                index, only_child, mark, depart = pop()
+                if depart is not None:
+                    depart(self, index, only_child, mark)
+            else:
+                break
+            index = sibling
+            only_child = False
+        if self._compact:
+            out[start:] = _compacted(out[start:])
+        if self._stream is not None:
+            write = self._stream.write
+            for line in out[self._written:]:
+                write(line + '\n')
+            self._written = len(out)
+
+    def _report(self, message, subject=None):
+        if self._diagnostics is None:
+            print(message, file=sys.stderr)
+        else:
+            self._diagnostics.report(message, subject)
+
+    def _text(self, text_index):
+        return self._arena.texts[text_index] if text_index != NIL else None
+
+    def _ensure_terminal_blank(self):
+        '''If the output of the innermost rewriting node, or of the whole
+        tree, didn't end with a blank line add one here.'''
+        out = self._out
+        if len(out) > self._floor and out[-1].strip():
+            out.append('')
+
+    def _begin(self):
+        '''Start the output of a node which rewrites that of its descendants,
+        returning the mark to be given to _end().'''
+        self._floors.append(self._floor)
+        self._floor = mark = len(self._out)
+        return mark
+
+    def _end(self):
+        '''Finish the output of the innermost node begun with _begin().'''
+        self._floor = self._floors.pop()
+
+    def _fold(self, mark, heading):
+        '''Fold the first line written since a mark into a heading, stripped of
+        its indent, returning that first line, which is empty if there was
+        none.'''
+        out = self._out
+        if len(out) > mark:
+            first = out[mark].lstrip()
+            out[mark] = heading + first
+            return first
+        out.append(heading)
+        return ''
+
+    # Each visit method returns a mark, such as that returned by _begin(),
+    # which is given to the corresponding depart method.
+
+    def visit_Arg(self, index, only_child):
+        return self._begin()
+
+    def _fuses_type(self, name, type):
+        # Only a type which Sphinx would take as plain text may be given with
+        # the name, since the name of a field is parsed differently from its body.
+        # Nor may the type of a starred name, which is escaped in the :param:
+        # field but not in the :type: field, so that in the default style the
+        # type is never attached and must not be in the compact style either.
+        return (self._compact and type is not None and '*' not in name
+                and is_plain_paragraph([type]))
+
+    def depart_Arg(self, index, only_child, mark):
+        arena = self._arena
+        indent = ' ' * arena.indent[index]
+        name = arena.texts[arena.name[index]]
+        type = self._text(arena.type[index])
+        escaped_name = name.replace('*', r'\*')
+        fused = self._fuses_type(name, type)
+        if fused:
+            heading = "{indent}:param {type} {name}: ".format(indent=indent, type=type,
+                                                              name=escaped_name)
+        else:
+            heading = "{indent}:param {name}: ".format(indent=indent, name=escaped_name)
+        first_description = self._fold(mark, heading)
+        self._floor = self._floors.pop()
+        if not first_description:
+            self._report("Missing argument description for {name}".format(name=name), name)
+
+        # If a type was specified render the type, unless it was given with
+        # the name
+        if type is not None and not fused:
+            out = self._out
+            out.append("{indent}:type {name}: {type}".format(indent=indent, name=name, type=type))
+            out.append('')
+
+        self._ensure_terminal_blank()
+
+    def visit_Attribute(self, index, only_child):
+        if self._attributes_style != DIRECTIVE_ATTRIBUTES:
+            arena = self._arena
+            parent = arena.parent[index]
+            if parent == NIL or arena.first_child[parent] == index:
+                self._begin_attributes(index, ' ' * arena.indent[index])
+        return self._begin()
+
+    def _begin_attributes(self, index, indent):
+        '''Write what precedes the first entry of an Attributes block.'''
+        arena = self._arena
+        out = self._out
+        self._ensure_terminal_blank()
+        if self._index_attributes:
+            parent = arena.parent[index]
+            out.append(indent + '.. index::')
+            for sibling in (arena.children(parent) if parent != NIL else (index,)):
+                out.append("{indent}   single: {name} (attribute)".format(
+                    indent=indent, name=self._text(arena.name[sibling])))
+            out.append('')
+        if self._attributes_style == TABLE_ATTRIBUTES:
+            out.append("{indent}.. {directive}::".format(indent=indent,
+                                                        directive=ATTRIBUTES_DIRECTIVE))
+            out.append('')
+
+    def depart_Attribute(self, index, only_child, mark):
+        arena = self._arena
+        out = self._out
+        style = self._attributes_style
+        indent = ' ' * arena.indent[index]
+        name = self._text(arena.name[index])
+        type = self._text(arena.type[index])
+        if style == DIRECTIVE_ATTRIBUTES:
+            self._render_attribute_directive(mark, name, type)
+        elif style == TABLE_ATTRIBUTES:
+            if type is None:
+                heading = "{indent}   :{name}: ".format(indent=indent, name=name)
+            else:
+                heading = "{indent}   :{name} ({type}): ".format(indent=indent, name=name, type=type)
+            self._fold(mark, heading)
+            # The remaining lines are further indented, keeping their indents
+            # relative to one another, so that they remain within the content
+            # of the directive.
+            out[mark + 1:] = ['   ' + line if line.strip() else '' for line in out[mark + 1:]]
+        else:
+            escaped_name = name.replace('*', r'\*')
+            if self._fuses_type(name, type):
+                heading = "{indent}:ivar {type} {name}: ".format(indent=indent, type=type,
+                                                                 name=escaped_name)
+            else:
+                heading = "{indent}:ivar {name}: ".format(indent=indent, name=escaped_name)
+            self._fold(mark, heading)
+        self._end()
+        if style == FIELD_ATTRIBUTES and type is not None and not self._fuses_type(name, type):
+            out.append("{indent}:vartype {name}: {type}".format(indent=indent, name=name,
+                                                                type=type))
+            out.append('')
+        self._ensure_terminal_blank()
+
+    def _render_attribute_directive(self, mark, name, type):
+        '''Render the description written since a mark beneath a py:attribute
+        directive.'''
+        out = self._out
+        directive = ".. py:attribute:: {name}".format(name=name)
+        if len(out) > mark:
+            description = out[mark:]
+            if type is not None:
+                description[0] = "({t}) {desc}".format(t=type, desc=description[0].lstrip())
+            # The description lines should be indented by three characters to
+            # line up with the directive.
+            out[mark:] = [directive, ''] + ["   " + line.lstrip() for line in description]
+        else:
+            out.append(directive)
+            if type is not None:
+                out.append('')
+                out.append("   ({t})".format(t=type))
+
+    def visit_Raises(self, index, only_child):
+        self._out.append(' ' * self._arena.indent[index] + ':raises:')
+
+    def depart_Raises(self, index, only_child, mark):
+        self._ensure_terminal_blank()
+
+    def visit_Except(self, index, only_child):
+        return self._begin()
+
+    def depart_Except(self, index, only_child, mark):
+        arena = self._arena
+        bullet = '* ' if not only_child else ''
+        type = self._text(arena.type[index])
+        heading = "{indent}{bullet}{type} - ".format(indent=' ' * arena.indent[index],
+                                                     bullet=bullet, type=type)
+        if not self._depart_described(mark, heading):
+            self._report("Missing exception description for {type}".format(type=type), type)
+
+    def _depart_described(self, mark, heading):
+        '''Fold the description written since a mark into a heading, returning
+        the first line of the description, which is empty if there was none.'''
+        first_description = self._fold(mark, heading)
+        self._floor = self._floors.pop()
+        self._ensure_terminal_blank()
+        return first_description
+
+    def visit_Returns(self, index, only_child):
+        mark = self._begin()
+        arena = self._arena
+        line = self._text(arena.line[index])
+        if line:
+            self._out.append(line)
+        return mark
+
+    def depart_Returns(self, index, only_child, mark):
+        # An empty Returns: or Yields: block is not reported
+        heading = "{indent}:returns: ".format(indent=' ' * self._arena.indent[index])
+        self._depart_described(mark, heading)
+
+    visit_Yields = visit_Returns
+
+    depart_Yields = depart_Returns
+
+    def visit_Warning(self, index, only_child):
+        self._visit_admonition(index, 'warning')
+
+    def depart_Warning(self, index, only_child, mark):
+        self._ensure_terminal_blank()
+
+    def visit_Note(self, index, only_child):
+        self._visit_admonition(index, 'note')
+
+    depart_Note = depart_Warning
+
+    def visit_Admonition(self, index, only_child):
+        self._visit_admonition(index, self._text(self._arena.type[index]))
+
+    depart_Admonition = depart_Warning
+
+    def _visit_admonition(self, index, directive):
+        indent = ' ' * self._arena.indent[index]
+        line = self._text(self._arena.line[index])
+        out = self._out
+        out.append(indent + ".. {directive}::".format(directive=directive))
+        out.append(indent + '')
+        if line:
+            out.append(indent + '    ' + line)
+
+    def visit_Usage(self, index, only_child):
+        return self._begin()
+
+    def depart_Usage(self, index, only_child, mark):
+        output = self._out
+        description = output[mark:]
+        del output[mark:]
+        self._end()
+        indent = ' ' * self._arena.indent[index]
         if len(description) > 0:
             minimum_code_indent = min(len(codeline) - len(codeline.lstrip()) for codeline in description if not codeline.isspace())
             codelines = [codeline[minimum_code_indent:] for codeline in description]
 
-            result.append(indent + ".. rubric:: Usage:")
-            result.append('')
-            result.append(indent + '.. code-block:: {lang}'.format(lang=self.lang))
-            result.append('')
+            output.append(indent + ".. rubric:: Usage:")
+            output.append('')
+            output.append(indent + '.. code-block:: {lang}'.format(lang=self._text(self._arena.type[index])))
+            output.append('')
             for codeline in codelines:
-                result.append(indent + '   ' + codeline)
+                output.append(indent + '   ' + codeline)
+            self._ensure_terminal_blank()
         else:
-            print("No code in Usage block. Skipping!", file=sys.stderr)
+            self._report("No code in Usage block. Skipping!", 'Usage:')
+
+
+def _compacted(lines):
+    '''Collapse runs of blank lines where they cannot be significant, and
+    remove trailing whitespace from fields.
+
+    A run of blank lines followed by an unindented line, or by nothing, ends
+    any indented block such as a literal block, so is replaced by a single
+    empty line. Other runs are kept unchanged.
+    '''
+    result = []
+    blanks = []
+    for line in lines:
+        if not line.strip():
+            blanks.append(line)
+            continue
+        if blanks:
+            if line[0] == ' ':
+                result.extend(blanks)
+            else:
+                result.append('')
+            blanks = []
+        if line[0] == ':':
+            line = line.rstrip()
+        result.append(line)
+    if blanks:
+        result.append('')
+    return result
 
-        ensure_terminal_blank(result)
-        return result
 
 def ensure_terminal_blank(result):
     '''If the description didn't end with a blank line add one here.'''
@@ -1,27 +1,342 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function
+from collections import Counter, namedtuple
 from contextlib import contextmanager
+from itertools import chain, islice
 
+import os
 import re
+import sys
+import threading
+import time
 from cartouche._portability import u
 
+from .cache import ParseMemo, render_digest
+from .diagnostics import Diagnostic, Diagnostics, ERROR, locate
 from .errors import CartoucheError
+from .fields import wrap_fields
 
-from .nodes import (Node, Raises, Except, Note, Warning, Returns, Arg, Yields,
-                    Attribute, Usage, ensure_terminal_blank)
+from .nodes import (Node, Arena, RstRenderer, NIL, NODE, ARG, ATTRIBUTE,
+                    RAISES, EXCEPT, RETURNS, YIELDS, WARNING, NOTE, USAGE,
+                    ADMONITION, DIRECTIVE_ATTRIBUTES, ATTRIBUTES_STYLES,
+                    ensure_terminal_blank)
 
 OPTIONAL_BULLET_PATTERN = u(r'(?:[\*\+\-\•\‣\⁃]\s+)?')
 ARGS_PATTERN = u(r'(\*{0,2}\w+)(\s+\(([\.\w]+)\))?\s*:\s*(.*)')
 ATTRIBUTES_PATTERN = u(r'(\*{0,2}\w+)(\s+\(([\.\w]+)\))?\s*:\s*(.*)')
 RAISES_PATTERN = u(r'([\w\.]+)\s*:\s*(.*)')
 
-ARGS_REGEX = re.compile(ARGS_PATTERN)
-ATTRIBUTES_REGEX = re.compile(ATTRIBUTES_PATTERN)
-RAISES_REGEX = re.compile(RAISES_PATTERN)
-
 class CartoucheSyntaxError(CartoucheError):
+    '''Raised when a docstring cannot be parsed.
+
+    Attributes:
+        text: The line of the docstring which could not be parsed, if known,
+            otherwise None.
+    '''
+    text = None
+
+
+class CartoucheLimitError(CartoucheError):
+    '''Raised when a docstring exceeds one of the limits of a parser, in
+    which case it should be used unconverted.'''
     pass
 
+
+LINES_LIMIT_EXCEEDED = "Docstring left unconverted, having {count} lines, more than the limit of {limit}"
+DEPTH_LIMIT_EXCEEDED = "Docstring left unconverted, being nested more than {limit} levels deep"
+TIME_LIMIT_EXCEEDED = "Docstring left unconverted, taking more than {limit} seconds to convert"
+
+
+class CartoucheParser(object):
+    '''A converter from cartouche format docstrings to reStructuredText.
+
+    Each parser holds its own compiled patterns and section registry, and is
+    not modified by parsing, so any number of parsers with differing
+    configurations may be used concurrently from any number of threads.
+
+    Args:
+        bulleted_args: If True, entries in Args blocks may be introduced by a
+            bullet.
+
+        bulleted_raises: If True, entries in Raises blocks may be introduced
+            by a bullet.
+
+        sections: An optional SectionRegistry of the sections to be
+            recognised. Defaults to the built-in sections. The registry should
+            not be modified once the parser is in use.
+
+        recover: If True, a section which cannot be parsed is reported as an
+            error and left as plain text, and parsing continues, rather than
+            CartoucheSyntaxError being raised.
+
+        max_lines: The optional greatest number of lines in a docstring which
+            will be converted.
+
+        max_depth: The optional greatest depth to which the paragraphs of a
+            docstring which will be converted may be nested, with the
+            unindented paragraphs being at depth one.
+
+        max_time: The optional greatest time in seconds which may be spent
+            converting a docstring. The time is checked between the
+            conversion of each paragraph, so may be exceeded by the time
+            taken to convert one paragraph and to render the result.
+
+        compact: If True, render in a compact style which is equivalent for
+            Sphinx but cheaper for it to process, with the type of each
+            argument given in its :param: field where possible, and without
+            runs of blank lines which cannot be significant.
+
+        attributes_style: How the entries of Attributes blocks are rendered.
+            One of 'directive', for a py:attribute directive each, 'fields',
+            for :ivar: and :vartype: fields, or 'table', for a single
+            list-table.
+
+        index_attributes: If True, and attributes are not rendered as
+            directives, an index entry is made for each attribute.
+
+    Docstrings which exceed a limit cause CartoucheLimitError to be raised.
+    Since such docstrings are never converted, the limits do not affect the
+    output of the parser for any other docstring.
+    '''
+
+    def __init__(self, bulleted_args=False, bulleted_raises=False, sections=None, recover=False,
+                 max_lines=None, max_depth=None, max_time=None, compact=False,
+                 attributes_style=DIRECTIVE_ATTRIBUTES, index_attributes=False):
+        if attributes_style not in ATTRIBUTES_STYLES:
+            raise CartoucheError("Cartouche: Unknown attributes style {style!r}, expected one of "
+                                 "{styles}".format(style=attributes_style,
+                                                   styles=', '.join(map(repr, ATTRIBUTES_STYLES))))
+        self.bulleted_args = bulleted_args
+        self.bulleted_raises = bulleted_raises
+        self.recover = recover
+        self.max_lines = max_lines
+        self.max_depth = max_depth
+        self.max_time = max_time
+        self.compact = compact
+        self.attributes_style = attributes_style
+        self.index_attributes = index_attributes
+        self.sections = sections if sections is not None else DEFAULT_SECTIONS
+        self.args_regex = re.compile(
+            (OPTIONAL_BULLET_PATTERN if bulleted_args else '') + ARGS_PATTERN)
+        self.attributes_regex = re.compile(ATTRIBUTES_PATTERN)
+        self.raises_regex = re.compile(
+            (OPTIONAL_BULLET_PATTERN if bulleted_raises else '') + RAISES_PATTERN)
+        self.prescan_regex = re.compile(self.sections.prescan_pattern())
+
+    def __repr__(self):
+        return ("CartoucheParser(bulleted_args={0!r}, bulleted_raises={1!r}, sections={2!r}, "
+                "recover={3!r}, max_lines={4!r}, max_depth={5!r}, max_time={6!r}, compact={7!r}, attributes_style={8!r}, "
+                "index_attributes={9!r})").format(
+                    self.bulleted_args, self.bulleted_raises, self.sections.headings(),
+                    self.recover, self.max_lines, self.max_depth, self.max_time, self.compact,
+                    self.attributes_style, self.index_attributes)
+
+    def replace(self, **changes):
+        '''A new parser with the same configuration, except for the given
+        keyword arguments.'''
+        arguments = dict(bulleted_args=self.bulleted_args,
+                         bulleted_raises=self.bulleted_raises,
+                         sections=self.sections,
+                         recover=self.recover,
+                         max_lines=self.max_lines,
+                         max_depth=self.max_depth,
+                         max_time=self.max_time,
+                         compact=self.compact,
+                         attributes_style=self.attributes_style,
+                         index_attributes=self.index_attributes)
+        arguments.update(changes)
+        return CartoucheParser(**arguments)
+
+    def configuration(self):
+        '''The configuration of the parser as a tuple of strings.
+
+        Two parses of the same docstring by parsers with equal configurations
+        produce the same output, so the configuration forms part of the render
+        cache key.
+        '''
+        configuration = ((self.args_regex.pattern, self.attributes_regex.pattern,
+                          self.raises_regex.pattern)
+                         + self.sections.fingerprint())
+        if self.recover:
+            configuration += ('recover',)
+        if self.compact:
+            configuration += ('compact',)
+        if self.attributes_style != DIRECTIVE_ATTRIBUTES:
+            configuration += ('attributes=' + self.attributes_style,)
+            if self.index_attributes:
+                configuration += ('index_attributes',)
+        return configuration
+
+    def renderer(self, sink, diagnostics=None):
+        '''An RstRenderer which renders in the style configured for the
+        parser.
+
+        Args:
+            sink: A list, or an object with a write() method, to which the
+                rendered lines will be written.
+
+            diagnostics: An optional Diagnostics in which warnings about the
+                docstring are collected.
+        '''
+        # Positional arguments are quicker to pass, for every docstring.
+        return RstRenderer(sink, diagnostics, self.compact, self.attributes_style,
+                           self.index_attributes)
+
+    def parse(self, lines, diagnostics=None):
+        '''Parse text in cartouche format and return a reStructuredText equivalent.
+
+        Args:
+            lines: A sequence of strings representing the lines of a single
+                docstring.
+
+            diagnostics: An optional Diagnostics in which warnings about the
+                docstring, and errors from which the parser recovered, are
+                collected. If omitted, they are printed to the standard error
+                stream.
+
+        Returns:
+            A list of lines containing the transformed docstring as
+            reStructuredText.
+
+        Raises:
+            CartoucheSyntaxError: If the docstring cannot be parsed, unless
+                the parser recovers from errors.
+
+            CartoucheLimitError: If the docstring needs conversion but
+                exceeds one of the limits of the parser.
+        '''
+        if self.is_plain(lines):
+            return unconverted(lines)
+        deadline = self.deadline()
+        self.check_lines(lines)
+        indent_paragraphs = iter_paragraphs(lines)
+        parse_tree = group_paragraphs_in_arena(indent_paragraphs, self.max_depth)
+        syntax_tree = self.convert(parse_tree, diagnostics=diagnostics, deadline=deadline)
+        result = []
+        self.renderer(result, diagnostics).render(syntax_tree)
+        ensure_terminal_blank(result)
+        return result
+
+    def is_plain(self, lines):
+        '''Determine cheaply whether a docstring needs no conversion.
+
+        A docstring needs no conversion if no line begins with a registered
+        section heading, and the first line need not be indented to match
+        the second. Such a docstring converts to the same lines, other than
+        whitespace on blank lines, with a terminal blank line ensured. Lines
+        containing tabs are always converted.
+
+        Args:
+            lines: A sequence of strings representing the lines of a single
+                docstring.
+
+        Returns:
+            True if the lines may be used as they are.
+        '''
+        if (len(lines) > 1 and lines[1][:1] == ' ' and lines[1].strip()
+                and lines[0][:1] not in (' ', '\t')):
+            return False
+        # Each line, including the first, is preceded by a newline.
+        text = '\n' + '\n'.join(lines)
+        return '\t' not in text and self.prescan_regex.search(text) is None
+
+    def check_lines(self, lines):
+        '''Raise CartoucheLimitError if a docstring has too many lines.'''
+        if self.max_lines is not None and len(lines) > self.max_lines:
+            raise CartoucheLimitError(LINES_LIMIT_EXCEEDED.format(count=len(lines),
+                                                                  limit=self.max_lines))
+
+    def deadline(self):
+        '''The time, as given by time.perf_counter(), by which a conversion
+        starting now must be complete, or None if there is no time limit.'''
+        if self.max_time is None:
+            return None
+        return time.perf_counter() + self.max_time
+
+    def convert(self, arena, root=0, diagnostics=None, deadline=None):
+        '''Convert a parse tree held in an Arena into a syntax tree, in place.
+
+        Headed paragraphs such as Args: are converted into the corresponding
+        syntax nodes, and the children of plain paragraphs are converted in
+        turn. Paragraphs are converted in document order, without recursion.
+
+        Args:
+            arena: The Arena holding the parse tree.
+
+            root: The index of the node at the root of the tree.
+
+            diagnostics: An optional Diagnostics in which errors from which
+                the parser recovered are collected.
+
+            deadline: An optional time, as given by time.perf_counter(), by
+                which the conversion must be complete. See deadline().
+
+        Returns:
+            The Arena.
+
+        Raises:
+            CartoucheLimitError: If the deadline passes before the conversion
+                is complete.
+        '''
+        first_child = arena.first_child
+        next_sibling = arena.next_sibling
+        convert_node = self.convert_node
+        # A converter changes only the children of the node it converts, so
+        # the next sibling of a node is pushed beneath its first child.
+        pending = [root]
+        while pending:
+            if deadline is not None and time.perf_counter() > deadline:
+                raise CartoucheLimitError(TIME_LIMIT_EXCEEDED.format(limit=self.max_time))
+            index = pending.pop()
+            if index != root:
+                sibling = next_sibling[index]
+                if sibling != NIL:
+                    pending.append(sibling)
+            if convert_node(arena, index, diagnostics):
+                child = first_child[index]
+                if child != NIL:
+                    pending.append(child)
+        return arena
+
+    def convert_node(self, arena, index, diagnostics=None):
+        '''Convert a single node of a parse tree, in place.
+
+        The text before the first colon of the first line of the node is
+        looked up in the section registry, and if found, the node is
+        converted by the registered converter. A converter which raises
+        CartoucheSyntaxError must do so before modifying the arena, so that
+        a parser which recovers from errors can leave the section, with its
+        children, as plain text.
+
+        Returns:
+            True if the node is a plain paragraph, the children of which must
+            themselves be converted, otherwise False.
+        '''
+        line_start = arena.line_start[index]
+        if arena.indent[index] == 0 and line_start == arena.line_end[index]:
+            return True
+        first_line = arena.texts[line_start]
+        colon = first_line.find(':')
+        if colon < 0:
+            return True
+        converter = self.sections.lookup(first_line[:colon])
+        if converter is None:
+            return True
+        if not self.recover:
+            converter(self, arena, index)
+            return False
+        try:
+            converter(self, arena, index)
+        except CartoucheSyntaxError as syntax_error:
+            message = str(syntax_error)
+            subject = syntax_error.text.strip() if syntax_error.text else first_line.strip()
+            if diagnostics is None:
+                print(message, file=sys.stderr)
+            else:
+                diagnostics.report(message, subject, ERROR)
+        return False
+
+
 def parse_cartouche_text(lines):
     '''Parse text in cartouche format and return a reStructuredText equivalent
 
@@ -37,17 +352,191 @@ def parse_cartouche_text(lines):
     Raises:
         RuntimeError: If the docstring cannot be parsed.
     '''
-    indent_lines = unindent(lines)
-    indent_lines = pad_blank_lines(indent_lines)
-    indent_lines = first_paragraph_indent(indent_lines)
-    indent_paragraphs = gather_lines(indent_lines)
-    parse_tree = group_paragraphs(indent_paragraphs)
-    syntax_tree = extract_structure(parse_tree)
-    result = syntax_tree.render_rst()
+    return _default_parser.parse(lines)
+
+
+ParseResult = namedtuple('ParseResult', ['lines', 'error', 'diagnostics', 'limited'],
+                         defaults=((), False))
+ParseResult.__doc__ = '''The outcome of parsing one docstring with parse_many().
+
+Attributes:
+    lines: A list of lines containing the transformed docstring as
+        reStructuredText, or None if the docstring could not be parsed.
+
+    error: The CartoucheSyntaxError raised for the docstring, or None.
+
+    diagnostics: A tuple of Diagnostic, being warnings about the docstring.
+        A docstring which exceeds the limits of the parser is passed through
+        unconverted, with a warning.
+
+    limited: True if the docstring exceeded the limits of the parser.
+'''
+
+# Batches with fewer docstrings than this are parsed in-process, since for
+# them starting a pool of workers costs more than it saves.
+PARALLEL_THRESHOLD = 2000
+
+
+def parse_many(docstrings, workers=None, chunksize=256, parser=None,
+               threshold=PARALLEL_THRESHOLD):
+    '''Parse many docstrings, yielding the results in input order.
+
+    Small batches are parsed in the calling process. Larger batches are
+    distributed in chunks over a pool of worker processes, and the results
+    are streamed back as they complete, so the docstrings may be produced
+    by a generator and the results consumed while parsing continues.
+
+    A docstring which cannot be parsed does not abort the batch. Its
+    result carries the error instead.
+
+    Args:
+        docstrings: An iterable series of sequences of strings, each being
+            the lines of a single docstring.
+
+        workers: The number of worker processes. Defaults to the number of
+            CPUs. If 1, all docstrings are parsed in-process, each as
+            soon as it is produced.
+
+        chunksize: The number of docstrings sent to a worker at a time.
+
+        parser: An optional CartoucheParser. Defaults to the default parser.
+            It is sent to each worker process, so must be picklable.
+
+        threshold: The number of docstrings below which the batch is parsed
+            in-process.
+
+    Yields:
+        A ParseResult for each docstring, in the same order as docstrings.
+    '''
+    if parser is None:
+        parser = _default_parser
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1:
+        # Without reading ahead, so that each result is produced as soon as
+        # its docstring is available.
+        for lines in docstrings:
+            yield _parse_result(parser, lines)
+        return
+    docstrings = iter(docstrings)
+    head = list(islice(docstrings, threshold))
+    if len(head) < threshold:
+        for lines in chain(head, docstrings):
+            yield _parse_result(parser, lines)
+        return
+
+    import multiprocessing
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(parser,)) as pool:
+        for result in pool.imap(_parse_in_worker, chain(head, docstrings), chunksize):
+            yield result
+
+
+def _parse_result(parser, lines):
+    diagnostics = Diagnostics()
+    try:
+        return ParseResult(parser.parse(lines, diagnostics), None, tuple(diagnostics))
+    except CartoucheSyntaxError as syntax_error:
+        return ParseResult(None, syntax_error)
+    except CartoucheLimitError as limit_error:
+        return ParseResult(unconverted(lines), None, (Diagnostic(str(limit_error), None),), True)
+
+
+def unconverted(lines):
+    '''The lines of a docstring as they are, with a terminal blank line.'''
+    result = list(lines)
     ensure_terminal_blank(result)
     return result
 
 
+_worker_parser = None
+
+
+def _init_worker(parser):
+    global _worker_parser
+    _worker_parser = parser
+
+
+def _parse_in_worker(lines):
+    return _parse_result(_worker_parser, lines)
+
+
+def default_parser():
+    '''The parser used by the module level functions of cartouche.parser.'''
+    return _default_parser
+
+
+def set_default_parser(parser):
+    '''Replace the parser used by the module level functions.
+
+    Returns:
+        The previous default parser.
+    '''
+    global _default_parser
+    previous = _default_parser
+    _default_parser = parser
+    return previous
+
+
+def iter_paragraphs(lines):
+    '''Tokenize the lines of a docstring into paragraphs of consistent indent.
+
+    This is a single streaming pass equivalent to applying unindent(),
+    pad_blank_lines(), first_paragraph_indent() and gather_lines() in turn,
+    but without materialising the intermediate lists. Only the first two
+    lines are read ahead, to determine the opening indent.
+
+    Args:
+        lines: An iterable of strings representing the lines of text in a
+            docstring.
+
+    Yields:
+        A sequence of 2-tuples, each containing the integer indent of a
+        paragraph as the first element and the list of its unindented lines
+        as the second element.
+    '''
+    lines = iter(lines)
+    head = list(islice(lines, 2))
+    opening_indent = determine_opening_indent(pad_blank_lines(unindent(head)))
+
+    current_indent = 0
+    in_first_paragraph = True
+    previous_indent = -1
+    paragraph = None
+    split_pending = False
+    for line in chain(head, lines):
+        text = line.lstrip()
+        if text:
+            current_indent = len(line) - len(text)
+        indent = current_indent
+
+        if in_first_paragraph:
+            if indent == 0:
+                indent = opening_indent
+            else:
+                in_first_paragraph = False
+
+        if indent != previous_indent:
+            # The first line of a run at a new indent never ends a paragraph,
+            # even when it is blank.
+            if paragraph is not None:
+                yield previous_indent, paragraph
+            paragraph = [text]
+            previous_indent = indent
+            split_pending = False
+        else:
+            # A blank line within a run ends its paragraph, but only if
+            # another line at the same indent follows it.
+            if split_pending:
+                yield indent, paragraph
+                paragraph = [text]
+            else:
+                paragraph.append(text)
+            split_pending = not text
+
+    if paragraph is not None:
+        yield previous_indent, paragraph
+
+
 def unindent(lines):
     '''Convert an iterable of indented lines into a sequence of tuples.
 
@@ -94,190 +583,311 @@ def extract_structure(parse_tree):
     '''Create an Abstract Syntax Tree representing the semantics of a parse tree.
 
     Args:
-        parse_tree: TODO
+        parse_tree: Either an Arena, as produced by group_paragraphs_in_arena(),
+            which will be converted in place, or the root Node of a tree as
+            produced by group_paragraphs().
 
     Returns:
-        A Node with is the result of an Abstract Syntax Tree representing the
-        docstring.
+        For an Arena, the same Arena. For a Node, a new Node which is the root
+        of an Abstract Syntax Tree representing the docstring.
 
     Raises:
         CartoucheError: In the event that the parse tree cannot be understood.
     '''
-    return convert_node(parse_tree)
-
-
-def convert_node(node):
-    if node.indent == 0 and len(node.lines) == 0:
-        return convert_children(node)
-    if node.lines[0].startswith('Args:'):
-        return convert_args(node)
-    if node.lines[0].startswith('Returns:'):
-        return convert_returns(node)
-    if node.lines[0].startswith('Yields:'):
-        return convert_yields(node)
-    if node.lines[0].startswith('Raises:'):
-        return convert_raises(node)
-    if node.lines[0].startswith('Note:'):
-        return convert_note(node)
-    if node.lines[0].startswith('Warning:'):
-        return convert_warning(node)
-    if node.lines[0].startswith('Attributes:'):
-        return convert_attributes(node)
-    if node.lines[0].startswith('Usage:'):
-        return convert_usage(node)
-    result = convert_children(node)
-    result.lines = node.lines
-    result.indent = node.indent
-    return result
+    if isinstance(parse_tree, Arena):
+        return _default_parser.convert(parse_tree)
+    arena = Arena.from_node(parse_tree)
+    _default_parser.convert(arena)
+    return arena.to_node()
 
 
-def convert_children(node):
-    converted_children = [convert_node(child) for child in node.children]
-    result = Node()
-    result.children = converted_children
-    return result
+def convert_arena(arena, root=0):
+    '''Convert a parse tree held in an Arena into a syntax tree, in place,
+    using the default parser.'''
+    return _default_parser.convert(arena, root)
+
+
+def convert_node(arena, index):
+    '''Convert a single node of a parse tree, in place, using the default
+    parser.'''
+    return _default_parser.convert_node(arena, index)
+
 
+def convert_to_group(arena, index):
+    '''Turn a node into an anonymous group, returning its former children.'''
+    children = arena.detach_children(index)
+    arena.kind[index] = NODE
+    arena.indent[index] = 0
+    arena.line_end[index] = arena.line_start[index]
+    return children
 
-def append_child_to_args_group_node(child, group_node, indent):
-    arg = None
-    non_empty_lines = (line for line in child.lines if line)
-    for line in non_empty_lines:
-        m = ARGS_REGEX.match(line)
+
+def convert_to_headed(arena, index, kind):
+    '''Turn a node into a syntax node with the text following its heading.'''
+    arena.kind[index] = kind
+    heading = arena.texts[arena.line_start[index]]
+    arena.line[index] = arena.add_text(heading.partition(':')[2].strip())
+
+
+ARGS_SYNTAX_ERROR = 'Cartouche: Invalid argument syntax "{line}" for Args block'
+ATTRIBUTES_SYNTAX_ERROR = 'Cartouche: Invalid attribute syntax "{line}" for Attributes block'
+RAISES_SYNTAX_ERROR = 'Cartouche: Invalid argument syntax "{line}" for Raises block'
+
+
+def match_lines(arena, child, regex, message):
+    '''Match a pattern against each non-empty line of a paragraph.
+
+    Converters match all of the lines of a section before modifying the
+    arena, so that a section containing a syntax error is left unchanged.
+
+    Args:
+        arena: The Arena holding the paragraph.
+
+        child: The index of the paragraph.
+
+        regex: The compiled pattern which each line must match.
+
+        message: The message of the error raised for a line which does not
+            match, in which {line} is replaced by the line.
+
+    Returns:
+        A list of the match objects.
+
+    Raises:
+        CartoucheSyntaxError: If any line does not match.
+    '''
+    matches = []
+    for line in arena.lines(child):
+        if not line:
+            continue
+        m = regex.match(line)
         if m is None:
-            raise CartoucheSyntaxError('Cartouche: Invalid argument syntax "{line}" for Args block'.format(line=line))
+            syntax_error = CartoucheSyntaxError(message.format(line=line))
+            syntax_error.text = line
+            raise syntax_error
+        matches.append(m)
+    return matches
+
+
+def append_child_to_args_group_node(parser, arena, child, group_node, indent, matches=None):
+    if matches is None:
+        matches = match_lines(arena, child, parser.args_regex, ARGS_SYNTAX_ERROR)
+    arg = NIL
+    for m in matches:
         param_name = m.group(1)
         param_type = m.group(3)
         param_text = m.group(4)
 
-        arg = Arg(indent, param_name)
-        group_node.children.append(arg)
-        arg.type = param_type
+        arg = arena.add(ARG, indent, group_node, name=param_name, type=param_type)
 
         if param_text is not None:
-            arg.children.append(Node(indent, [param_text], arg))
-    if arg is not None:
-        last_child = arg.children[-1] if len(arg.children) != 0 else arg
-        for grandchild in child.children:
-            last_child.children.append(grandchild)
-
-
-def append_child_to_attributes_group_node(child, group_node, indent):
-    attribute = None
-    non_empty_lines = (line for line in child.lines if line)
-    for line in non_empty_lines:
-        m = ATTRIBUTES_REGEX.match(line)
-        if m is None:
-            raise CartoucheSyntaxError('Cartouche: Invalid attribute syntax "{line}" for Attributes block'.format(line=line))
+            arena.add(NODE, indent, arg, [param_text])
+    if arg != NIL:
+        last_child = arena.last_child[arg] if arena.last_child[arg] != NIL else arg
+        arena.move_children(child, last_child)
+
+
+def append_child_to_attributes_group_node(parser, arena, child, group_node, indent, matches=None):
+    if matches is None:
+        matches = match_lines(arena, child, parser.attributes_regex, ATTRIBUTES_SYNTAX_ERROR)
+    attribute = NIL
+    for m in matches:
         attribute_name = m.group(1)
         attribute_type = m.group(3)
         attribute_text = m.group(4)
 
-        attribute = Attribute(indent, attribute_name)
-        group_node.children.append(attribute)
-        attribute.type = attribute_type
+        attribute = arena.add(ATTRIBUTE, indent, group_node,
+                              name=attribute_name, type=attribute_type)
 
         if attribute_text is not None:
-            attribute.children.append(Node(indent, [attribute_text], attribute))
-    if attribute is not None:
-        last_child = attribute.children[-1] if len(attribute.children) != 0 else attribute
-        for grandchild in child.children:
-            last_child.children.append(grandchild)
+            arena.add(NODE, indent, attribute, [attribute_text])
+    if attribute != NIL:
+        last_child = arena.last_child[attribute] if arena.last_child[attribute] != NIL else attribute
+        arena.move_children(child, last_child)
+
+
+def convert_args(parser, arena, index):
+    indent = arena.indent[index]
+    matches = [match_lines(arena, child, parser.args_regex, ARGS_SYNTAX_ERROR)
+               for child in arena.children(index)]
+    for child, child_matches in zip(convert_to_group(arena, index), matches):
+        append_child_to_args_group_node(parser, arena, child, index, indent, child_matches)
+
+
+def convert_returns(parser, arena, index):
+    convert_to_headed(arena, index, RETURNS)
+
 
+def convert_yields(parser, arena, index):
+    convert_to_headed(arena, index, YIELDS)
 
-def convert_args(node):
-    assert node.lines[0].startswith('Args:')
-    group_node = Node()
-    for child in node.children:
-        append_child_to_args_group_node(child, group_node, node.indent)
-    return group_node
 
+def convert_note(parser, arena, index):
+    convert_to_headed(arena, index, NOTE)
 
-def convert_returns(node):
-    assert node.lines[0].startswith('Returns:')
-    returns = Returns(node.indent)
-    returns.line = node.lines[0][8:].strip()
-    returns.children = node.children
-    return returns
 
+def convert_warning(parser, arena, index):
+    convert_to_headed(arena, index, WARNING)
 
-def convert_yields(node):
-    assert node.lines[0].startswith('Yields:')
-    returns = Yields(node.indent)
-    returns.line = node.lines[0][8:].strip()
-    returns.children = node.children
-    return returns
 
+def convert_raises(parser, arena, index):
+    matches = [match_lines(arena, child, parser.raises_regex, RAISES_SYNTAX_ERROR)
+               for child in arena.children(index)]
+    children = arena.detach_children(index)
+    arena.kind[index] = RAISES
+    for child, child_matches in zip(children, matches):
+        append_child_to_raise_node(parser, arena, child, index, child_matches)
 
-def convert_note(node):
-    assert node.lines[0].startswith('Note:')
-    note = Note(node.indent)
-    note.line = node.lines[0][5:].strip()
-    note.children = node.children
-    return note
 
+def convert_attributes(parser, arena, index):
+    indent = arena.indent[index]
+    matches = [match_lines(arena, child, parser.attributes_regex, ATTRIBUTES_SYNTAX_ERROR)
+               for child in arena.children(index)]
+    for child, child_matches in zip(convert_to_group(arena, index), matches):
+        append_child_to_attributes_group_node(parser, arena, child, index, indent, child_matches)
 
-def convert_warning(node):
-    assert node.lines[0].startswith('Warning:')
-    warning = Warning(node.indent)
-    warning.line = node.lines[0][8:].strip()
-    warning.children = node.children
-    return warning
 
+def convert_usage(parser, arena, index):
+    arena.kind[index] = USAGE
+    arena.type[index] = arena.add_text('python')
 
-def convert_raises(node):
-    assert node.lines[0].startswith('Raises:')
-    group_node = Raises(node.indent)
-    for child in node.children:
-        append_child_to_raise_node(child, group_node)
-    return group_node
 
+class AdmonitionConverter(object):
+    '''Converts a headed section into an admonition directive.
 
-def convert_attributes(node):
-    assert node.lines[0].startswith('Attributes:')
-    group_node = Node()
-    for child in node.children:
-        append_child_to_attributes_group_node(child, group_node, node.indent)
-    return group_node
+    Args:
+        directive: The name of the reStructuredText admonition directive, such
+            as 'seealso' or 'todo', with which the section will be rendered.
+    '''
+
+    def __init__(self, directive):
+        self.directive = directive
+
+    def __call__(self, parser, arena, index):
+        convert_to_headed(arena, index, ADMONITION)
+        arena.type[index] = arena.add_text(self.directive)
 
+    def __repr__(self):
+        return "AdmonitionConverter(" + repr(self.directive) + ")"
 
-def convert_usage(node):
-    assert node.lines[0].startswith('Usage:')
-    usage = Usage(node.indent)
-    usage.children = node.children
-    return usage
 
+class SectionRegistry(object):
+    '''A mapping from section headings to the converters which handle them.
+
+    A section is a paragraph the first line of which begins with a heading
+    followed by a colon, such as 'Args:'. The heading is looked up directly,
+    so the cost of recognising a section, or of rejecting a paragraph which is
+    not one, does not depend on the number of headings registered.
+
+    Each converter is a callable accepting the CartoucheParser in use, an
+    Arena and the index of the node to be converted in place.
+
+    Args:
+        converters: An optional mapping from headings, without the trailing
+            colon, to converters.
+    '''
 
-def parse_exception(line):
+    def __init__(self, converters=None):
+        self._converters = dict(converters) if converters is not None else {}
+
+    def __contains__(self, heading):
+        return heading in self._converters
+
+    def lookup(self, heading):
+        '''The converter for a heading, or None if it is not registered.'''
+        return self._converters.get(heading)
+
+    def headings(self):
+        '''A sorted list of the registered headings.'''
+        return sorted(self._converters)
+
+    def register(self, heading, converter):
+        '''Register a converter for a heading, replacing any existing one.'''
+        self._converters[heading] = converter
+
+    def alias(self, alias, heading):
+        '''Register a heading to be converted in the same way as another.
+
+        Raises:
+            CartoucheError: If heading is not registered.
+        '''
+        try:
+            self._converters[alias] = self._converters[heading]
+        except KeyError:
+            raise CartoucheError("Cartouche: Cannot alias {alias!r} to unknown section {heading!r}".format(
+                alias=alias, heading=heading))
+
+    def copy(self):
+        '''A new registry containing the same headings and converters.'''
+        return SectionRegistry(self._converters)
+
+    def prescan_pattern(self):
+        '''A regular expression pattern matching any line which begins with
+        a registered heading and a colon.
+
+        Each line must be preceded by a newline, which the pattern begins with
+        so that a search tries only the starts of lines. Used over the joined
+        lines of a docstring, a failure to match shows that the docstring
+        contains no sections.
+        '''
+        headings = '|'.join(re.escape(heading) for heading in
+                            sorted(self._converters, key=len, reverse=True))
+        if not headings:
+            # Matches nothing
+            return r'(?!)'
+        return r'\n[ \t]*(?:{headings}):'.format(headings=headings)
+
+    def fingerprint(self):
+        '''A tuple of strings describing each heading and its converter.'''
+        return tuple("{heading}={converter}".format(heading=heading,
+                                                    converter=_describe_converter(converter))
+                     for heading, converter in sorted(self._converters.items()))
+
+
+def _describe_converter(converter):
+    name = getattr(converter, '__qualname__', None)
+    if name is None or not hasattr(converter, '__module__'):
+        return repr(converter)
+    return converter.__module__ + '.' + name
+
+
+def parse_exception(line, raises_regex=None):
     '''Parse the first line of a Cartouche exception description.
 
     Args:
         line (str): A single line Cartouche exception description.
 
+        raises_regex: An optional compiled pattern with which to match the
+            line. Defaults to that of the default parser.
+
     Returns:
         A 2-tuple containing the exception type and the first line of the description.
     '''
-    m = RAISES_REGEX.match(line)
+    if raises_regex is None:
+        raises_regex = _default_parser.raises_regex
+    m = raises_regex.match(line)
     if m is None:
-        raise CartoucheSyntaxError('Cartouche: Invalid argument syntax "{line}" for Raises block'.format(line=line))
+        syntax_error = CartoucheSyntaxError(RAISES_SYNTAX_ERROR.format(line=line))
+        syntax_error.text = line
+        raise syntax_error
     return m.group(2), m.group(1)
 
 
-def append_child_to_raise_node(child, group_node):
-    exception = None
-    non_empty_lines = (line for line in child.lines if line)
-    for line in non_empty_lines:
-        exception_text, exception_type = parse_exception(line)
+def append_child_to_raise_node(parser, arena, child, group_node, matches=None):
+    if matches is None:
+        matches = match_lines(arena, child, parser.raises_regex, RAISES_SYNTAX_ERROR)
+    exception = NIL
+    indent = arena.indent[child]
+    for m in matches:
+        exception_text, exception_type = m.group(2), m.group(1)
 
-        exception = Except(child.indent, exception_type)
-        group_node.children.append(exception) # TODO: Could use parent here.
+        exception = arena.add(EXCEPT, indent, group_node, type=exception_type)
 
         if exception_text is not None:
-            exception.children.append( Node(child.indent,
-                                            [exception_text], exception))
-    if exception is not None:
-        last_child = exception.children[-1] if len(exception.children) != 0 else exception
-        for grandchild in child.children:
-            last_child.children.append(grandchild)
+            arena.add(NODE, indent, exception, [exception_text])
+    if exception != NIL:
+        last_child = arena.last_child[exception] if arena.last_child[exception] != NIL else exception
+        arena.move_children(child, last_child)
 
 
 def group_paragraphs(indent_paragraphs):
@@ -285,24 +895,136 @@ def group_paragraphs(indent_paragraphs):
     Group paragraphs so that more indented paragraphs become children of less
     indented paragraphs.
     '''
-    # The tree consists of tuples of the form (indent, [children]) where the
-    # children may be strings or other tuples
-
+    # As in group_paragraphs_in_arena(), the chain of open ancestors is kept
+    # on a stack rather than found by following parent references, which
+    # are weak.
     root = Node(0, [], None)
-    current_node = root
-
+    ancestors = [root]
     previous_indent = -1
     for indent, lines in indent_paragraphs:
-        if indent > previous_indent:
-            current_node = create_child_node(current_node, indent, lines)
-        elif indent == previous_indent:
-            current_node = create_sibling_node(current_node, indent, lines)
+        if indent == previous_indent:
+            ancestors.pop()
         elif indent < previous_indent:
-            current_node = create_uncle_node(current_node, indent, lines)
+            ancestors.pop()
+            while len(ancestors) > 1 and ancestors[-1].indent >= indent:
+                ancestors.pop()
+        parent = ancestors[-1]
+        node = Node(indent, lines, parent)
+        parent.add_child(node)
+        ancestors.append(node)
         previous_indent = indent
     return root
 
 
+DEFAULT_SECTIONS = SectionRegistry({
+    'Args': convert_args,
+    'Returns': convert_returns,
+    'Yields': convert_yields,
+    'Raises': convert_raises,
+    'Note': convert_note,
+    'Warning': convert_warning,
+    'Attributes': convert_attributes,
+    'Usage': convert_usage,
+})
+
+_default_parser = CartoucheParser()
+
+
+def make_sections(aliases=None, admonitions=None):
+    '''Make a section registry extending the built-in sections.
+
+    Args:
+        aliases: An optional mapping from additional headings to the existing
+            headings which they should be treated as, for example
+            {'Parameters': 'Args'}.
+
+        admonitions: An optional mapping from additional headings to the
+            names of admonition directives with which they will be rendered,
+            for example {'See Also': 'seealso'}.
+
+    Returns:
+        A new SectionRegistry.
+    '''
+    sections = DEFAULT_SECTIONS.copy()
+    for heading, directive in (admonitions or {}).items():
+        sections.register(heading, AdmonitionConverter(directive))
+    for alias, heading in (aliases or {}).items():
+        sections.alias(alias, heading)
+    return sections
+
+
+def configure_sections(aliases=None, admonitions=None):
+    '''Configure the sections recognised by the default parser.
+
+    The sections are first reset to the defaults. See make_sections() for
+    a description of the arguments.
+    '''
+    set_default_parser(_default_parser.replace(sections=make_sections(aliases, admonitions)))
+
+
+def group_paragraphs_in_arena(indent_paragraphs, max_depth=None):
+    '''Group paragraphs into a parse tree held in an Arena.
+
+    This is equivalent to group_paragraphs(), but rather than linking Node
+    objects through parent references the chain of open ancestors is kept on
+    an explicit stack, so each paragraph is attached in amortised constant
+    time however the indentation varies.
+
+    Args:
+        indent_paragraphs: An iterable of 2-tuples each containing an integer
+            indent as the first element and a list of lines as the second
+            element, as produced by iter_paragraphs().
+
+        max_depth: The optional greatest depth to which paragraphs may be
+            nested, with the unindented paragraphs being at depth one.
+
+    Returns:
+        An Arena with the root of the parse tree at index zero. The lines of
+        the paragraphs, in order, form the texts of the Arena.
+
+    Raises:
+        CartoucheLimitError: If the paragraphs are nested too deeply.
+    '''
+    paragraphs = list(indent_paragraphs)
+    arena = Arena.of_size(len(paragraphs) + 1)
+    texts = arena.texts
+    indents = arena.indent
+    parents = arena.parent
+    first_child = arena.first_child
+    last_child = arena.last_child
+    next_sibling = arena.next_sibling
+    line_starts = arena.line_start
+    line_ends = arena.line_end
+    # The root is on the stack below the paragraphs.
+    ancestors = [0]
+    max_ancestors = max_depth + 1 if max_depth is not None else sys.maxsize
+    previous_indent = -1
+    for index, (indent, lines) in enumerate(paragraphs, 1):
+        if indent == previous_indent:
+            ancestors.pop()
+        elif indent < previous_indent:
+            ancestors.pop()
+            while len(ancestors) > 1 and indents[ancestors[-1]] >= indent:
+                ancestors.pop()
+        parent = ancestors[-1]
+        indents[index] = indent
+        parents[index] = parent
+        line_starts[index] = len(texts)
+        texts.extend(lines)
+        line_ends[index] = len(texts)
+        previous = last_child[parent]
+        if previous == NIL:
+            first_child[parent] = index
+        else:
+            next_sibling[previous] = index
+        last_child[parent] = index
+        ancestors.append(index)
+        if len(ancestors) > max_ancestors:
+            raise CartoucheLimitError(DEPTH_LIMIT_EXCEEDED.format(limit=max_depth))
+        previous_indent = indent
+    return arena
+
+
 def create_sibling_node(current_node, indent, lines):
     sibling = Node(indent, lines, current_node.parent)
     current_node.parent.add_child(sibling)
@@ -385,10 +1107,12 @@ def first_paragraph_indent(indent_texts):
         A list of 2-tuples, each containing an integer indent level as the
         first element and the text as the second element.
     '''
-    opening_indent = determine_opening_indent(indent_texts)
+    input = iter(indent_texts)
+    head = list(islice(input, 2))
+    opening_indent = determine_opening_indent(head)
 
     result = []
-    input = iter(indent_texts)
+    input = chain(head, input)
     for indent, text in input:
         if indent == 0:
             result.append((opening_indent, text))
@@ -408,6 +1132,9 @@ def determine_opening_indent(indent_texts):
     The opening indent level is the indent level is the first non-zero indent
     level of a non-empty line in the docstring.
 
+    Only the first two lines are consulted, so an iterator need not be
+    exhausted; those two lines will however have been consumed from it.
+
     Args:
         indent_texts: The lines of the docstring as an iterable over 2-tuples
             each containing an integer indent level as the first element and
@@ -416,22 +1143,23 @@ def determine_opening_indent(indent_texts):
     Returns:
         The opening indent level as an integer.
     '''
-    num_lines = len(indent_texts)
+    head = list(islice(indent_texts, 2))
+    num_lines = len(head)
 
     if num_lines < 1:
         return 0
 
     assert num_lines >= 1
 
-    first_line_indent  = indent_texts[0][0]
+    first_line_indent  = head[0][0]
 
     if num_lines == 1:
         return first_line_indent
 
     assert num_lines >= 2
 
-    second_line_indent = indent_texts[1][0]
-    second_line_text   = indent_texts[1][1]
+    second_line_indent = head[1][0]
+    second_line_text   = head[1][1]
 
     if len(second_line_text) == 0:
         return first_line_indent
@@ -465,11 +1193,53 @@ def rewrite_autodoc(app, what, name, obj, options, lines):
 
         lines: The lines of the docstring.  Will be modified *in place*.
 
+    A docstring which exceeds the limits of the parser is left unconverted,
+    with a warning.
+
     Raises:
         CartoucheSyntaxError: If the docstring is malformed.
     '''
     try:
-        lines[:] = parse_cartouche_text(lines)
+        parser = getattr(app, 'cartouche_parser', None) or _default_parser
+        cache = getattr(app, 'cartouche_cache', None)
+        profile = document_record(getattr(app, 'env', None), 'cartouche_profile',
+                                  lambda: new_profile(app.config))
+        if profile is not None:
+            from .profile import ProfilingParser
+            start = time.perf_counter()
+            parser = ProfilingParser(parser, profile)
+        memo = getattr(app, 'cartouche_memo', None)
+        sidecars = getattr(app, 'cartouche_sidecars', None)
+        env = getattr(app, 'env', None)
+        diagnostics = Diagnostics()
+        summary = opening_paragraph(lines) if summaries_only_requested() else None
+        if summary is not None and parser.is_plain(summary):
+            result = summary
+        elif parser.is_plain(lines):
+            result = None
+        else:
+            try:
+                if memo is not None:
+                    result = parse_memoized(memo, lines, obj, env, parser, cache, diagnostics,
+                                            sidecars)
+                elif sidecars:
+                    result = parse_sidecars(sidecars, lines, env, parser, cache, diagnostics)
+                elif cache is None:
+                    result = parser.parse(lines, diagnostics)
+                else:
+                    result = parse_cached(cache, lines, env, parser, diagnostics)
+            except CartoucheLimitError as limit_error:
+                diagnostics.report(str(limit_error))
+                result = None
+        if diagnostics:
+            record_diagnostics(env, what, name, lines, diagnostics)
+        if result is not None:
+            if getattr(app, 'cartouche_field_nodes', False) and not summaries_only_requested():
+                result = wrap_fields(result)
+            lines[:] = result
+        ensure_terminal_blank(lines)
+        if profile is not None:
+            profile.record(name, time.perf_counter() - start)
     except CartoucheSyntaxError as syntax_error:
         args = syntax_error.args
         arg0 = args[0] if args else ''
@@ -480,58 +1250,357 @@ def rewrite_autodoc(app, what, name, obj, options, lines):
         raise
 
 
+def record_diagnostics(env, what, name, lines, diagnostics):
+    '''Record warnings about a docstring, to be reported once the document
+    being read is complete, and errors from which the parser recovered, to be
+    reported once the build is complete.
+
+    Args:
+        env: A Sphinx build environment, or None, in which case the warnings
+            are printed to the standard error stream.
+
+        what: The type of object to which the docstring belongs.
+
+        name: The fully qualified name of the object.
+
+        lines: The lines of the docstring, before conversion, used to locate
+            the warnings.
+
+        diagnostics: A Diagnostics holding the warnings and errors.
+    '''
+    path = module_file(name)
+    for diagnostic in diagnostics:
+        line = locate(lines, diagnostic.subject)
+        attribute = 'cartouche_errors' if diagnostic.level == ERROR else 'cartouche_diagnostics'
+        record = document_record(env, attribute, dict)
+        if record is not None:
+            record[(path, name, line, diagnostic.message)] = None
+        else:
+            print("{message} in docstring for {what} {name}".format(
+                message=diagnostic.message, what=what, name=name), file=sys.stderr)
+
+
+def module_file(name):
+    '''The path of the source file of the imported module which defines
+    the object with a fully qualified name, or None if it is not known.'''
+    module_name = name
+    while module_name and module_name not in sys.modules:
+        module_name = module_name.rpartition('.')[0]
+    if not module_name:
+        return None
+    return getattr(sys.modules[module_name], '__file__', None)
+
+
+def opening_paragraph(lines):
+    '''The lines of the opening paragraph of a docstring, or None if the
+    opening paragraph is indented or there is none.'''
+    start = 0
+    while start < len(lines) and not lines[start].strip():
+        start += 1
+    end = start
+    while end < len(lines) and lines[end].strip():
+        end += 1
+    if start == end or lines[start][:1].isspace():
+        return None
+    return list(lines[start:end])
+
+
+_requests = threading.local()
+
+
+def summaries_only_requested():
+    '''True if, within the current thread, only the summaries of docstrings
+    are required. See summaries_only().'''
+    return getattr(_requests, 'summaries_only', False)
+
+
+@contextmanager
+def summaries_only():
+    '''A context manager within the scope of which rewrite_autodoc() need
+    only convert the opening paragraph of each docstring.
+
+    This is used for callers such as autosummary tables, which use nothing
+    but the first sentence of each docstring. Where the opening paragraph
+    contains no sections it is passed through as the whole docstring, and
+    the remainder is neither converted nor checked for syntax errors. Other
+    docstrings are converted in full.
+    '''
+    previous = summaries_only_requested()
+    _requests.summaries_only = True
+    try:
+        yield
+    finally:
+        _requests.summaries_only = previous
+
+
+def parse_cached(cache, lines, env=None, parser=None, diagnostics=None):
+    '''Parse text in cartouche format, consulting a render cache first.
+
+    Args:
+        cache: A RenderCache in which rendered docstrings are stored.
+
+        lines: A sequence of strings representing the lines of a single
+            docstring.
+
+        env: An optional Sphinx build environment in which cache hits and
+            misses are counted.
+
+        parser: An optional CartoucheParser. Defaults to the default parser.
+
+        diagnostics: An optional Diagnostics to which warnings about the
+            docstring are added, whether it is parsed or found in the cache.
+
+    Returns:
+        A list of lines containing the transformed docstring as
+        reStructuredText.
+
+    Raises:
+        CartoucheSyntaxError: If the docstring is malformed.
+
+        CartoucheLimitError: If the docstring exceeds the limits of the
+            parser, in which case nothing is stored.
+    '''
+    if parser is None:
+        parser = _default_parser
+    if parser.is_plain(lines):
+        return parser.parse(lines)
+    key = cache.key(lines, parser.configuration())
+    result = cache.get(key, diagnostics)
+    stats = document_record(env, 'cartouche_stats', Counter)
+    if result is not None:
+        if stats is not None:
+            stats['cache_hits'] += 1
+        return result
+    if stats is not None:
+        stats['cache_misses'] += 1
+    found = Diagnostics()
+    result = parser.parse(lines, found)
+    cache.put(key, result, found)
+    if diagnostics is not None:
+        diagnostics.extend(found)
+    return result
+
+
+def parse_sidecars(sidecars, lines, env=None, parser=None, cache=None, diagnostics=None):
+    '''Parse text in cartouche format, consulting precompiled sidecar files
+    first. See cartouche.sidecar.
+
+    Args:
+        sidecars: A sequence of Sidecar, consulted in order.
+
+        lines: A sequence of strings representing the lines of a single
+            docstring.
+
+        env: An optional Sphinx build environment in which sidecar hits and
+            misses are counted.
+
+        parser: An optional CartoucheParser. Defaults to the default parser.
+
+        cache: An optional RenderCache consulted when no sidecar has an
+            entry.
+
+        diagnostics: An optional Diagnostics to which warnings about the
+            docstring are added, whether it is parsed or found in a sidecar.
+
+    Returns:
+        A list of lines containing the transformed docstring as
+        reStructuredText.
+
+    Raises:
+        CartoucheSyntaxError: If the docstring is malformed.
+
+        CartoucheLimitError: If the docstring exceeds the limits of the
+            parser.
+    '''
+    if parser is None:
+        parser = _default_parser
+    if parser.is_plain(lines):
+        return parser.parse(lines)
+    key = render_digest(lines, parser.configuration())
+    stats = document_record(env, 'cartouche_stats', Counter)
+    for sidecar in sidecars:
+        result = sidecar.get(key, diagnostics)
+        if result is not None:
+            if stats is not None:
+                stats['sidecar_hits'] += 1
+            return result
+    if stats is not None:
+        stats['sidecar_misses'] += 1
+    if cache is None:
+        return parser.parse(lines, diagnostics)
+    return parse_cached(cache, lines, env, parser, diagnostics)
+
+
+def parse_memoized(memo, lines, owner=None, env=None, parser=None, cache=None, diagnostics=None,
+                   sidecars=None):
+    '''Parse text in cartouche format, consulting an in-memory memo first.
+
+    Autodoc processes the same docstring several times over when an object
+    is documented as an inherited member, in an autosummary table, or from
+    more than one document, and each of these is served from the memo.
+
+    Args:
+        memo: A ParseMemo holding renderings by the parser.
+
+        lines: A sequence of strings representing the lines of a single
+            docstring.
+
+        owner: The optional object to which the docstring belongs, through
+            which the memo may find its entry without hashing the lines.
+
+        env: An optional Sphinx build environment in which memo hits, misses
+            and evictions are counted.
+
+        parser: An optional CartoucheParser. Defaults to the default parser.
+
+        cache: An optional RenderCache consulted when the memo has no entry.
+
+        diagnostics: An optional Diagnostics to which warnings about the
+            docstring are added, whether it is parsed or found in the memo.
+
+        sidecars: An optional sequence of Sidecar consulted, before the
+            cache, when the memo has no entry.
+
+    Returns:
+        A list of lines containing the transformed docstring as
+        reStructuredText, which must not be modified.
+
+    Raises:
+        CartoucheSyntaxError: If the docstring is malformed.
+
+        CartoucheLimitError: If the docstring exceeds the limits of the
+            parser, in which case nothing is stored.
+    '''
+    if parser is None:
+        parser = _default_parser
+    stats = document_record(env, 'cartouche_stats', Counter)
+    result = memo.get(lines, owner, diagnostics)
+    if result is not None:
+        if stats is not None:
+            stats['memo_hits'] += 1
+        return result
+    found = Diagnostics()
+    if sidecars:
+        result = parse_sidecars(sidecars, lines, env, parser, cache, found)
+    elif cache is None:
+        result = parser.parse(lines, found)
+    else:
+        result = parse_cached(cache, lines, env, parser, found)
+    evicted = memo.put(lines, result, owner, found)
+    if diagnostics is not None:
+        diagnostics.extend(found)
+    if stats is not None:
+        stats['memo_misses'] += 1
+        stats['memo_evictions'] += evicted
+    return result
+
+
+def document_record(env, attribute, factory):
+    '''The record for the document being read from a per-document mapping.
+
+    Records gathered while reading are kept per document, rather than as one
+    running total, so that the records of parallel read workers can be merged
+    without counting any document twice.
+
+    Args:
+        env: A Sphinx build environment, or None.
+
+        attribute: The name of an attribute of the environment holding a
+            dictionary mapping document names to records.
+
+        factory: A function of no arguments which creates an empty record,
+            used when the document has none.
+
+    Returns:
+        The record for the current document, or None if there is no
+        environment or the environment has no such attribute.
+    '''
+    records = getattr(env, attribute, None)
+    if records is None:
+        return None
+    docname = env.docname
+    try:
+        return records[docname]
+    except KeyError:
+        record = records[docname] = factory()
+        return record
+
+
+def new_profile(config):
+    from .profile import Profile
+    return Profile(config.cartouche_profile_slowest)
+
+
 def accept_bulleted_args():
-    '''Further use of the parser will accept bulleted lists for Args.'''
-    global ARGS_REGEX
-    ARGS_REGEX = re.compile(OPTIONAL_BULLET_PATTERN + ARGS_PATTERN)
+    '''Further use of the default parser will accept bulleted lists for Args.'''
+    set_default_parser(_default_parser.replace(bulleted_args=True))
 
 
 def reject_bulleted_args():
-    '''Further use of the parser will reject bulleted lists for Args.'''
-    global ARGS_REGEX
-    ARGS_REGEX = re.compile(ARGS_PATTERN)
+    '''Further use of the default parser will reject bulleted lists for Args.'''
+    set_default_parser(_default_parser.replace(bulleted_args=False))
 
 
 def accept_bulleted_raises():
-    '''Further use of the parser will accept bulleted lists for Raises.'''
-    global RAISES_REGEX
-    RAISES_REGEX = re.compile(OPTIONAL_BULLET_PATTERN + RAISES_PATTERN)
+    '''Further use of the default parser will accept bulleted lists for Raises.'''
+    set_default_parser(_default_parser.replace(bulleted_raises=True))
 
 
 def reject_bulleted_raises():
-    '''Further use of the parser will reject bulleted lists for Raises.'''
-    global RAISES_REGEX
-    RAISES_REGEX = re.compile(RAISES_PATTERN)
+    '''Further use of the default parser will reject bulleted lists for Raises.'''
+    set_default_parser(_default_parser.replace(bulleted_raises=False))
 
 
 @contextmanager
 def bulleted_args():
-    '''A context manager within the scope of which bulleted Args will be accepted.'''
-    global ARGS_REGEX
-    previous_args_regex = ARGS_REGEX
+    '''A context manager within the scope of which bulleted Args will be
+    accepted by the default parser.
+
+    The default parser is shared by all threads, so prefer a CartoucheParser
+    constructed with bulleted_args=True where threads are in use.
+    '''
+    previous = _default_parser.bulleted_args
     accept_bulleted_args()
-    yield
-    ARGS_REGEX = previous_args_regex
+    try:
+        yield
+    finally:
+        set_default_parser(_default_parser.replace(bulleted_args=previous))
 
 
 @contextmanager
 def bulleted_raises():
-    '''A context manager within the scope of which bulleted Raises will be accepted.'''
-    global RAISES_REGEX
-    previous_raises_regex = RAISES_REGEX
+    '''A context manager within the scope of which bulleted Raises will be
+    accepted by the default parser.
+
+    The default parser is shared by all threads, so prefer a CartoucheParser
+    constructed with bulleted_raises=True where threads are in use.
+    '''
+    previous = _default_parser.bulleted_raises
     accept_bulleted_raises()
-    yield
-    RAISES_REGEX = previous_raises_regex
+    try:
+        yield
+    finally:
+        set_default_parser(_default_parser.replace(bulleted_raises=previous))
+
+
+def parser_for(config):
+    '''Create a parser from the cartouche values of a Sphinx configuration.'''
+    return CartoucheParser(
+        bulleted_args=config.cartouche_accept_bulleted_args,
+        bulleted_raises=config.cartouche_accept_bulleted_raises,
+        sections=make_sections(config.cartouche_section_aliases,
+                               config.cartouche_admonition_sections),
+        recover=config.cartouche_collect_errors,
+        max_lines=config.cartouche_max_lines,
+        max_depth=config.cartouche_max_depth,
+        max_time=config.cartouche_max_time,
+        compact=config.cartouche_compact,
+        attributes_style=config.cartouche_attributes_style,
+        index_attributes=config.cartouche_index_attributes)
 
 
 def builder_inited(app):
-    if app.config.cartouche_accept_bulleted_args:
-        accept_bulleted_args()
-
-    if app.config.cartouche_accept_bulleted_raises:
-        accept_bulleted_raises()
-
-
-
-
-
+    app.cartouche_parser = parser_for(app.config)
+    memo_size = getattr(app.config, 'cartouche_memo_size', 0)
+    app.cartouche_memo = ParseMemo(memo_size) if memo_size else None
+    app.cartouche_field_nodes = getattr(app.config, 'cartouche_field_nodes', False)
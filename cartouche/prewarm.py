@@ -0,0 +1,139 @@
+'''Conversion of the docstrings of the modules documented by a project before
+Sphinx reads its documents.
+
+Autodoc converts docstrings one at a time as it reads each document. When
+prewarming is enabled, the modules which the documents to be read refer to
+are found, their docstrings extracted without importing them, and converted
+together, over a pool of worker processes for large projects. The results
+are stored in the memo and render cache which rewrite_autodoc() consults, so
+that reading the documents requires only lookups.
+'''
+
+import importlib.util
+import re
+
+from .cache import render_digest
+from .diagnostics import Diagnostics
+from .extract import extract_many
+from .parser import parse_many
+
+__author__ = 'Robert Smallshire'
+
+# The autodoc directives, and the directives which set the current module,
+# each of which names a module or an object within one.
+AUTODOC_DIRECTIVE_REGEX = re.compile(
+    r'^[ \t]*\.\.[ \t]+(?:auto(?:module|class|exception|function|method|attribute|property|data'
+    r'|decorator)|(?:py:)?(?:current)?module)::[ \t]*([\w.]+)', re.MULTILINE)
+
+
+def referenced_names(text):
+    '''The names given to autodoc and module directives in a document.
+
+    Args:
+        text: The reStructuredText source of a document.
+
+    Returns:
+        A list of dotted names, in the order in which they appear.
+    '''
+    return AUTODOC_DIRECTIVE_REGEX.findall(text)
+
+
+def module_source(name):
+    '''The path of the source file of the module named by, or containing the
+    object named by, a dotted name.
+
+    The module is located without being imported, although the packages
+    containing it are imported, as they would be by autodoc.
+
+    Args:
+        name: The dotted name of a module, or of an object within a module.
+
+    Returns:
+        The path of the Python source file of the module with the longest
+        name which is a prefix of the given name, or None if there is none.
+    '''
+    parts = name.split('.')
+    for end in range(len(parts), 0, -1):
+        try:
+            spec = importlib.util.find_spec('.'.join(parts[:end]))
+        except Exception:
+            # Importing a containing package may fail in any way, which
+            # autodoc will report in its turn.
+            continue
+        if spec is not None and spec.origin is not None and spec.origin.endswith('.py'):
+            return spec.origin
+    return None
+
+
+def prewarm(docstrings, parser, memo=None, cache=None, workers=None, sidecars=None):
+    '''Convert docstrings ahead of their use, storing the results in a memo,
+    a render cache, or both.
+
+    Docstrings without sections, which need no conversion, are skipped, as
+    are those found in a sidecar or the cache, which are copied into the
+    memo. Docstrings which are malformed or exceed the limits of the parser
+    are not stored, so they are reported as usual when they are read.
+
+    Args:
+        docstrings: An iterable series of sequences of strings, each being
+            the lines of a docstring prepared as autodoc prepares them.
+
+        parser: The CartoucheParser with which rewrite_autodoc() converts
+            docstrings.
+
+        memo: An optional ParseMemo. Only as many of the docstrings as it can
+            hold are kept.
+
+        cache: An optional RenderCache.
+
+        workers: The number of worker processes. Defaults to the number of
+            CPUs. See parse_many().
+
+        sidecars: An optional sequence of Sidecar, consulted before the
+            cache.
+
+    Returns:
+        A 2-tuple of the number of docstrings converted and the number found
+        in sidecars or the cache.
+    '''
+    configuration = parser.configuration()
+    pending = []
+    cached = 0
+    for lines in dict.fromkeys(map(tuple, docstrings)):
+        if parser.is_plain(lines):
+            continue
+        found = Diagnostics()
+        rst = None
+        if sidecars:
+            key = render_digest(lines, configuration)
+            for sidecar in sidecars:
+                rst = sidecar.get(key, found)
+                if rst is not None:
+                    break
+        if rst is None and cache is not None:
+            rst = cache.get(cache.key(lines, configuration), found)
+        if rst is not None:
+            if memo is not None:
+                memo.put(lines, rst, None, found)
+            cached += 1
+            continue
+        pending.append(lines)
+    converted = 0
+    for lines, result in zip(pending, parse_many(pending, workers, parser=parser)):
+        if result.error is not None or result.limited:
+            continue
+        if memo is not None:
+            memo.put(lines, result.lines, None, result.diagnostics)
+        if cache is not None:
+            cache.put(cache.key(lines, configuration), result.lines, result.diagnostics)
+        converted += 1
+    return converted, cached
+
+
+def module_docstrings(paths, workers=None):
+    '''Generate the lines of the docstrings in source files, skipping files
+    which cannot be read or parsed.'''
+    for path, docstrings, error in extract_many(paths, workers):
+        if docstrings is not None:
+            for docstring in docstrings:
+                yield docstring.lines
@@ -0,0 +1,181 @@
+'''Instrumentation of the time taken to convert docstrings.'''
+
+import heapq
+import time
+from collections import Counter
+
+from .nodes import ensure_terminal_blank
+from .parser import iter_paragraphs, group_paragraphs_in_arena
+
+__author__ = 'Robert Smallshire'
+
+STAGES = ('tokenize', 'group', 'convert', 'render')
+
+
+def bucket(value):
+    '''The histogram bucket for a non-negative value.
+
+    Bucket k holds values v for which 2**(k-1) <= v < 2**k, with bucket zero
+    holding values less than one.
+    '''
+    return int(value).bit_length()
+
+
+class Profile(object):
+    '''Timings gathered while converting docstrings.
+
+    Args:
+        num_slowest: The number of slowest docstrings to remember.
+
+    Attributes:
+        docstrings: The number of docstrings processed.
+
+        parsed: The number of docstrings actually parsed, rather than
+            retrieved from a cache.
+
+        plain: The number of docstrings which needed no conversion.
+
+        total_time: The total time in seconds spent processing docstrings.
+
+        stage_times: A dictionary mapping each of the STAGES to the total
+            time in seconds spent in that stage.
+
+        latencies: A Counter mapping histogram buckets of the time taken per
+            docstring in microseconds, to the number of docstrings.
+
+        tree_sizes: A Counter mapping histogram buckets of the number of
+            nodes in the syntax tree of each parsed docstring, to the number
+            of docstrings.
+
+        slowest: A heap of (seconds, name) tuples for the slowest docstrings.
+    '''
+
+    def __init__(self, num_slowest=10):
+        self.num_slowest = num_slowest
+        self.docstrings = 0
+        self.parsed = 0
+        self.plain = 0
+        self.total_time = 0.0
+        self.stage_times = dict.fromkeys(STAGES, 0.0)
+        self.latencies = Counter()
+        self.tree_sizes = Counter()
+        self.slowest = []
+
+    def record(self, name, seconds):
+        '''Record the total time taken to process the docstring of an object.'''
+        self.docstrings += 1
+        self.total_time += seconds
+        self.latencies[bucket(seconds * 1e6)] += 1
+        self._remember(seconds, name)
+
+    def record_parse(self, stage_times, tree_size):
+        '''Record the time taken in each stage of parsing a docstring.
+
+        Args:
+            stage_times: A sequence of the seconds spent in each of STAGES.
+
+            tree_size: The number of nodes in the syntax tree.
+        '''
+        self.parsed += 1
+        for stage, seconds in zip(STAGES, stage_times):
+            self.stage_times[stage] += seconds
+        self.tree_sizes[bucket(tree_size)] += 1
+
+    def merge(self, other):
+        '''Accumulate the timings of another Profile into this one.'''
+        self.docstrings += other.docstrings
+        self.parsed += other.parsed
+        self.plain += other.plain
+        self.total_time += other.total_time
+        for stage, seconds in other.stage_times.items():
+            self.stage_times[stage] += seconds
+        self.latencies.update(other.latencies)
+        self.tree_sizes.update(other.tree_sizes)
+        for seconds, name in other.slowest:
+            self._remember(seconds, name)
+
+    def _remember(self, seconds, name):
+        entry = (seconds, name)
+        if len(self.slowest) < self.num_slowest:
+            heapq.heappush(self.slowest, entry)
+        elif self.slowest and entry > self.slowest[0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def as_dict(self):
+        '''The timings as a dictionary suitable for serialising as JSON.
+
+        Histograms are given as lists of buckets, each with the exclusive
+        upper bound of the bucket and the number of docstrings in it.
+        '''
+        return dict(
+            docstrings=self.docstrings,
+            parsed=self.parsed,
+            plain=self.plain,
+            total_seconds=self.total_time,
+            stage_seconds=dict(self.stage_times),
+            latency_histogram=[dict(below_microseconds=2 ** k, count=self.latencies[k])
+                               for k in sorted(self.latencies)],
+            tree_size_histogram=[dict(below_nodes=2 ** k, count=self.tree_sizes[k])
+                                 for k in sorted(self.tree_sizes)],
+            slowest=[dict(name=name, seconds=seconds)
+                     for seconds, name in sorted(self.slowest, reverse=True)])
+
+    def summary(self):
+        '''A summary of the timings as a list of lines of text.'''
+        lines = ["{0} docstrings in {1:.3f} s, of which {2} were parsed and {3} needed "
+                 "no conversion".format(self.docstrings, self.total_time, self.parsed, self.plain)]
+        lines.append("stages: " + ", ".join(
+            "{0} {1:.3f} s".format(stage, self.stage_times[stage]) for stage in STAGES))
+        if self.latencies:
+            lines.append("latency: " + ", ".join(
+                "<{0} us: {1}".format(2 ** k, self.latencies[k]) for k in sorted(self.latencies)))
+        if self.tree_sizes:
+            lines.append("tree size: " + ", ".join(
+                "<{0} nodes: {1}".format(2 ** k, self.tree_sizes[k]) for k in sorted(self.tree_sizes)))
+        for seconds, name in sorted(self.slowest, reverse=True):
+            lines.append("slow: {0} {1:.2f} ms".format(name, seconds * 1e3))
+        return lines
+
+
+class ProfilingParser(object):
+    '''A wrapper around a CartoucheParser which times each stage of parsing.
+
+    Args:
+        parser: The CartoucheParser which does the work.
+
+        profile: The Profile in which to record the timings.
+    '''
+
+    def __init__(self, parser, profile):
+        self.parser = parser
+        self.profile = profile
+
+    def configuration(self):
+        return self.parser.configuration()
+
+    def is_plain(self, lines):
+        plain = self.parser.is_plain(lines)
+        if plain:
+            self.profile.plain += 1
+        return plain
+
+    def parse(self, lines, diagnostics=None):
+        timer = time.perf_counter
+        parser = self.parser
+        start = timer()
+        deadline = parser.deadline()
+        parser.check_lines(lines)
+        paragraphs = list(iter_paragraphs(lines))
+        tokenized = timer()
+        arena = group_paragraphs_in_arena(paragraphs, parser.max_depth)
+        grouped = timer()
+        parser.convert(arena, diagnostics=diagnostics, deadline=deadline)
+        converted = timer()
+        result = []
+        parser.renderer(result, diagnostics).render(arena)
+        ensure_terminal_blank(result)
+        rendered = timer()
+        self.profile.record_parse((tokenized - start, grouped - tokenized,
+                                   converted - grouped, rendered - converted),
+                                  len(arena))
+        return result
@@ -0,0 +1,249 @@
+'''Precompiled renderings of the docstrings of a package, for shipping with
+the package.
+
+A sidecar file maps the digests of docstrings, as computed for the render
+cache, to their renderings, so that every project which documents the
+package can use the renderings rather than converting its docstrings again.
+The file is written by ``python -m cartouche --format sidecar`` and consists
+of a header, an index of fixed size entries sorted by digest, and the
+renderings themselves::
+
+  header:  magic (8 bytes), format (uint32), entry count (uint32),
+           configuration digest (20 bytes)
+  index:   digest (20 bytes), offset (uint64), length (uint32), ...
+  records: UTF-8 JSON objects with "rst" and "diagnostics" members
+
+The file is memory-mapped and the index binary searched, so a lookup reads
+only the pages it touches, however large the file. The configuration digest
+identifies the parser configuration and version of cartouche which wrote
+the file, since the renderings can be used only by a parser which matches.
+'''
+
+import importlib.util
+import json
+import mmap
+import os
+import struct
+import tempfile
+
+from .cache import render_digest, DIGEST_SIZE
+
+__author__ = 'Robert Smallshire'
+
+MAGIC = b'CARTSIDE'
+
+# Bump this whenever the layout of the file changes.
+SIDECAR_FORMAT = 2
+
+# The name of the sidecar file within a package directory.
+SIDECAR_FILENAME = 'cartouche.sidecar'
+
+HEADER = struct.Struct('<8sII{size}s'.format(size=DIGEST_SIZE))
+ENTRY = struct.Struct('<{size}sQI'.format(size=DIGEST_SIZE))
+
+
+class Sidecar(object):
+    '''A read-only, memory-mapped sidecar file.
+
+    A sidecar may be shared by any number of threads, and by processes forked
+    after it has been opened.
+
+    Args:
+        path: The path of the sidecar file.
+
+    Raises:
+        OSError: If the file cannot be opened.
+
+        ValueError: If the file is not a sidecar written in the current
+            format.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as sidecar_file:
+            self._map = mmap.mmap(sidecar_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if len(self._map) < HEADER.size:
+                raise ValueError("{path} is not a cartouche sidecar".format(path=path))
+            magic, format, count, configuration = HEADER.unpack_from(self._map, 0)
+            if magic != MAGIC:
+                raise ValueError("{path} is not a cartouche sidecar".format(path=path))
+            if format != SIDECAR_FORMAT:
+                raise ValueError("{path} is in sidecar format {format}, not {expected}".format(
+                    path=path, format=format, expected=SIDECAR_FORMAT))
+            if HEADER.size + count * ENTRY.size > len(self._map):
+                raise ValueError("{path} is truncated".format(path=path))
+        except ValueError:
+            self.close()
+            raise
+        self._count = count
+        self._configuration = configuration
+
+    def __len__(self):
+        return self._count
+
+    def matches(self, configuration):
+        '''Determine whether the renderings were written by a parser with a
+        configuration, and by this version of cartouche.
+
+        Args:
+            configuration: The configuration of a CartoucheParser.
+
+        Returns:
+            True if a parser with the configuration can use the renderings.
+        '''
+        return configuration_digest(configuration) == self._configuration
+
+    def get(self, key, diagnostics=None):
+        '''Retrieve the rendered lines for a key.
+
+        Args:
+            key: The digest of the docstring, from render_digest().
+
+            diagnostics: An optional Diagnostics to which the warnings
+                stored with the entry are added.
+
+        Returns:
+            A list of strings containing the rendered reStructuredText, or
+            None if there is no usable entry for the key.
+        '''
+        contents = self._map
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            start = HEADER.size + middle * ENTRY.size
+            digest = contents[start:start + DIGEST_SIZE]
+            if digest < key:
+                low = middle + 1
+            elif digest > key:
+                high = middle
+            else:
+                _, offset, length = ENTRY.unpack_from(contents, start)
+                try:
+                    record = json.loads(contents[offset:offset + length].decode('utf-8'))
+                except ValueError:
+                    return None
+                rst = record.get('rst') if isinstance(record, dict) else None
+                if rst is not None and diagnostics is not None:
+                    diagnostics.extend(record.get('diagnostics', ()))
+                return rst
+        return None
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class SidecarWriter(object):
+    '''Gathers the renderings of docstrings by a parser, to be written as a
+    sidecar file.
+
+    Docstrings without sections, which need no conversion, malformed
+    docstrings, and docstrings which exceed the limits of the parser are
+    not gathered, so they are converted, or reported, as usual when used.
+
+    Args:
+        parser: The CartoucheParser by which the docstrings are rendered.
+    '''
+
+    def __init__(self, parser):
+        self.parser = parser
+        self._configuration = parser.configuration()
+        self._records = {}
+
+    def __len__(self):
+        return len(self._records)
+
+    def add(self, lines, result):
+        '''Gather the rendering of a docstring.
+
+        Args:
+            lines: A sequence of strings being the lines of the docstring.
+
+            result: The ParseResult for the docstring from parse_many().
+
+        Returns:
+            True if the rendering was gathered, otherwise False.
+        '''
+        if result.error is not None or result.limited or self.parser.is_plain(lines):
+            return False
+        key = render_digest(lines, self._configuration)
+        self._records[key] = dict(rst=list(result.lines),
+                                  diagnostics=[list(diagnostic) for diagnostic in result.diagnostics])
+        return True
+
+    def write(self, path):
+        '''Write the gathered renderings to a sidecar file, replacing any
+        existing file atomically.
+
+        Args:
+            path: The path of the file to write.
+        '''
+        keys = sorted(self._records)
+        records = [json.dumps(self._records[key], separators=(',', ':')).encode('utf-8')
+                   for key in keys]
+        offset = HEADER.size + len(keys) * ENTRY.size
+        index = []
+        for key, record in zip(keys, records):
+            index.append(ENTRY.pack(key, offset, len(record)))
+            offset += len(record)
+        directory = os.path.dirname(os.path.abspath(path))
+        descriptor, temporary_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(descriptor, 'wb') as sidecar_file:
+                sidecar_file.write(HEADER.pack(MAGIC, SIDECAR_FORMAT, len(keys),
+                                               configuration_digest(self._configuration)))
+                sidecar_file.writelines(index)
+                sidecar_file.writelines(records)
+            # Unlike the private temporary file, the sidecar is to be shipped
+            os.chmod(temporary_path, 0o644)
+            os.replace(temporary_path, path)
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+
+
+def configuration_digest(configuration):
+    '''The digest identifying a parser configuration and version of
+    cartouche, which is that of an empty docstring, since no sidecar holds
+    one.'''
+    return render_digest((), configuration)
+
+
+def sidecar_path(name, directory='.'):
+    '''The path of a sidecar file given by its path, or by the name of the
+    package with which it is shipped.
+
+    Packages are located without being imported, although the packages
+    containing them are imported.
+
+    Args:
+        name: The path of a sidecar file, relative to directory, or the
+            dotted name of a package containing a file named
+            SIDECAR_FILENAME.
+
+        directory: The directory to which a relative path is relative.
+
+    Returns:
+        The path of the sidecar file, or None if there is none.
+    '''
+    path = os.path.join(directory, name)
+    if os.path.isfile(path):
+        return path
+    try:
+        spec = importlib.util.find_spec(name)
+    except Exception:
+        # As in cartouche.prewarm.module_source()
+        return None
+    if spec is None or not spec.submodule_search_locations:
+        return None
+    for location in spec.submodule_search_locations:
+        path = os.path.join(location, SIDECAR_FILENAME)
+        if os.path.isfile(path):
+            return path
+    return None
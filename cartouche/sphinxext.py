@@ -1,18 +1,565 @@
-from .parser import (rewrite_autodoc, builder_inited)
+import json
+import os
+import time
+from collections import Counter
+
+from docutils import nodes
+from docutils.statemachine import StringList
+from sphinx.util import logging
+from sphinx.util.docutils import SphinxDirective
+
+from .cache import RenderCache
+from .extract import file_fingerprint
+from .fields import (FIELDS_DIRECTIVE, ATTRIBUTES_DIRECTIVE, split_fields, split_attribute_name,
+                     is_plain_name, is_plain_paragraph)
+from .parser import (rewrite_autodoc, builder_inited, summaries_only)
+from .sidecar import Sidecar, sidecar_path
 from .version import (__version__)
 
 __author__ = 'Robert Smallshire'
 
+logger = logging.getLogger(__name__)
+
+
 def setup(app):
     if not hasattr(app, 'add_config_value'):
         return # probably called by nose, better bail out
     app.add_config_value('cartouche_accept_bulleted_args', False, 'env')
     app.add_config_value('cartouche_accept_bulleted_raises', False, 'env')
+    app.add_config_value('cartouche_section_aliases', {}, 'env')
+    app.add_config_value('cartouche_admonition_sections', {}, 'env')
+    app.add_config_value('cartouche_collect_errors', False, 'env')
+    app.add_config_value('cartouche_fail_on_error', True, '')
+    app.add_config_value('cartouche_max_lines', None, 'env')
+    app.add_config_value('cartouche_max_depth', None, 'env')
+    app.add_config_value('cartouche_max_time', None, '')
+    app.add_config_value('cartouche_field_nodes', False, 'env')
+    app.add_config_value('cartouche_compact', False, 'env')
+    app.add_config_value('cartouche_attributes_style', 'directive', 'env')
+    app.add_config_value('cartouche_index_attributes', False, 'env')
+    app.add_config_value('cartouche_cache', False, '')
+    app.add_config_value('cartouche_cache_dir', None, '')
+    app.add_config_value('cartouche_cache_max_size', 64 * 1024 * 1024, '')
+    app.add_config_value('cartouche_cache_max_age', 30 * 24 * 60 * 60, '')
+    app.add_config_value('cartouche_memo_size', 1024, '')
+    app.add_config_value('cartouche_sidecars', [], '')
+    app.add_config_value('cartouche_profile', False, '')
+    app.add_config_value('cartouche_profile_slowest', 10, '')
+    app.add_config_value('cartouche_track_docstrings', False, '')
+    app.add_config_value('cartouche_prewarm', False, '')
+    app.add_config_value('cartouche_prewarm_modules', [], '')
+    app.add_config_value('cartouche_prewarm_workers', None, '')
+    app.add_directive(FIELDS_DIRECTIVE, FieldsDirective)
+    app.add_directive(ATTRIBUTES_DIRECTIVE, AttributesDirective)
     app.connect('builder-inited', builder_inited)
+    app.connect('builder-inited', init_render_cache)
+    app.connect('builder-inited', init_sidecars)
+    app.connect('builder-inited', init_profile)
+    app.connect('builder-inited', init_fingerprints)
+    app.connect('builder-inited', init_autosummary)
+    app.connect('builder-inited', init_diagnostics)
+    app.connect('env-get-outdated', discard_unchanged_documents)
+    app.connect('env-before-read-docs', prewarm_documents)
+    app.connect('env-purge-doc', purge_fingerprints)
+    app.connect('env-purge-doc', purge_diagnostics)
+    app.connect('env-purge-doc', purge_errors)
+    app.connect('doctree-read', record_fingerprints)
+    app.connect('doctree-read', report_diagnostics)
     app.connect('autodoc-process-docstring', rewrite_autodoc)
+    app.connect('env-merge-info', merge_document_records)
+    app.connect('build-finished', report_errors)
+    app.connect('build-finished', report_stats)
+    app.connect('build-finished', report_profile)
 
     return dict(
         version = __version__,
         parallel_read_safe = True,
         parallel_write_safe = True
     )
+
+
+class FieldsDirective(SphinxDirective):
+    '''Build a field list from content in the layout of the fields which
+    cartouche renders, without parsing the field markup. The doctree is the
+    same as docutils would build from the content. See cartouche.fields.'''
+
+    has_content = True
+
+    def run(self):
+        content = self.content
+        field_list = nodes.field_list()
+        self.set_source_info(field_list)
+        for name, body, indexes in split_fields(content):
+            source, offset = content.items[indexes[0]] if indexes else content.items[0]
+            field = nodes.field()
+            field.source, field.line = source, offset + 1
+            if is_plain_name(name):
+                field += nodes.field_name(name, name)
+                field_body = nodes.field_body('\n'.join(body))
+            else:
+                name_nodes, messages = self.state.inline_text(name, self.lineno)
+                field += nodes.field_name(name, '', *name_nodes)
+                field_body = nodes.field_body('\n'.join(body), *messages)
+            field += field_body
+            build_field_body(self, body, indexes, field_body)
+            field_list += field
+        return [field_list]
+
+
+class AttributesDirective(SphinxDirective):
+    '''Build a table of attributes from content in the layout of fields,
+    each named by an attribute and its optional type in parentheses. The
+    descriptions are built as by FieldsDirective.'''
+
+    has_content = True
+
+    def run(self):
+        table = nodes.table(classes=['cartouche-attributes'])
+        self.set_source_info(table)
+        group = nodes.tgroup(cols=3)
+        table += group
+        for width in (1, 1, 3):
+            group += nodes.colspec(colwidth=width)
+        body_node = nodes.tbody()
+        group += body_node
+        for field_name, body, indexes in split_fields(self.content):
+            name, type = split_attribute_name(field_name)
+            row = nodes.row()
+            row += nodes.entry('', nodes.paragraph('', '', nodes.literal(name, name)))
+            type_entry = nodes.entry()
+            if type is not None:
+                type_entry += self.build_type(type)
+            row += type_entry
+            description = nodes.entry()
+            build_field_body(self, body, indexes, description)
+            row += description
+            body_node += row
+        return [table]
+
+    def build_type(self, type):
+        if is_plain_paragraph([type]):
+            return [nodes.paragraph(type, type)]
+        type_nodes, messages = self.state.inline_text(type, self.lineno)
+        return [nodes.paragraph(type, '', *type_nodes)] + messages
+
+
+def build_field_body(directive, body, indexes, parent):
+    '''Append the body of a field within the content of a directive to a
+    node, building it as a paragraph directly where it is plain text, and
+    otherwise parsing it.
+
+    Args:
+        directive: The directive.
+
+        body: The list of lines of the body, as returned by split_fields().
+
+        indexes: The list of indexes into the content of the directive from
+            which the lines of the body were taken.
+
+        parent: The node to which the body is appended.
+    '''
+    content = directive.content
+    if is_plain_paragraph(body):
+        source, offset = content.items[indexes[0]]
+        text = '\n'.join(body)
+        paragraph = nodes.paragraph(text, text)
+        paragraph.source, paragraph.line = source, offset + 1
+        parent += paragraph
+    elif body:
+        directive.state.nested_parse(StringList(body, items=[content.items[i] for i in indexes]),
+                                     directive.content_offset + indexes[0], parent)
+
+
+def init_render_cache(app):
+    '''Open the render cache, if enabled, and trim it to its configured limits.
+
+    This runs in the main process before any parallel read workers are
+    started, so eviction never races with another evictor.
+    '''
+    app.env.cartouche_stats = {}
+    if not app.config.cartouche_cache:
+        app.cartouche_cache = None
+        return
+    directory = app.config.cartouche_cache_dir
+    if directory is None:
+        directory = os.path.join(app.doctreedir, 'cartouche')
+    cache = RenderCache(directory,
+                        max_size=app.config.cartouche_cache_max_size,
+                        max_age=app.config.cartouche_cache_max_age)
+    cache.evict()
+    app.cartouche_cache = cache
+
+
+def init_sidecars(app):
+    '''Open the sidecar files of precompiled docstrings named by
+    cartouche_sidecars, each by its path relative to the configuration
+    directory or by the package with which it is shipped. Those written with
+    a parser configuration other than that of the project are not used.'''
+    configuration = app.cartouche_parser.configuration()
+    sidecars = []
+    for name in app.config.cartouche_sidecars:
+        path = sidecar_path(name, app.confdir)
+        if path is None:
+            logger.warning("cartouche: no sidecar found for {name}".format(name=name))
+            continue
+        try:
+            sidecar = Sidecar(path)
+        except (OSError, ValueError) as error:
+            logger.warning("cartouche: cannot use sidecar {path}: {error}".format(
+                path=path, error=error))
+            continue
+        if not sidecar.matches(configuration):
+            logger.warning("cartouche: cannot use sidecar {path}, which was written by another "
+                           "version of cartouche or with other options than those in "
+                           "conf.py".format(path=path))
+            sidecar.close()
+            continue
+        logger.verbose("cartouche: {count} precompiled docstrings in {path}".format(
+            count=len(sidecar), path=path))
+        sidecars.append(sidecar)
+    app.cartouche_sidecars = sidecars or None
+
+
+def init_profile(app):
+    '''Start gathering timings, if profiling is enabled.'''
+    app.env.cartouche_profile = {} if app.config.cartouche_profile else None
+
+
+def prewarm_documents(app, env, docnames):
+    '''Convert the docstrings of the modules to which the documents about
+    to be read refer, if prewarming is enabled. See cartouche.prewarm.
+
+    This runs in the main process before any parallel read workers are
+    started, so the workers inherit the memo.
+    '''
+    if not app.config.cartouche_prewarm:
+        return
+    memo = getattr(app, 'cartouche_memo', None)
+    cache = getattr(app, 'cartouche_cache', None)
+    sidecars = getattr(app, 'cartouche_sidecars', None)
+    if memo is None and cache is None:
+        logger.warning("cartouche: cartouche_prewarm has no effect with neither the memo "
+                       "nor the render cache enabled")
+        return
+    from .prewarm import referenced_names, module_source, module_docstrings, prewarm
+    start = time.perf_counter()
+    names = list(app.config.cartouche_prewarm_modules)
+    for docname in docnames:
+        try:
+            with open(env.doc2path(docname), encoding=app.config.source_encoding) as document:
+                names.extend(referenced_names(document.read()))
+        except (OSError, ValueError):
+            continue
+    paths = [path for path in dict.fromkeys(map(module_source, dict.fromkeys(names)))
+             if path is not None]
+    workers = app.config.cartouche_prewarm_workers
+    if workers is not None:
+        workers = int(workers)  # As given with sphinx-build -D
+    converted, cached = prewarm(module_docstrings(paths, workers), app.cartouche_parser,
+                                memo, cache, workers, sidecars)
+    logger.info("cartouche: prewarmed {converted} docstrings from {modules} modules, "
+                "{cached} found in sidecars or the render cache, in {seconds:.2f} s".format(
+                    converted=converted, modules=len(paths), cached=cached,
+                    seconds=time.perf_counter() - start))
+
+
+#noinspection PyUnusedLocal
+def merge_document_records(app, env, docnames, other):
+    '''Take the records gathered by a parallel read worker for the documents
+    it read.'''
+    for attribute in ('cartouche_stats', 'cartouche_profile', 'cartouche_fingerprints',
+                      'cartouche_errors'):
+        records = getattr(env, attribute, None)
+        other_records = getattr(other, attribute, None)
+        if records is None or other_records is None:
+            continue
+        for docname in docnames:
+            if docname in other_records:
+                records[docname] = other_records[docname]
+
+
+#noinspection PyUnusedLocal
+def report_stats(app, exception):
+    '''Summarise the counters gathered during the build.'''
+    cache = getattr(app, 'cartouche_cache', None)
+    memo = getattr(app, 'cartouche_memo', None)
+    sidecars = getattr(app, 'cartouche_sidecars', None)
+    if cache is None and memo is None and sidecars is None:
+        return
+    stats = Counter()
+    for document_stats in getattr(app.env, 'cartouche_stats', {}).values():
+        stats.update(document_stats)
+    if memo is not None:
+        # The memo is enabled by default, so is reported only when asked
+        logger.verbose("cartouche: memo {hits} hits, {misses} misses, {evictions} evictions".format(
+            hits=stats['memo_hits'], misses=stats['memo_misses'],
+            evictions=stats['memo_evictions']))
+    if sidecars is not None:
+        logger.info("cartouche: sidecars {hits} hits, {misses} misses".format(
+            hits=stats['sidecar_hits'], misses=stats['sidecar_misses']))
+    if cache is not None:
+        logger.info("cartouche: render cache {hits} hits, {misses} misses".format(
+            hits=stats['cache_hits'], misses=stats['cache_misses']))
+
+
+#noinspection PyUnusedLocal
+def report_profile(app, exception):
+    '''Summarise the timings gathered during the build, and write them as
+    JSON to cartouche-profile.json in the output directory.'''
+    profiles = getattr(app.env, 'cartouche_profile', None)
+    if profiles is None or exception is not None:
+        return
+    from .profile import Profile
+    total = Profile(app.config.cartouche_profile_slowest)
+    for profile in profiles.values():
+        total.merge(profile)
+    for line in total.summary():
+        logger.info("cartouche: " + line)
+    path = os.path.join(app.outdir, 'cartouche-profile.json')
+    with open(path, 'w', encoding='utf-8') as profile_file:
+        json.dump(total.as_dict(), profile_file, indent=2)
+    logger.info("cartouche: profile written to {path}".format(path=path))
+
+
+def init_diagnostics(app):
+    '''Prepare to collect warnings about docstrings for each document, and,
+    if enabled, the errors from which the parser recovered. The errors
+    persist between builds, so that those in documents which are not re-read
+    are still reported.'''
+    app.env.cartouche_diagnostics = {}
+    if not app.config.cartouche_collect_errors:
+        app.env.cartouche_errors = None
+    elif getattr(app.env, 'cartouche_errors', None) is None:
+        app.env.cartouche_errors = {}
+
+
+def report_diagnostics(app, doctree):
+    '''Report together the warnings about the docstrings in the document
+    just read, each with the location of its docstring.'''
+    records = getattr(app.env, 'cartouche_diagnostics', None)
+    if not records:
+        return
+    record = records.pop(app.env.docname, None)
+    if not record:
+        return
+    for path, name, line, message in record:
+        logger.warning(message, location=docstring_location(app.env.docname, path, name, line),
+                       type='cartouche', subtype='docstring')
+
+
+#noinspection PyUnusedLocal
+def purge_diagnostics(app, env, docname):
+    records = getattr(env, 'cartouche_diagnostics', None)
+    if records is not None:
+        records.pop(docname, None)
+
+
+#noinspection PyUnusedLocal
+def purge_errors(app, env, docname):
+    records = getattr(env, 'cartouche_errors', None)
+    if records is not None:
+        records.pop(docname, None)
+
+
+def report_errors(app, exception):
+    '''Report together all of the malformed docstrings in the documents of
+    the project, and fail the build if so configured.'''
+    records = getattr(app.env, 'cartouche_errors', None)
+    if not records or exception is not None:
+        return
+    count = 0
+    for docname in sorted(records):
+        for path, name, line, message in records[docname]:
+            logger.error(message, location=docstring_location(docname, path, name, line),
+                         type='cartouche', subtype='syntax')
+            count += 1
+    if count == 0:
+        return
+    summary = "cartouche: {count} malformed docstring sections".format(count=count)
+    if app.config.cartouche_fail_on_error:
+        logger.error(summary)
+        app.statuscode = 1
+    else:
+        logger.warning(summary, type='cartouche', subtype='syntax')
+
+
+def docstring_location(docname, path, name, line=None):
+    '''The location of a docstring as autodoc describes it, such as
+    ``package/module.py:docstring of package.module.function:3``, or the
+    document in which it appears if the source file of the object is unknown.
+
+    Args:
+        docname: The name of the document in which the docstring appears.
+
+        path: The path of the source file of the object, or None.
+
+        name: The fully qualified name of the object.
+
+        line: An optional one-based line number within the docstring.
+    '''
+    if path is None:
+        return (docname, None)
+    location = "{path}:docstring of {name}".format(path=path, name=name)
+    if line is not None:
+        location += ":{line}".format(line=line)
+    return location
+
+
+def init_autosummary(app):
+    '''Have autosummary tables request only the summaries of docstrings,
+    if sphinx.ext.autosummary is enabled.'''
+    if 'sphinx.ext.autosummary' not in app.extensions:
+        return
+    app.add_directive('autosummary', summary_only_autosummary(), override=True)
+
+
+def summary_only_autosummary():
+    '''A subclass of the autosummary directive which converts only the
+    opening paragraphs of the docstrings in its table.'''
+    from sphinx.ext.autosummary import Autosummary
+
+    class SummaryOnlyAutosummary(Autosummary):
+
+        def get_items(self, names):
+            with summaries_only():
+                return super(SummaryOnlyAutosummary, self).get_items(names)
+
+    return SummaryOnlyAutosummary
+
+
+def tracking_docstrings(app):
+    '''True if documents are to be re-read only when the docstrings or
+    signatures in the modules they document have changed.
+
+    sphinx.ext.viewcode keeps a copy of the source of each module in the
+    environment when a document is read, so in its presence every change to
+    a module must cause the documents which depend upon it to be re-read.
+    '''
+    return app.config.cartouche_track_docstrings and 'sphinx.ext.viewcode' not in app.extensions
+
+
+def init_fingerprints(app):
+    '''Prepare to record the fingerprints of the modules each document
+    depends upon. The records persist between builds.'''
+    if not tracking_docstrings(app):
+        app.env.cartouche_fingerprints = None
+        if app.config.cartouche_track_docstrings:
+            logger.warning("cartouche: cartouche_track_docstrings has no effect "
+                           "with sphinx.ext.viewcode enabled")
+    elif getattr(app.env, 'cartouche_fingerprints', None) is None:
+        app.env.cartouche_fingerprints = {}
+    app.cartouche_fingerprint_memo = {}
+
+
+def python_dependencies(paths):
+    '''The normalised absolute paths of the Python source files amongst
+    some dependency paths.'''
+    return [os.path.normpath(os.path.abspath(str(path)))
+            for path in paths if str(path).endswith('.py')]
+
+
+def fingerprint(app, path):
+    '''The interface fingerprint of a Python source file, or None if it
+    cannot be read. Fingerprints are remembered for the duration of a build
+    for as long as the modification time of the file is unchanged.'''
+    try:
+        modified = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    memo = app.cartouche_fingerprint_memo
+    entry = memo.get(path)
+    if entry is not None and entry[0] == modified:
+        return entry[1]
+    try:
+        result = file_fingerprint(path)
+    except (OSError, SyntaxError, ValueError):
+        result = None
+    memo[path] = (modified, result)
+    return result
+
+
+def record_fingerprints(app, doctree):
+    '''Record the fingerprints of the Python source files on which the
+    document just read depends.'''
+    fingerprints = getattr(app.env, 'cartouche_fingerprints', None)
+    if fingerprints is None:
+        return
+    dependencies = doctree.settings.record_dependencies
+    paths = python_dependencies(dependencies.list if dependencies else ())
+    if not paths:
+        fingerprints.pop(app.env.docname, None)
+        return
+    fingerprints[app.env.docname] = {path: fingerprint(app, path) for path in paths}
+
+
+#noinspection PyUnusedLocal
+def purge_fingerprints(app, env, docname):
+    fingerprints = getattr(env, 'cartouche_fingerprints', None)
+    if fingerprints is not None:
+        fingerprints.pop(docname, None)
+
+
+def modified_since(path, read_time):
+    '''True if a file has been modified since a document was read.
+
+    Sphinx records the time a document was read in integer microseconds, and
+    before version 7.2 in floating point seconds.
+    '''
+    modified = os.stat(path).st_mtime_ns
+    if isinstance(read_time, float):
+        return modified / 1e9 > read_time
+    return -(modified // -1000) > read_time
+
+
+def unchanged_but_for_implementation(app, env, docname, recorded):
+    '''True if the only changes on which a document depends are to the
+    implementation, rather than the interface, of Python modules.'''
+    if docname in env.reread_always:
+        return False
+    read_time = env.all_docs.get(docname)
+    if read_time is None:
+        return False
+    try:
+        if modified_since(env.doc2path(docname), read_time):
+            return False
+        for dependency in env.dependencies.get(docname, ()):
+            # Sphinx records dependencies relative to the source directory,
+            # or in later versions as absolute paths, which joining leaves
+            # as they are.
+            path = os.path.join(str(env.srcdir), str(dependency))
+            if not modified_since(path, read_time):
+                continue
+            normalised = python_dependencies([path])
+            if not normalised or normalised[0] not in recorded:
+                return False
+            current = fingerprint(app, normalised[0])
+            if current is None or current != recorded[normalised[0]]:
+                return False
+    except OSError:
+        return False
+    return True
+
+
+#noinspection PyUnusedLocal
+def discard_unchanged_documents(app, env, added, changed, removed):
+    '''Remove from the changed documents those which Sphinx would re-read
+    only because a module they document has changed, where the docstrings
+    and signatures of the module have not.
+
+    The set of changed documents is modified in place, since the event only
+    allows documents to be added to it. This relies on Sphinx reading the
+    same set after emitting the event, as every version from 1.5, which
+    introduced the event, to 9.0 does. Were a later version to pass a copy,
+    the documents would merely be re-read as usual.
+    '''
+    fingerprints = getattr(env, 'cartouche_fingerprints', None)
+    if not fingerprints:
+        return []
+    unchanged = [docname for docname in changed
+                 if docname in fingerprints
+                 and unchanged_but_for_implementation(app, env, docname, fingerprints[docname])]
+    changed.difference_update(unchanged)
+    if unchanged:
+        logger.verbose("cartouche: {count} documents depend only on modules with unchanged "
+                    "docstrings and will not be re-read".format(count=len(unchanged)))
+    return []
@@ -0,0 +1,229 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from cartouche.cache import RenderCache, ParseMemo
+from cartouche.parser import parse_cached, parse_memoized, parse_cartouche_text
+
+__author__ = 'Robert Smallshire'
+
+
+class Environment(object):
+
+    def __init__(self):
+        self.docname = 'index'
+        self.cartouche_stats = {}
+
+
+class RenderCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_get_missing(self):
+        cache = RenderCache(self.directory)
+        key = cache.key(["A docstring"], ('config',))
+        self.assertIsNone(cache.get(key))
+
+    def test_put_get(self):
+        cache = RenderCache(self.directory)
+        key = cache.key(["A docstring"], ('config',))
+        cache.put(key, ["A docstring", ""])
+        self.assertEqual(cache.get(key), ["A docstring", ""])
+
+    def test_shared_between_instances(self):
+        key = RenderCache(self.directory).key(["A docstring"], ('config',))
+        RenderCache(self.directory).put(key, ["A docstring", ""])
+        self.assertEqual(RenderCache(self.directory).get(key), ["A docstring", ""])
+
+    def test_key_depends_on_lines(self):
+        cache = RenderCache(self.directory)
+        self.assertNotEqual(cache.key(["First"], ('config',)),
+                            cache.key(["Second"], ('config',)))
+
+    def test_key_depends_on_line_boundaries(self):
+        cache = RenderCache(self.directory)
+        self.assertNotEqual(cache.key(["First", "Second"], ('config',)),
+                            cache.key(["First Second"], ('config',)))
+
+    def test_key_depends_on_configuration(self):
+        cache = RenderCache(self.directory)
+        self.assertNotEqual(cache.key(["A docstring"], ('one',)),
+                            cache.key(["A docstring"], ('two',)))
+
+    def test_corrupt_entry_is_a_miss(self):
+        cache = RenderCache(self.directory)
+        key = cache.key(["A docstring"], ('config',))
+        cache.put(key, ["A docstring", ""])
+        with open(cache._path(key), 'w') as entry:
+            entry.write('{"rst": [')
+        self.assertIsNone(cache.get(key))
+
+    def test_evict_by_age(self):
+        cache = RenderCache(self.directory, max_age=60)
+        stale_key = cache.key(["Stale"], ('config',))
+        fresh_key = cache.key(["Fresh"], ('config',))
+        cache.put(stale_key, ["Stale", ""])
+        cache.put(fresh_key, ["Fresh", ""])
+        os.utime(cache._path(stale_key), (0, 0))
+        removed = cache.evict()
+        self.assertEqual(removed, 1)
+        self.assertIsNone(cache.get(stale_key))
+        self.assertEqual(cache.get(fresh_key), ["Fresh", ""])
+
+    def test_evict_by_size_removes_oldest(self):
+        cache = RenderCache(self.directory)
+        keys = [cache.key([str(i)], ('config',)) for i in range(3)]
+        for i, key in enumerate(keys):
+            cache.put(key, [str(i), ""])
+            os.utime(cache._path(key), (1000 + i, 1000 + i))
+        cache.max_size = os.path.getsize(cache._path(keys[0])) * 2
+        removed = cache.evict()
+        self.assertEqual(removed, 1)
+        self.assertIsNone(cache.get(keys[0]))
+        self.assertIsNotNone(cache.get(keys[1]))
+        self.assertIsNotNone(cache.get(keys[2]))
+
+
+class ParseCachedTests(unittest.TestCase):
+
+    source = """Fetches rows from a Bigtable.
+
+        Args:
+            big_table: An open Bigtable Table instance.
+
+        Returns:
+            A dict mapping keys to the corresponding table row data.
+        """.splitlines()
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = RenderCache(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_miss_then_hit(self):
+        env = Environment()
+        first = parse_cached(self.cache, self.source, env)
+        second = parse_cached(self.cache, self.source, env)
+        self.assertEqual(first, parse_cartouche_text(self.source))
+        self.assertEqual(second, first)
+        self.assertEqual(env.cartouche_stats['index']['cache_misses'], 1)
+        self.assertEqual(env.cartouche_stats['index']['cache_hits'], 1)
+
+    def test_counted_per_document(self):
+        env = Environment()
+        parse_cached(self.cache, self.source, env)
+        env.docname = 'other'
+        parse_cached(self.cache, self.source, env)
+        self.assertEqual(env.cartouche_stats['index']['cache_misses'], 1)
+        self.assertEqual(env.cartouche_stats['other']['cache_hits'], 1)
+
+    def test_without_environment(self):
+        first = parse_cached(self.cache, self.source)
+        second = parse_cached(self.cache, self.source)
+        self.assertEqual(second, first)
+
+
+class Documented(object):
+    '''An object which can be weakly referenced.'''
+    pass
+
+
+class ParseMemoTests(unittest.TestCase):
+
+    def test_get_missing(self):
+        memo = ParseMemo()
+        self.assertIsNone(memo.get(['Text.', '']))
+        self.assertEqual(memo.misses, 1)
+
+    def test_put_get(self):
+        memo = ParseMemo()
+        memo.put(['Text.', ''], ['Rendered.', ''])
+        self.assertEqual(memo.get(['Text.', '']), ['Rendered.', ''])
+        self.assertEqual(memo.hits, 1)
+        self.assertEqual(memo.identity_hits, 0)
+
+    def test_found_through_owner(self):
+        memo = ParseMemo()
+        owner = Documented()
+        memo.put(['Text.', ''], ['Rendered.', ''], owner)
+        self.assertEqual(memo.get(['Text.', ''], owner), ['Rendered.', ''])
+        self.assertEqual(memo.identity_hits, 1)
+
+    def test_owner_with_different_lines(self):
+        memo = ParseMemo()
+        owner = Documented()
+        memo.put(['Text.', ''], ['Rendered.', ''], owner)
+        self.assertIsNone(memo.get(['Other text.', ''], owner))
+        self.assertEqual(memo.misses, 1)
+
+    def test_owner_is_not_kept_alive(self):
+        memo = ParseMemo()
+        owner = Documented()
+        memo.put(['Text.', ''], ['Rendered.', ''], owner)
+        del owner
+        self.assertEqual(len(memo._owners), 0)
+        self.assertEqual(memo.get(['Text.', '']), ['Rendered.', ''])
+
+    def test_owner_which_cannot_be_weakly_referenced(self):
+        memo = ParseMemo()
+        memo.put(['Text.', ''], ['Rendered.', ''], 42)
+        self.assertEqual(memo.get(['Text.', ''], 42), ['Rendered.', ''])
+        self.assertEqual(memo.identity_hits, 0)
+
+    def test_evicts_least_recently_used(self):
+        memo = ParseMemo(max_size=2)
+        memo.put(['a'], ['A'])
+        memo.put(['b'], ['B'])
+        memo.get(['a'])
+        self.assertEqual(memo.put(['c'], ['C']), 1)
+        self.assertEqual(memo.evictions, 1)
+        self.assertEqual(len(memo), 2)
+        self.assertIsNone(memo.get(['b']))
+        self.assertEqual(memo.get(['a']), ['A'])
+        self.assertEqual(memo.get(['c']), ['C'])
+
+    def test_evicted_entry_not_found_through_owner(self):
+        memo = ParseMemo(max_size=1)
+        owner = Documented()
+        memo.put(['a'], ['A'], owner)
+        memo.put(['b'], ['B'])
+        self.assertIsNone(memo.get(['a'], owner))
+
+    def test_zero_size_holds_nothing(self):
+        memo = ParseMemo(max_size=0)
+        memo.put(['a'], ['A'])
+        self.assertEqual(len(memo), 0)
+
+
+class ParseMemoizedTests(unittest.TestCase):
+
+    source = ParseCachedTests.source
+
+    def test_miss_then_hit(self):
+        env = Environment()
+        memo = ParseMemo()
+        first = parse_memoized(memo, self.source, None, env)
+        second = parse_memoized(memo, list(self.source), None, env)
+        self.assertEqual(first, parse_cartouche_text(self.source))
+        self.assertIs(second, first)
+        self.assertEqual(env.cartouche_stats['index']['memo_misses'], 1)
+        self.assertEqual(env.cartouche_stats['index']['memo_hits'], 1)
+
+    def test_consults_render_cache_on_miss(self):
+        directory = tempfile.mkdtemp()
+        try:
+            env = Environment()
+            cache = RenderCache(directory)
+            parse_memoized(ParseMemo(), self.source, None, env, cache=cache)
+            parse_memoized(ParseMemo(), self.source, None, env, cache=cache)
+            self.assertEqual(env.cartouche_stats['index']['cache_misses'], 1)
+            self.assertEqual(env.cartouche_stats['index']['cache_hits'], 1)
+        finally:
+            shutil.rmtree(directory)
@@ -0,0 +1,177 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from cartouche.cli import main
+
+__author__ = 'Robert Smallshire'
+
+
+class CommandLineTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'module.py')
+        with open(self.path, 'w') as source_file:
+            source_file.write('def f(x):\n'
+                              '    """Do it.\n'
+                              '\n'
+                              '    Args:\n'
+                              '        x: The x.\n'
+                              '    """\n'
+                              '\n'
+                              'def g(x):\n'
+                              '    """Do it badly.\n'
+                              '\n'
+                              '    Args:\n'
+                              '        not an argument\n'
+                              '    """\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def run_main(self, argv, stdin=''):
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        status = main(argv, io.StringIO(stdin), stdout, stderr)
+        return status, stdout.getvalue(), stderr.getvalue()
+
+    def test_source_file_to_rst(self):
+        status, stdout, stderr = self.run_main([self.path])
+        self.assertEqual(status, 1)
+        self.assertEqual(stdout, ".. module.f\n\nDo it.\n\n:param x: The x.\n\n")
+        self.assertIn("module.py:8: module.g:", stderr)
+
+    def test_source_file_to_json_lines(self):
+        status, stdout, stderr = self.run_main(['--format', 'jsonl', self.path])
+        records = [json.loads(line) for line in stdout.splitlines()]
+        self.assertEqual(records[0], dict(name='module.f', rst=['Do it.', '', ':param x: The x.', '']))
+        self.assertEqual(records[1]['name'], 'module.g')
+        self.assertIn('error', records[1])
+
+    def test_output_file(self):
+        output_path = os.path.join(self.directory, 'out.rst')
+        self.run_main(['--output', output_path, self.path])
+        with open(output_path) as output_file:
+            self.assertTrue(output_file.read().startswith(".. module.f\n"))
+
+    def test_json_lines_from_stdin(self):
+        stdin = (json.dumps(dict(name='f', docstring="Do it.\n\n    Args:\n        x: The x.\n    ")) + '\n'
+                 + json.dumps(dict(name='g', lines=['Do nothing.', '', 'Returns:', '    Nothing.'])) + '\n')
+        status, stdout, stderr = self.run_main([], stdin)
+        self.assertEqual(status, 0)
+        records = [json.loads(line) for line in stdout.splitlines()]
+        self.assertEqual(records, [dict(name='f', rst=['Do it.', '', ':param x: The x.', '']),
+                                   dict(name='g', rst=['Do nothing.', '', ':returns: Nothing.', ''])])
+
+    def test_malformed_json_lines_reported(self):
+        stdin = ('{"name": "f", "docstring": \n'
+                 + json.dumps(dict(name='g')) + '\n'
+                 + json.dumps(dict(name='h', lines='Do it.')) + '\n'
+                 + json.dumps(['Do it.']) + '\n'
+                 + json.dumps(dict(name='i', lines=['Do it.', ''])) + '\n')
+        status, stdout, stderr = self.run_main([], stdin)
+        self.assertEqual(status, 1)
+        self.assertEqual([json.loads(line) for line in stdout.splitlines()],
+                         [dict(name='i', rst=['Do it.', ''])])
+        self.assertEqual([line.split(':')[:2] for line in stderr.splitlines()],
+                         [['<stdin>', '1'], ['<stdin>', '2'], ['<stdin>', '3'], ['<stdin>', '4']])
+        self.assertIn('Expected a "docstring" or "lines" member', stderr)
+
+    def test_json_lines_streamed(self):
+        stdout = io.StringIO()
+        flushed = []
+        stdout.flush = lambda: flushed.append(stdout.getvalue())
+
+        def stdin():
+            for name in 'fgh':
+                # Each result is written before the next line is read
+                self.assertEqual(len(flushed), 'fgh'.index(name))
+                yield json.dumps(dict(name=name, lines=['Do it.', ''])) + '\n'
+
+        status = main([], stdin(), stdout, io.StringIO())
+        self.assertEqual(status, 0)
+        self.assertEqual([json.loads(text.splitlines()[-1])['name'] for text in flushed], ['f', 'g', 'h'])
+
+    def test_warnings_reported(self):
+        stdin = json.dumps(dict(name='f', lines=['Do it.', '', 'Args:', '    x:', ''])) + '\n'
+        status, stdout, stderr = self.run_main([], stdin)
+        self.assertEqual(status, 0)
+        self.assertIn("<stdin>:1: f: warning: Missing argument description for x", stderr)
+
+    def test_limits_pass_through(self):
+        lines = ['Do it.', '', 'Args:', '    x: The x.', '']
+        stdin = json.dumps(dict(name='f', lines=lines)) + '\n'
+        status, stdout, stderr = self.run_main(['--max-lines', '3'], stdin)
+        self.assertEqual(status, 0)
+        self.assertEqual(json.loads(stdout), dict(name='f', rst=lines))
+        self.assertIn("<stdin>:1: f: warning: Docstring left unconverted", stderr)
+
+    def test_compact(self):
+        lines = ['Do it.', '', 'Args:', '    x (int): The x.', '']
+        stdin = json.dumps(dict(name='f', lines=lines)) + '\n'
+        status, stdout, stderr = self.run_main(['--compact'], stdin)
+        self.assertEqual(status, 0)
+        self.assertEqual(json.loads(stdout), dict(name='f', rst=['Do it.', '', ':param int x: The x.', '']))
+
+    def test_attributes_style(self):
+        lines = ['A point.', '', 'Attributes:', '    x: The x.', '']
+        stdin = json.dumps(dict(name='f', lines=lines)) + '\n'
+        status, stdout, stderr = self.run_main(['--attributes-style', 'fields'], stdin)
+        self.assertEqual(status, 0)
+        self.assertEqual(json.loads(stdout), dict(name='f', rst=['A point.', '', ':ivar x: The x.', '']))
+
+    def test_sections(self):
+        lines = ['Do it.', '', 'Parameters:', '    x: The x.', '', 'See Also:', '    g', '']
+        stdin = json.dumps(dict(name='f', lines=lines)) + '\n'
+        status, stdout, stderr = self.run_main(['--section-alias', 'Parameters=Args',
+                                                '--admonition-section', 'See Also=seealso'], stdin)
+        self.assertEqual(status, 0)
+        self.assertEqual(json.loads(stdout)['rst'][:7], ['Do it.', '', ':param x: The x.', '',
+                                                         '.. seealso::', '', '    g'])
+
+    def test_malformed_sections(self):
+        for argv in (['--section-alias', 'Parameters'],
+                     ['--section-alias', 'Parameters=Arguments'],
+                     ['--admonition-section', '=seealso']):
+            with self.assertRaises(SystemExit):
+                self.run_main(argv)
+
+    def test_collect_errors(self):
+        status, stdout, stderr = self.run_main(['--collect-errors', self.path])
+        self.assertEqual(status, 1)
+        self.assertIn(".. module.g\n\nDo it badly.\n", stdout)
+        self.assertIn("module.py:8: module.g: error:", stderr)
+
+    def test_sidecar(self):
+        from cartouche.cache import render_digest
+        from cartouche.parser import CartoucheParser
+        from cartouche.sidecar import Sidecar
+        output_path = os.path.join(self.directory, 'cartouche.sidecar')
+        status, stdout, stderr = self.run_main(['--format', 'sidecar', '-o', output_path, self.path])
+        self.assertEqual(status, 1)
+        self.assertEqual(stdout, "")
+        self.assertIn("module.py:8: module.g:", stderr)
+        lines = ['Do it.', '', 'Args:', '    x: The x.', '']
+        with Sidecar(output_path) as sidecar:
+            self.assertEqual(len(sidecar), 1)
+            self.assertEqual(sidecar.get(render_digest(lines, CartoucheParser().configuration())),
+                             ['Do it.', '', ':param x: The x.', ''])
+
+    def test_sidecar_configuration(self):
+        from cartouche.parser import CartoucheParser, make_sections
+        from cartouche.sidecar import Sidecar
+        output_path = os.path.join(self.directory, 'cartouche.sidecar')
+        self.run_main(['--format', 'sidecar', '-o', output_path, '--collect-errors',
+                       '--section-alias', 'Parameters=Args', self.path])
+        parser = CartoucheParser(sections=make_sections({'Parameters': 'Args'}), recover=True)
+        with Sidecar(output_path) as sidecar:
+            self.assertTrue(sidecar.matches(parser.configuration()))
+            self.assertFalse(sidecar.matches(CartoucheParser().configuration()))
+
+    def test_sidecar_requires_output(self):
+        with self.assertRaises(SystemExit):
+            self.run_main(['--format', 'sidecar', self.path])
@@ -0,0 +1,135 @@
+import random
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from cartouche.parser import (CartoucheParser, CartoucheSyntaxError,
+                              bulleted_args, default_parser, make_sections,
+                              parse_many)
+
+__author__ = 'Robert Smallshire'
+
+
+BULLETED = """Bulleted arguments and exceptions.
+
+    Args:
+        * arg1: Argument 1.
+        * arg2: Argument 2.
+
+    Raises:
+        * SomeError: If there is a problem.
+    """.splitlines()
+
+ALIASED = """Aliased sections.
+
+    Parameters:
+        x (int): The x.
+
+    Return:
+        The result.
+    """.splitlines()
+
+PLAIN = """Plain sections.
+
+    Args:
+        x (int): The x.
+
+    Returns:
+        The result.
+    """.splitlines()
+
+
+def parse_or_error(parser, lines):
+    try:
+        return parser.parse(lines)
+    except CartoucheSyntaxError as e:
+        return type(e)
+
+
+class CartoucheParserTests(unittest.TestCase):
+
+    def test_configurations_are_independent(self):
+        bulleted_parser = CartoucheParser(bulleted_args=True, bulleted_raises=True)
+        plain_parser = CartoucheParser()
+        self.assertEqual(bulleted_parser.parse(BULLETED)[2], "    :param arg1: Argument 1.")
+        self.assertRaises(CartoucheSyntaxError, plain_parser.parse, BULLETED)
+
+    def test_sections(self):
+        parser = CartoucheParser(sections=make_sections(aliases={'Parameters': 'Args',
+                                                                 'Return': 'Returns'}))
+        self.assertEqual(parser.parse(ALIASED)[1:], CartoucheParser().parse(PLAIN)[1:])
+
+    def test_configuration_distinguishes_parsers(self):
+        self.assertNotEqual(CartoucheParser().configuration(),
+                            CartoucheParser(bulleted_args=True).configuration())
+        self.assertEqual(CartoucheParser().configuration(),
+                         CartoucheParser().configuration())
+
+    def test_replace(self):
+        parser = CartoucheParser(bulleted_raises=True).replace(bulleted_args=True)
+        self.assertTrue(parser.bulleted_args)
+        self.assertTrue(parser.bulleted_raises)
+
+    def test_context_manager_restores_on_error(self):
+        try:
+            with bulleted_args():
+                self.assertTrue(default_parser().bulleted_args)
+                raise RuntimeError("Escape")
+        except RuntimeError:
+            pass
+        self.assertFalse(default_parser().bulleted_args)
+
+
+class ConcurrentParsingTests(unittest.TestCase):
+
+    def test_mixed_configurations_from_many_threads(self):
+        parsers = [CartoucheParser(),
+                   CartoucheParser(bulleted_args=True, bulleted_raises=True),
+                   CartoucheParser(sections=make_sections(aliases={'Parameters': 'Args',
+                                                                   'Return': 'Returns'}))]
+        docstrings = [BULLETED, ALIASED, PLAIN]
+        expected = {(p, d): parse_or_error(parser, docstring)
+                    for p, parser in enumerate(parsers)
+                    for d, docstring in enumerate(docstrings)}
+
+        generator = random.Random(42)
+        tasks = [(generator.randrange(len(parsers)), generator.randrange(len(docstrings)))
+                 for _ in range(5000)]
+
+        def run(task):
+            p, d = task
+            return task, parse_or_error(parsers[p], docstrings[d])
+
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            for task, result in executor.map(run, tasks):
+                self.assertEqual(result, expected[task])
+
+
+class ParseManyTests(unittest.TestCase):
+
+    def setUp(self):
+        self.docstrings = [PLAIN, BULLETED, ALIASED] * 10
+        self.parser = CartoucheParser(sections=make_sections(aliases={'Parameters': 'Args',
+                                                                      'Return': 'Returns'}))
+
+    def check(self, results):
+        self.assertEqual(len(results), len(self.docstrings))
+        for lines, result in zip(self.docstrings, results):
+            if lines is BULLETED:
+                self.assertIsNone(result.lines)
+                self.assertIsInstance(result.error, CartoucheSyntaxError)
+            else:
+                self.assertEqual(result.lines, self.parser.parse(lines))
+                self.assertIsNone(result.error)
+
+    def test_in_process(self):
+        self.check(list(parse_many(self.docstrings, workers=4, parser=self.parser)))
+
+    def test_single_worker(self):
+        self.check(list(parse_many(self.docstrings, workers=1, threshold=1, parser=self.parser)))
+
+    def test_process_pool(self):
+        self.check(list(parse_many(iter(self.docstrings), workers=2, chunksize=4, threshold=8,
+                                   parser=self.parser)))
+
+    def test_empty(self):
+        self.assertEqual(list(parse_many([])), [])
@@ -0,0 +1,154 @@
+import io
+import shutil
+import sys
+import tempfile
+import unittest
+
+from cartouche.cache import ParseMemo, RenderCache
+from cartouche.diagnostics import Diagnostic, Diagnostics, locate
+from cartouche.parser import (CartoucheParser, parse_cached, parse_many,
+                              parse_memoized, rewrite_autodoc)
+
+__author__ = 'Robert Smallshire'
+
+
+class Environment(object):
+
+    def __init__(self):
+        self.docname = 'index'
+        self.cartouche_stats = {}
+        self.cartouche_diagnostics = {}
+
+
+class Application(object):
+
+    def __init__(self):
+        self.env = Environment()
+
+
+SOURCE = ["Do it.",
+          "",
+          "Args:",
+          "    x:",
+          "    y: The y.",
+          "",
+          "Raises:",
+          "    ValueError:",
+          ""]
+
+
+class DiagnosticsTests(unittest.TestCase):
+
+    def test_empty(self):
+        self.assertEqual(len(Diagnostics()), 0)
+        self.assertFalse(Diagnostics())
+
+    def test_duplicates_removed_in_order(self):
+        diagnostics = Diagnostics()
+        diagnostics.report("First", 'x')
+        diagnostics.report("Second")
+        diagnostics.report("First", 'x')
+        self.assertEqual(list(diagnostics), [Diagnostic("First", 'x'), Diagnostic("Second", None)])
+
+    def test_extend_with_pairs(self):
+        diagnostics = Diagnostics([["First", 'x']])
+        self.assertEqual(list(diagnostics), [Diagnostic("First", 'x')])
+
+
+class LocateTests(unittest.TestCase):
+
+    def test_locate(self):
+        self.assertEqual(locate(SOURCE, 'x'), 4)
+
+    def test_locate_bulleted(self):
+        self.assertEqual(locate(["Args:", "    * x: The x."], 'x'), 2)
+
+    def test_locate_starred(self):
+        self.assertEqual(locate(["Args:", "    *args: The rest."], '*args'), 2)
+
+    def test_not_found(self):
+        self.assertIsNone(locate(SOURCE, 'z'))
+
+    def test_no_subject(self):
+        self.assertIsNone(locate(SOURCE, None))
+
+
+class CollectionTests(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = CartoucheParser()
+
+    def test_missing_descriptions(self):
+        diagnostics = Diagnostics()
+        self.parser.parse(SOURCE, diagnostics)
+        self.assertEqual(list(diagnostics),
+                         [Diagnostic("Missing argument description for x", 'x'),
+                          Diagnostic("Missing exception description for ValueError", 'ValueError')])
+
+    def test_empty_returns_and_yields(self):
+        for heading in ("Returns:", "Yields:"):
+            diagnostics = Diagnostics()
+            self.parser.parse(["Do it.", "", heading, ""], diagnostics)
+            self.assertEqual(list(diagnostics), [])
+
+    def test_empty_usage(self):
+        diagnostics = Diagnostics()
+        self.parser.parse(["Do it.", "", "Usage:", ""], diagnostics)
+        self.assertEqual(list(diagnostics), [Diagnostic("No code in Usage block. Skipping!", 'Usage:')])
+
+    def test_printed_without_collection(self):
+        stderr = sys.stderr
+        sys.stderr = io.StringIO()
+        try:
+            self.parser.parse(SOURCE)
+            printed = sys.stderr.getvalue()
+        finally:
+            sys.stderr = stderr
+        self.assertIn("Missing argument description for x", printed)
+
+    def test_parse_many(self):
+        results = list(parse_many([SOURCE, ["Done.", ""]], workers=1))
+        self.assertEqual(len(results[0].diagnostics), 2)
+        self.assertEqual(results[1].diagnostics, ())
+
+    def test_memo_hit_keeps_diagnostics(self):
+        memo = ParseMemo()
+        parse_memoized(memo, SOURCE, parser=self.parser)
+        diagnostics = Diagnostics()
+        parse_memoized(memo, SOURCE, parser=self.parser, diagnostics=diagnostics)
+        self.assertEqual(memo.hits, 1)
+        self.assertEqual(len(diagnostics), 2)
+
+    def test_cache_hit_keeps_diagnostics(self):
+        directory = tempfile.mkdtemp()
+        try:
+            cache = RenderCache(directory)
+            parse_cached(cache, SOURCE, parser=self.parser)
+            diagnostics = Diagnostics()
+            env = Environment()
+            parse_cached(RenderCache(directory), SOURCE, env, self.parser, diagnostics)
+            self.assertEqual(env.cartouche_stats['index']['cache_hits'], 1)
+            self.assertEqual(len(diagnostics), 2)
+        finally:
+            shutil.rmtree(directory)
+
+
+class RewriteAutodocTests(unittest.TestCase):
+
+    def test_recorded_per_document_with_line(self):
+        app = Application()
+        rewrite_autodoc(app, 'function', 'module.f', None, None, list(SOURCE))
+        rewrite_autodoc(app, 'function', 'module.f', None, None, list(SOURCE))
+        self.assertEqual(list(app.env.cartouche_diagnostics['index']),
+                         [(None, 'module.f', 4, "Missing argument description for x"),
+                          (None, 'module.f', 8, "Missing exception description for ValueError")])
+
+    def test_printed_without_environment(self):
+        stderr = sys.stderr
+        sys.stderr = io.StringIO()
+        try:
+            rewrite_autodoc(None, 'function', 'module.f', None, None, list(SOURCE))
+            printed = sys.stderr.getvalue()
+        finally:
+            sys.stderr = stderr
+        self.assertIn("Missing argument description for x in docstring for function module.f", printed)
@@ -0,0 +1,245 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from cartouche.extract import (extract_docstrings, extract_file, extract_many,
+                               interface_fingerprint,
+                               module_name, prepare_docstring, iter_source_files,
+                               MMAP_THRESHOLD)
+
+__author__ = 'Robert Smallshire'
+
+
+SOURCE = '''"""The module docstring."""
+
+import os
+
+
+def function(x):
+    """A function.
+
+    Args:
+        x: The x.
+    """
+    def inner():
+        """Not extracted."""
+
+
+class Example(object):
+    """A class."""
+
+    def method(self):
+        """A method."""
+
+    async def coroutine(self):
+        """A coroutine."""
+
+    class Inner(object):
+        """An inner class."""
+
+
+def undocumented():
+    pass
+'''
+
+
+class PrepareDocstringTests(unittest.TestCase):
+
+    def test_unindents_after_first_line(self):
+        self.assertEqual(prepare_docstring("Summary.\n\n    Body.\n      More.\n    "),
+                         ['Summary.', '', 'Body.', '  More.', ''])
+
+    def test_leading_blank_lines_removed(self):
+        self.assertEqual(prepare_docstring("\n  Summary.\n  "), ['Summary.', ''])
+
+    def test_tabs_expanded(self):
+        self.assertEqual(prepare_docstring("Summary.\n\tBody."), ['Summary.', 'Body.', ''])
+
+
+class ExtractDocstringsTests(unittest.TestCase):
+
+    def test_names(self):
+        docstrings = extract_docstrings(SOURCE, 'package.module')
+        self.assertEqual([d.name for d in docstrings],
+                         ['package.module',
+                          'package.module.function',
+                          'package.module.Example',
+                          'package.module.Example.method',
+                          'package.module.Example.coroutine',
+                          'package.module.Example.Inner'])
+
+    def test_lines(self):
+        docstrings = extract_docstrings(SOURCE, 'module')
+        self.assertEqual(docstrings[1].lines, ['A function.', '', 'Args:', '    x: The x.', ''])
+        self.assertEqual(docstrings[1].line, 6)
+
+    def test_syntax_error(self):
+        self.assertRaises(SyntaxError, extract_docstrings, "def f(:", 'module')
+
+
+ATTRIBUTES = '''"""The module docstring."""
+
+#: The answer.
+ANSWER = 42
+
+QUESTION = None  #: Not yet known.
+
+UNDOCUMENTED = 1
+
+X, Y = 1, 2
+"""The coordinates."""
+
+
+class Example(object):
+    """A class."""
+
+    colour: str = 'red'
+    """The colour."""
+
+    def __init__(self, size):
+        self.size = size
+        """The size."""
+
+        if size:
+            #: Whether the example is large.
+            #: Only set for non-zero sizes.
+            self.large = size > 10
+
+        other.attribute = 1
+        """Not an attribute of the instance."""
+'''
+
+
+class AttributeDocstringTests(unittest.TestCase):
+
+    def setUp(self):
+        docstrings = extract_docstrings(ATTRIBUTES, 'module')
+        self.docstrings = {docstring.name: docstring.lines for docstring in docstrings}
+
+    def test_names(self):
+        self.assertEqual(sorted(self.docstrings),
+                         ['module', 'module.ANSWER', 'module.Example', 'module.Example.colour',
+                          'module.Example.large', 'module.Example.size', 'module.QUESTION',
+                          'module.X', 'module.Y'])
+
+    def test_string_after_assignment(self):
+        self.assertEqual(self.docstrings['module.X'], ['The coordinates.', ''])
+        self.assertEqual(self.docstrings['module.Example.colour'], ['The colour.', ''])
+        self.assertEqual(self.docstrings['module.Example.size'], ['The size.', ''])
+
+    def test_comment_before_assignment(self):
+        self.assertEqual(self.docstrings['module.ANSWER'], ['The answer.', ''])
+        self.assertEqual(self.docstrings['module.Example.large'],
+                         ['Whether the example is large.', 'Only set for non-zero sizes.', ''])
+
+    def test_comment_after_assignment(self):
+        self.assertEqual(self.docstrings['module.QUESTION'], ['Not yet known.', ''])
+
+    def test_source_order(self):
+        lines = [docstring.line for docstring in extract_docstrings(ATTRIBUTES, 'module')]
+        self.assertEqual(lines, sorted(lines))
+
+
+FINGERPRINTED = '''"""A module."""
+
+LIMIT = 10
+
+
+def function(x):
+    """A function."""
+    return x
+
+
+class Example(object):
+    """A class."""
+
+    def method(self, x, y=1):
+        """A method."""
+        self.total = x + y
+        """The total."""
+        return self.total
+'''
+
+
+class InterfaceFingerprintTests(unittest.TestCase):
+
+    def assertUnchanged(self, old, new):
+        self.assertEqual(interface_fingerprint(FINGERPRINTED),
+                         interface_fingerprint(FINGERPRINTED.replace(old, new)))
+
+    def assertChanged(self, old, new):
+        self.assertNotEqual(interface_fingerprint(FINGERPRINTED),
+                            interface_fingerprint(FINGERPRINTED.replace(old, new)))
+
+    def test_implementation(self):
+        self.assertUnchanged("return self.total", "return self.total * 2")
+        self.assertUnchanged("self.total = x + y", "self.total = x - y")
+
+    def test_line_numbers(self):
+        self.assertUnchanged('"""A module."""\n', '"""A module."""\n\n\n')
+
+    def test_docstrings(self):
+        self.assertChanged("A function.", "A changed function.")
+        self.assertChanged("A method.", "A changed method.")
+        self.assertChanged("The total.", "The sum.")
+
+    def test_signatures(self):
+        self.assertChanged("y=1", "y=2")
+        self.assertChanged("def method", "def renamed")
+
+    def test_module_level(self):
+        self.assertChanged("LIMIT = 10", "LIMIT = 20")
+
+    def test_doc_comments(self):
+        self.assertChanged("LIMIT = 10", "LIMIT = 10  #: The limit.")
+
+
+class SourceFileTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.package = os.path.join(self.directory, 'package')
+        os.makedirs(os.path.join(self.package, 'sub'))
+        for path in ('__init__.py', 'module.py', os.path.join('sub', '__init__.py'),
+                     os.path.join('sub', 'leaf.py')):
+            with open(os.path.join(self.package, path), 'w') as source_file:
+                source_file.write('"""Docstring of {0}."""\n'.format(path))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_module_name(self):
+        self.assertEqual(module_name(os.path.join(self.package, 'sub', 'leaf.py')),
+                         'package.sub.leaf')
+        self.assertEqual(module_name(os.path.join(self.package, '__init__.py')), 'package')
+
+    def test_iter_source_files(self):
+        paths = list(iter_source_files([self.package]))
+        self.assertEqual(len(paths), 4)
+
+    def test_extract_file(self):
+        docstrings = extract_file(os.path.join(self.package, 'sub', 'leaf.py'))
+        self.assertEqual(docstrings[0].name, 'package.sub.leaf')
+        self.assertEqual(docstrings[0].lines, ['Docstring of {0}.'.format(os.path.join('sub', 'leaf.py')), ''])
+
+    def test_extract_large_file(self):
+        path = os.path.join(self.package, 'large.py')
+        with open(path, 'w') as source_file:
+            source_file.write('"""A large module."""\n')
+            source_file.write('# Padding\n' * (MMAP_THRESHOLD // 10 + 1))
+            source_file.write('def f():\n    """A function."""\n')
+        self.assertEqual([d.name for d in extract_file(path)], ['package.large', 'package.large.f'])
+
+    def test_extract_many(self):
+        broken = os.path.join(self.package, 'broken.py')
+        with open(broken, 'w') as source_file:
+            source_file.write('def f(:\n')
+        paths = sorted(iter_source_files([self.package]))
+        serial = list(extract_many(paths, workers=1))
+        parallel = list(extract_many(paths, workers=2, chunksize=1, threshold=2))
+        self.assertEqual([(path, docstrings) for path, docstrings, _ in parallel],
+                         [(path, docstrings) for path, docstrings, _ in serial])
+        errors = {path: error for path, _, error in parallel if error is not None}
+        self.assertEqual(list(errors), [broken])
+        self.assertIsInstance(errors[broken], SyntaxError)
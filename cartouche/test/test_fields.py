@@ -0,0 +1,260 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from cartouche.fields import (FIELDS_DIRECTIVE, ATTRIBUTES_DIRECTIVE, wrap_fields, split_fields,
+                              split_attribute_name, is_plain_name, is_plain_paragraph)
+from cartouche.parser import CartoucheParser, parse_cartouche_text
+
+__author__ = 'Robert Smallshire'
+
+
+SOURCES = [
+    ["Fetches rows from a Bigtable.",
+     "",
+     "Retrieves rows pertaining to the given keys from the Table instance",
+     "represented by big_table.",
+     "",
+     "Args:",
+     "    big_table: An open Bigtable Table instance.",
+     "    keys (list): A sequence of strings representing the key of each",
+     "        table row to fetch.",
+     "    other_silly_variable (str): Another optional variable, that has a",
+     "        much longer name than the other args, and which does nothing.",
+     "",
+     "Returns:",
+     "    A dict mapping keys to the corresponding table row data fetched.",
+     "",
+     "Raises:",
+     "    IOError: An error occurred accessing the bigtable.Table object.",
+     ""],
+    ["Do things.",
+     "",
+     "Args:",
+     "    x (int): The *x*, see `thing`_.",
+     "    *args: A list:",
+     "",
+     "        - one",
+     "        - two",
+     "",
+     "    max_lines: 1. Not a list.",
+     "    y: A. Einstein.",
+     "    z: Either http://example.com or a@b.com.",
+     "    w: Text::",
+     "",
+     "            literal",
+     "",
+     "Note:",
+     "    Between fields.",
+     "",
+     "Raises:",
+     "    ValueError: If x < 0 & y > 1.",
+     "    TypeError: If x is not",
+     "        an integer.",
+     "",
+     "Yields:",
+     "    The  results, with  double spaces.",
+     ""],
+    ["Do it.",
+     "",
+     "Returns:",
+     "    Only a return.",
+     ""],
+]
+
+# With runs of blank lines, which the compact style collapses into one, and
+# typed starred arguments
+COMPACT_SOURCES = SOURCES + [
+    ["Draw a shape.",
+     "",
+     "Args:",
+     "    shape (Shape_): The shape to draw, which",
+     "        may be any shape.",
+     "",
+     "",
+     "    count (int): How many times.",
+     "",
+     "",
+     "Usage:",
+     "    draw(square, 2)",
+     "",
+     "Attributes:",
+     "    colour (str): The colour.",
+     ""],
+    ["Call a function.",
+     "",
+     "Args:",
+     "    function (callable): The function.",
+     "    *args (tuple): The positional arguments.",
+     "    **kwargs (dict): The keyword arguments.",
+     ""],
+]
+
+
+class WrapFieldsTests(unittest.TestCase):
+
+    def test_runs_wrapped(self):
+        lines = ["Do it.", "", ":param x: The x.", ":type x: int", "", ".. note::", "",
+                 "    Carefully.", "", ":returns: Nothing.", ""]
+        self.assertEqual(wrap_fields(lines),
+                         ["Do it.", "",
+                          ".. {0}::".format(FIELDS_DIRECTIVE), "",
+                          "   :param x: The x.", "   :type x: int", "",
+                          ".. note::", "", "    Carefully.", "",
+                          ".. {0}::".format(FIELDS_DIRECTIVE), "",
+                          "   :returns: Nothing.", ""])
+
+    def test_field_continuing_paragraph_not_wrapped(self):
+        lines = ["Do it.", ":param x: The x.", ""]
+        self.assertEqual(wrap_fields(lines), lines)
+
+    def test_run_without_following_blank_line_not_wrapped(self):
+        lines = ["Do it.", "", ":param x: The x.", "More text.", ""]
+        self.assertEqual(wrap_fields(lines), lines)
+
+    def test_no_fields(self):
+        lines = ["Do it.", "", "    Indented.", ""]
+        self.assertEqual(wrap_fields(lines), lines)
+
+
+class SplitFieldsTests(unittest.TestCase):
+
+    def test_split(self):
+        lines = [":param x: The x,", "        which is long.", ":type x: int", "",
+                 r":param \*args: More.", "", ":raises:", "    * ValueError - If bad.", "",
+                 "    * TypeError - If worse.", ""]
+        self.assertEqual(split_fields(lines),
+                         [("param x", ["The x,", "which is long."], [0, 1]),
+                          ("type x", ["int"], [2]),
+                          (r"param \*args", ["More."], [4]),
+                          ("raises", ["* ValueError - If bad.", "", "* TypeError - If worse."],
+                           [7, 8, 9])])
+
+    def test_not_a_field(self):
+        with self.assertRaises(ValueError):
+            split_fields(["Not a field."])
+
+
+class SplitAttributeNameTests(unittest.TestCase):
+
+    def test_split(self):
+        self.assertEqual(split_attribute_name("x (int)"), ("x", "int"))
+        self.assertEqual(split_attribute_name("*args"), ("*args", None))
+
+    def test_empty(self):
+        with self.assertRaises(ValueError):
+            split_attribute_name("")
+
+
+class PlainTests(unittest.TestCase):
+
+    def test_plain_names(self):
+        self.assertTrue(is_plain_name("param max_lines"))
+        self.assertTrue(is_plain_name("type x"))
+        self.assertFalse(is_plain_name(r"param \*args"))
+        self.assertFalse(is_plain_name("param x_"))
+
+    def test_plain_paragraphs(self):
+        self.assertTrue(is_plain_paragraph(["The argument, which (if given)", "is used."]))
+        self.assertFalse(is_plain_paragraph([]))
+        for lines in (["The *x*."], ["A `role`."], ["See target_."], ["- A bullet."],
+                      ["1. An item."], ["A. Einstein."], ["Literal::"], ["http://example.com"],
+                      ["a@b.com"], ["Title", "====="], ["Term", "    Definition."],
+                      [".. comment"], ["Trailing "], ["", "Blank"]):
+            self.assertFalse(is_plain_paragraph(lines), lines)
+
+
+class DoctreeTests(unittest.TestCase):
+    '''The directive should build the same doctree as docutils builds from
+    the field lists it replaces.'''
+
+    @classmethod
+    def setUpClass(cls):
+        from docutils.parsers.rst import directives
+        from cartouche.sphinxext import FieldsDirective, AttributesDirective
+        directives.register_directive(FIELDS_DIRECTIVE, FieldsDirective)
+        directives.register_directive(ATTRIBUTES_DIRECTIVE, AttributesDirective)
+
+    def doctree(self, lines):
+        from docutils.core import publish_doctree
+        settings = dict(report_level=5, halt_level=5, warning_stream=False)
+        return publish_doctree('\n'.join(lines), settings_overrides=settings).pformat()
+
+    def test_same_doctree(self):
+        for source in SOURCES:
+            rst = parse_cartouche_text(source)
+            wrapped = wrap_fields(rst)
+            self.assertNotEqual(wrapped, rst)
+            self.assertEqual(self.doctree(wrapped), self.doctree(rst))
+
+    def test_attributes_table(self):
+        from docutils import nodes
+        from docutils.core import publish_doctree
+        source = ["A point.",
+                  "",
+                  "Attributes:",
+                  "    x (float): The x coordinate.",
+                  "    y (Point_): The *y* coordinate.",
+                  "    z:",
+                  ""]
+        rst = CartoucheParser(attributes_style='table').parse(source)
+        settings = dict(report_level=5, halt_level=5, warning_stream=False)
+        document = publish_doctree('\n'.join(rst), settings_overrides=settings)
+        table, = document.findall(nodes.table)
+        rows = [[entry.astext() for entry in row.children] for row in table.findall(nodes.row)]
+        self.assertEqual(rows, [["x", "float", "The x coordinate."],
+                                ["y", "Point_", "The y coordinate."],
+                                ["z", "", ""]])
+        # The type of y is a reference, and its description contains emphasis
+        type_paragraph = list(table.findall(nodes.row))[1][1][0]
+        self.assertNotIsInstance(type_paragraph[0], nodes.Text)
+        self.assertEqual(len(list(table.findall(nodes.emphasis))), 1)
+
+
+class CompactDoctreeTests(unittest.TestCase):
+    '''Sphinx should build the same doctree from docstrings rendered in the
+    compact style as from those rendered in the default style.'''
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.source_directory = os.path.join(self.directory, 'source')
+        os.mkdir(self.source_directory)
+        open(os.path.join(self.source_directory, 'conf.py'), 'w').close()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_document(self, docname, lines):
+        with open(os.path.join(self.source_directory, docname + '.rst'), 'w') as document_file:
+            document_file.write('.. py:function:: f(x)\n\n')
+            for line in lines:
+                document_file.write(('   ' + line).rstrip() + '\n')
+
+    def descriptions(self, docnames):
+        import io
+        from sphinx import addnodes
+        from sphinx.application import Sphinx
+        with open(os.path.join(self.source_directory, 'index.rst'), 'w') as index_file:
+            index_file.write('.. toctree::\n\n')
+            for docname in docnames:
+                index_file.write('   {docname}\n'.format(docname=docname))
+        app = Sphinx(self.source_directory, self.source_directory,
+                     os.path.join(self.directory, 'build'),
+                     os.path.join(self.directory, 'doctrees'),
+                     'dummy', status=None, warning=io.StringIO())
+        app.build(force_all=True)
+        return [app.env.get_doctree(docname).next_node(addnodes.desc).pformat()
+                for docname in docnames]
+
+    def test_same_doctree(self):
+        docnames = []
+        for number, source in enumerate(COMPACT_SOURCES):
+            for style, parser in (('default', CartoucheParser()),
+                                  ('compact', CartoucheParser(compact=True))):
+                docname = '{style}{number}'.format(style=style, number=number)
+                self.write_document(docname, parser.parse(source))
+                docnames.append(docname)
+        descriptions = self.descriptions(docnames)
+        for default, compact in zip(descriptions[::2], descriptions[1::2]):
+            self.assertEqual(compact, default)
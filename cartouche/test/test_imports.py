@@ -0,0 +1,40 @@
+import subprocess
+import sys
+import unittest
+
+__author__ = 'Robert Smallshire'
+
+# cartouche.errors imports only sphinx.errors, so that CartoucheError is an
+# ExtensionError, which must not bring in any of these.
+HEAVY_MODULES = {'docutils', 'docutils.nodes', 'sphinx.application', 'sphinx.util.logging',
+                 'sphinx.ext.autodoc', 'multiprocessing'}
+
+
+def modules_imported_by(statement):
+    '''The names of the modules loaded by a statement in a fresh interpreter.'''
+    output = subprocess.check_output(
+        [sys.executable, '-c', statement + '\nimport sys\nprint("\\n".join(sys.modules))'],
+        universal_newlines=True)
+    return set(output.split())
+
+
+class ImportTests(unittest.TestCase):
+
+    def assertSphinxNotImported(self, statement):
+        modules = modules_imported_by(statement)
+        self.assertEqual(sorted(modules & HEAVY_MODULES), [])
+
+    def test_package(self):
+        self.assertSphinxNotImported('import cartouche')
+
+    def test_parser(self):
+        self.assertSphinxNotImported('import cartouche.parser\n'
+                                     'cartouche.parser.parse_cartouche_text(["Summary.", "", "Args:", "    x: An x."])')
+
+    def test_command_line(self):
+        self.assertSphinxNotImported('import cartouche.cli')
+
+    def test_error_is_extension_error(self):
+        from sphinx.errors import ExtensionError
+        from cartouche.errors import CartoucheError
+        self.assertTrue(issubclass(CartoucheError, ExtensionError))
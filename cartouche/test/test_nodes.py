@@ -1,6 +1,9 @@
+import io
+import sys
 import unittest
 from cartouche.nodes import (Node, Arg, Raises, Except, Returns, Warning,
-                             Note, Yields, Attribute, Usage)
+                             Note, Yields, Attribute, Usage, RstRenderer,
+                             Arena, NIL, NODE, ARG, FIELD_ATTRIBUTES, TABLE_ATTRIBUTES)
 
 __author__ = 'Robert Smallshire'
 
@@ -45,6 +48,14 @@ class NodeTests(unittest.TestCase):
         self.assertIs(node.children[0], child0)
         self.assertIs(node.children[1], child1)
 
+    def test_parent_does_not_keep_tree_alive(self):
+        node = Node()
+        child = Node(parent=node)
+        node.add_child(child)
+        self.assertIs(child.parent, node)
+        del node
+        self.assertIsNone(child.parent)
+
     def test_render_rst_empty(self):
         node = Node()
         rst = node.render_rst()
@@ -646,6 +657,62 @@ class AttributeTests(unittest.TestCase):
                                '   Description2',
                                ''])
 
+
+class AttributesStyleTests(unittest.TestCase):
+
+    def make_tree(self):
+        group = Node()
+        foo = Attribute(0, 'foo')
+        foo.type = 'str'
+        foo.children.append(Node(indent=4, lines=["Description1", "    Description2"]))
+        group.children.append(foo)
+        group.children.append(Attribute(0, '*bar'))
+        return group
+
+    def render(self, **options):
+        result = []
+        RstRenderer(result, **options).render(self.make_tree())
+        return result
+
+    def test_fields(self):
+        self.assertEqual(self.render(attributes_style=FIELD_ATTRIBUTES),
+                         [':ivar foo: Description1',
+                          '        Description2',
+                          ':vartype foo: str',
+                          '',
+                          r':ivar \*bar: ',
+                          ''])
+
+    def test_compact_fields(self):
+        self.assertEqual(self.render(attributes_style=FIELD_ATTRIBUTES, compact=True),
+                         [':ivar str foo: Description1',
+                          '        Description2',
+                          '',
+                          r':ivar \*bar:',
+                          ''])
+
+    def test_table(self):
+        self.assertEqual(self.render(attributes_style=TABLE_ATTRIBUTES),
+                         ['.. cartouche-attributes::',
+                          '',
+                          '   :foo (str): Description1',
+                          '           Description2',
+                          '',
+                          '   :*bar: ',
+                          ''])
+
+    def test_index(self):
+        self.assertEqual(self.render(attributes_style=TABLE_ATTRIBUTES, index_attributes=True)[:5],
+                         ['.. index::',
+                          '   single: foo (attribute)',
+                          '   single: *bar (attribute)',
+                          '',
+                          '.. cartouche-attributes::'])
+
+    def test_directives_are_not_indexed_twice(self):
+        self.assertEqual(self.render(index_attributes=True)[0], '.. py:attribute:: foo')
+
+
 class UsageTests(unittest.TestCase):
 
     def test_create(self):
@@ -710,3 +777,114 @@ class UsageTests(unittest.TestCase):
                                '        for i in range(100):',
                                '            print(i)',
                                ''])
+
+
+class RstRendererTests(unittest.TestCase):
+
+    def make_tree(self):
+        node = Node(indent=4, lines=['A paragraph.'])
+        raises = Raises(4)
+        raises.children.append(Except(4, 'ValueError'))
+        raises.children[0].children.append(Node(indent=8, lines=['If bad.']))
+        node.children.append(raises)
+        return node
+
+    def test_render_to_list(self):
+        result = []
+        RstRenderer(result).render(self.make_tree())
+        self.assertEqual(result, ['    A paragraph.',
+                                  '    :raises:',
+                                  '    ValueError - If bad.',
+                                  ''])
+
+    def test_render_to_stream(self):
+        stream = io.StringIO()
+        RstRenderer(stream).render(self.make_tree())
+        self.assertEqual(stream.getvalue(), '\n'.join(self.make_tree().render_rst()) + '\n')
+
+    def test_shared_sink(self):
+        result = []
+        renderer = RstRenderer(result)
+        renderer.render(Node(indent=0, lines=['First']))
+        renderer.render(Node(indent=0, lines=['Second']))
+        self.assertEqual(result, ['First', 'Second'])
+
+    def test_deep_nesting(self):
+        depth = sys.getrecursionlimit() * 2
+        root = Node()
+        node = root
+        for level in range(depth):
+            child = Node(indent=level, lines=['x'], parent=node)
+            node.add_child(child)
+            node = child
+        result = []
+        RstRenderer(result).render(root)
+        self.assertEqual(len(result), depth)
+        self.assertEqual(result[-1], ' ' * (depth - 1) + 'x')
+
+
+class ArenaTests(unittest.TestCase):
+
+    def test_create_empty(self):
+        arena = Arena()
+        self.assertEqual(len(arena), 0)
+
+    def test_add_root(self):
+        arena = Arena()
+        root = arena.add(NODE, 0)
+        self.assertEqual(root, 0)
+        self.assertEqual(arena.parent[root], NIL)
+        self.assertEqual(list(arena.children(root)), [])
+
+    def test_add_children(self):
+        arena = Arena()
+        root = arena.add(NODE, 0)
+        child_a = arena.add(NODE, 4, root, ['First'])
+        child_b = arena.add(ARG, 4, root, name='b', type='int')
+        self.assertEqual(list(arena.children(root)), [child_a, child_b])
+        self.assertEqual(arena.lines(child_a), ['First'])
+        self.assertEqual(arena.text(arena.name[child_b]), 'b')
+        self.assertEqual(arena.text(arena.type[child_b]), 'int')
+        self.assertIsNone(arena.text(arena.type[child_a]))
+
+    def test_move_children(self):
+        arena = Arena()
+        root = arena.add(NODE, 0)
+        source = arena.add(NODE, 4, root, ['Source'])
+        destination = arena.add(NODE, 4, root, ['Destination'])
+        existing = arena.add(NODE, 8, destination, ['Existing'])
+        moved_a = arena.add(NODE, 8, source, ['A'])
+        moved_b = arena.add(NODE, 8, source, ['B'])
+        arena.move_children(source, destination)
+        self.assertEqual(list(arena.children(source)), [])
+        self.assertEqual(list(arena.children(destination)), [existing, moved_a, moved_b])
+        self.assertEqual(arena.parent[moved_b], destination)
+
+    def test_round_trip(self):
+        root = Node()
+        node = Node(indent=4, lines=['A paragraph.'], parent=root)
+        root.add_child(node)
+        arg = Arg(4, 'x')
+        arg.type = 'int'
+        arg.children.append(Node(indent=8, lines=['The x.']))
+        node.children.append(arg)
+        returns = Returns(4)
+        returns.line = 'Something.'
+        node.children.append(returns)
+        raises = Raises(4)
+        raises.children.append(Except(4, 'ValueError'))
+        node.children.append(raises)
+        copy = Arena.from_node(root).to_node()
+        self.assertEqual(repr(copy), repr(root))
+        self.assertEqual(copy.render_rst(), root.render_rst())
+        self.assertIs(copy.children[0].parent, copy)
+
+    def test_render_from_index(self):
+        arena = Arena()
+        root = arena.add(NODE, 0)
+        arena.add(NODE, 0, root, ['Skipped'])
+        child = arena.add(NODE, 4, root, ['Rendered'])
+        arena.add(NODE, 8, child, ['Nested'])
+        result = []
+        RstRenderer(result).render(arena, child)
+        self.assertEqual(result, ['    Rendered', '        Nested'])
@@ -1,5 +1,21 @@
+import gc
+import io
+import random
+import sys
+import time
 import unittest
-from cartouche.parser import first_paragraph_indent, gather_lines, unindent
+from cartouche.parser import (CartoucheParser, make_sections, first_paragraph_indent, gather_lines, unindent,
+                              pad_blank_lines, determine_opening_indent,
+                              iter_paragraphs, group_paragraphs,
+                              group_paragraphs_in_arena, extract_structure,
+                              parse_cartouche_text, SectionRegistry,
+                              AdmonitionConverter, configure_sections,
+                              convert_args, opening_paragraph, summaries_only,
+                              summaries_only_requested, rewrite_autodoc,
+                              parse_many, CartoucheSyntaxError, CartoucheLimitError)
+from cartouche.diagnostics import Diagnostics, ERROR
+from cartouche.errors import CartoucheError
+from cartouche.nodes import Arena, RstRenderer
 
 __author__ = 'Robert Smallshire'
 
@@ -262,3 +278,578 @@ class GatherLinesTests(unittest.TestCase):
                          'Fifth line'])]
         actual = gather_lines(source)
         self.assertEqual(actual, expected)
+
+
+def staged_paragraphs(lines):
+    return gather_lines(first_paragraph_indent(pad_blank_lines(unindent(lines))))
+
+
+class DetermineOpeningIndentTests(unittest.TestCase):
+
+    def test_consumes_only_two_lines(self):
+        source = iter([(0, "The first line"),
+                       (4, "The second line"),
+                       (8, "The third line")])
+        self.assertEqual(determine_opening_indent(source), 4)
+        self.assertEqual(list(source), [(8, "The third line")])
+
+
+class IterParagraphsTests(unittest.TestCase):
+
+    def test_empty(self):
+        self.assertEqual(list(iter_paragraphs([])), [])
+
+    def test_is_lazy(self):
+        def source():
+            yield "First line"
+            yield "    Second line"
+            yield ""
+            yield "    Fourth line"
+            raise AssertionError("Read beyond the first paragraph")
+        paragraphs = iter_paragraphs(source())
+        self.assertEqual(next(paragraphs), (4, ["First line", "Second line", ""]))
+
+    def test_blank_lines(self):
+        source = ["First line",
+                  "    ",
+                  "    Third line",
+                  "",
+                  "",
+                  "        Sixth line",
+                  ""]
+        self.assertEqual(list(iter_paragraphs(source)), staged_paragraphs(source))
+
+    def test_matches_staged_pipeline(self):
+        generator = random.Random(1729)
+        fragments = ["", "  ", "Text", "Args:", "x: y", "\tTabbed"]
+        for _ in range(2000):
+            source = [' ' * generator.choice([0, 0, 2, 4, 8]) + generator.choice(fragments)
+                      for _ in range(generator.randint(0, 8))]
+            self.assertEqual(list(iter_paragraphs(source)), staged_paragraphs(source),
+                             msg=repr(source))
+
+
+def random_docstrings(seed, count):
+    generator = random.Random(seed)
+    fragments = ["", "Text", "Args:", "Returns: A value", "Raises:",
+                 "Note: Noted", "x (int): An x", "ValueError: Bad"]
+    for _ in range(count):
+        yield [' ' * generator.choice([0, 4, 4, 8, 12]) + generator.choice(fragments)
+               for _ in range(generator.randint(0, 10))]
+
+
+class GroupParagraphsInArenaTests(unittest.TestCase):
+
+    def test_empty(self):
+        arena = group_paragraphs_in_arena([])
+        self.assertEqual(len(arena), 1)
+        self.assertEqual(list(arena.children(0)), [])
+
+    def test_texts_are_lines(self):
+        source = ["First line", "", "    Second line"]
+        arena = group_paragraphs_in_arena(iter_paragraphs(source))
+        self.assertEqual(arena.texts, ["First line", "", "Second line"])
+
+    def test_matches_group_paragraphs(self):
+        for source in random_docstrings(1, 1000):
+            expected = group_paragraphs(iter_paragraphs(source))
+            actual = group_paragraphs_in_arena(iter_paragraphs(source)).to_node()
+            self.assertEqual(repr(actual), repr(expected), msg=repr(source))
+
+
+class ExtractStructureTests(unittest.TestCase):
+
+    def test_node_and_arena_agree(self):
+        for source in random_docstrings(2, 1000):
+            expected = []
+            try:
+                RstRenderer(expected).render(
+                    extract_structure(group_paragraphs_in_arena(iter_paragraphs(source))))
+            except Exception:
+                continue
+            if expected and expected[-1].strip():
+                expected.append('')
+            syntax_tree = extract_structure(group_paragraphs(iter_paragraphs(source)))
+            self.assertNotIsInstance(syntax_tree, Arena)
+            actual = syntax_tree.render_rst()
+            if actual and actual[-1].strip():
+                actual.append('')
+            self.assertEqual(actual, expected, msg=repr(source))
+
+    def test_deep_nesting(self):
+        depth = sys.getrecursionlimit() * 2
+        source = [' ' * level + 'Level' for level in range(depth)]
+        result = parse_cartouche_text(source)
+        self.assertEqual(len(result), depth + 1)
+
+
+class SectionRegistryTests(unittest.TestCase):
+
+    def test_lookup(self):
+        registry = SectionRegistry({'Args': convert_args})
+        self.assertIs(registry.lookup('Args'), convert_args)
+        self.assertIsNone(registry.lookup('Arguments'))
+
+    def test_alias(self):
+        registry = SectionRegistry({'Args': convert_args})
+        registry.alias('Parameters', 'Args')
+        self.assertIs(registry.lookup('Parameters'), convert_args)
+
+    def test_alias_unknown(self):
+        registry = SectionRegistry()
+        self.assertRaises(CartoucheError, registry.alias, 'Parameters', 'Args')
+
+    def test_copy_is_independent(self):
+        registry = SectionRegistry({'Args': convert_args})
+        copy = registry.copy()
+        copy.alias('Parameters', 'Args')
+        self.assertNotIn('Parameters', registry)
+
+    def test_fingerprint_describes_converters(self):
+        registry = SectionRegistry({'Args': convert_args,
+                                    'See Also': AdmonitionConverter('seealso')})
+        self.assertEqual(registry.fingerprint(),
+                         ('Args=cartouche.parser.convert_args',
+                          "See Also=AdmonitionConverter('seealso')"))
+
+
+class ConfigureSectionsTests(unittest.TestCase):
+
+    def tearDown(self):
+        configure_sections()
+
+    def test_alias(self):
+        configure_sections(aliases={'Parameters': 'Args', 'Return': 'Returns'})
+        source = ["Do something.",
+                  "",
+                  "Parameters:",
+                  "    x: The x.",
+                  "",
+                  "Return:",
+                  "    The result."]
+        self.assertEqual(parse_cartouche_text(source),
+                         ["Do something.",
+                          "",
+                          ":param x: The x.",
+                          "",
+                          ":returns: The result.",
+                          ""])
+
+    def test_admonition(self):
+        configure_sections(admonitions={'See Also': 'seealso'})
+        source = ["Do something.",
+                  "",
+                  "See Also: Something else."]
+        self.assertEqual(parse_cartouche_text(source),
+                         ["Do something.",
+                          "",
+                          ".. seealso::",
+                          "",
+                          "    Something else.",
+                          ""])
+
+    def test_reset(self):
+        configure_sections(aliases={'Parameters': 'Args'})
+        configure_sections()
+        source = ["Parameters:", "", "    x: The x."]
+        self.assertEqual(parse_cartouche_text(source),
+                         ["Parameters:", "", "    x: The x.", ""])
+
+    def test_yields_without_space(self):
+        source = ["Yields:Values."]
+        self.assertEqual(parse_cartouche_text(source),
+                         [":returns: Values.", ""])
+
+
+class IsPlainTests(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = CartoucheParser()
+
+    def test_plain(self):
+        self.assertTrue(self.parser.is_plain(["Summary.", "", "Body: with a colon.", ""]))
+
+    def test_section(self):
+        self.assertFalse(self.parser.is_plain(["Summary.", "", "Returns:", "    Nothing.", ""]))
+
+    def test_indented_section(self):
+        self.assertFalse(self.parser.is_plain(["Summary.", "", "    Args:", "        x: The x."]))
+
+    def test_alias(self):
+        source = ["Summary.", "", "Parameters:", "    x: The x.", ""]
+        self.assertTrue(self.parser.is_plain(source))
+        parser = CartoucheParser(sections=make_sections(aliases={'Parameters': 'Args'}))
+        self.assertFalse(parser.is_plain(source))
+
+    def test_indented_second_line(self):
+        self.assertFalse(self.parser.is_plain(["Summary.", "    Continued."]))
+
+    def test_tab(self):
+        self.assertFalse(self.parser.is_plain(["Summary.", "", "\tIndented."]))
+
+    def test_parse_plain_adds_terminal_blank(self):
+        source = ["Summary.", "", "Body."]
+        result = self.parser.parse(source)
+        self.assertEqual(result, ["Summary.", "", "Body.", ""])
+        self.assertEqual(source, ["Summary.", "", "Body."])
+
+
+class SummariesOnlyTests(unittest.TestCase):
+
+    source = ["Fetch rows.", "", "Args:", "    table: An open table.", ""]
+
+    def test_opening_paragraph(self):
+        self.assertEqual(opening_paragraph(["", "Fetch rows", "from a table.", "", "Body."]),
+                         ["Fetch rows", "from a table."])
+
+    def test_indented_opening_paragraph(self):
+        self.assertIsNone(opening_paragraph(["    Fetch rows.", ""]))
+
+    def test_no_opening_paragraph(self):
+        self.assertIsNone(opening_paragraph(["", ""]))
+
+    def test_requested_within_scope(self):
+        self.assertFalse(summaries_only_requested())
+        with summaries_only():
+            self.assertTrue(summaries_only_requested())
+        self.assertFalse(summaries_only_requested())
+
+    def test_converts_only_summary(self):
+        lines = list(self.source)
+        with summaries_only():
+            rewrite_autodoc(None, 'function', 'fetch', None, None, lines)
+        self.assertEqual(lines, ["Fetch rows.", ""])
+
+    def test_summary_agrees_with_full_conversion(self):
+        lines = list(self.source)
+        rewrite_autodoc(None, 'function', 'fetch', None, None, lines)
+        self.assertEqual(lines[:lines.index("")], ["Fetch rows."])
+
+    def test_sectioned_summary_converted_in_full(self):
+        lines = ["Args:", "    table: An open table.", ""]
+        with summaries_only():
+            rewrite_autodoc(None, 'function', 'fetch', None, None, lines)
+        self.assertEqual(lines, parse_cartouche_text(["Args:", "    table: An open table.", ""]))
+
+
+class ReferenceCycleTests(unittest.TestCase):
+    '''Parse and syntax trees should be freed by reference counting alone,
+    leaving nothing for the cyclic garbage collector.'''
+
+    docstrings = [["Summary number {i}.".format(i=i),
+                   "",
+                   "    A description.",
+                   "",
+                   "    Args:",
+                   "        x (int): The x.",
+                   "        y: The y, which is described",
+                   "            over two lines.",
+                   "",
+                   "    Attributes:",
+                   "        z (str): The z.",
+                   "",
+                   "    Raises:",
+                   "        ValueError: If x is negative.",
+                   "",
+                   "    Returns:",
+                   "        The sum.",
+                   ""] for i in range(1000)]
+
+    def cartouche_garbage(self, function):
+        gc.collect()
+        gc.disable()
+        gc.set_debug(gc.DEBUG_SAVEALL)
+        try:
+            function()
+            gc.collect()
+            garbage = [obj for obj in gc.garbage
+                       if type(obj).__module__.startswith('cartouche')]
+        finally:
+            del gc.garbage[:]
+            gc.set_debug(0)
+            gc.enable()
+        return garbage
+
+    def test_batch_parse_leaves_no_garbage(self):
+        parse = lambda: list(parse_many(self.docstrings, workers=1))
+        self.assertEqual(self.cartouche_garbage(parse), [])
+
+    def test_rewrite_autodoc_leaves_no_garbage(self):
+        def rewrite():
+            for docstring in self.docstrings:
+                rewrite_autodoc(None, 'function', 'f', None, None, list(docstring))
+        self.assertEqual(self.cartouche_garbage(rewrite), [])
+
+    def test_node_trees_leave_no_garbage(self):
+        def structure():
+            for docstring in self.docstrings[:100]:
+                extract_structure(group_paragraphs(iter_paragraphs(docstring))).render_rst()
+        self.assertEqual(self.cartouche_garbage(structure), [])
+
+
+class RecoverTests(unittest.TestCase):
+
+    source = ["Do it badly.",
+              "",
+              "Args:",
+              "    this is wrong",
+              "    x: The x.",
+              "",
+              "Raises:",
+              "    ValueError: If x is negative.",
+              ""]
+
+    def test_strict_parser_raises(self):
+        with self.assertRaises(CartoucheSyntaxError) as context:
+            CartoucheParser().parse(self.source)
+        self.assertEqual(context.exception.text, "this is wrong")
+
+    def test_malformed_section_left_as_plain_text(self):
+        diagnostics = Diagnostics()
+        result = CartoucheParser(recover=True).parse(self.source, diagnostics)
+        self.assertEqual(result, ["Do it badly.",
+                                  "",
+                                  "Args:",
+                                  "    this is wrong",
+                                  "    x: The x.",
+                                  "    ",
+                                  ":raises:",
+                                  "    ValueError - If x is negative.",
+                                  ""])
+        errors = diagnostics.errors()
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors[0].subject, "this is wrong")
+        self.assertEqual(errors[0].level, ERROR)
+
+    def test_every_malformed_section_reported(self):
+        source = ["Do it.", "", "Args:", "    wrong", "", "Raises:", "    also wrong",
+                  "", "Attributes:", "    still wrong", ""]
+        diagnostics = Diagnostics()
+        CartoucheParser(recover=True).parse(source, diagnostics)
+        self.assertEqual([error.subject for error in diagnostics.errors()],
+                         ["wrong", "also wrong", "still wrong"])
+
+    def test_failed_conversion_leaves_arena_unchanged(self):
+        parser = CartoucheParser()
+        for source in (self.source,
+                       ["Do it.", "", "Raises:", "    ValueError: Bad.", "    wrong", ""],
+                       ["Do it.", "", "Attributes:", "    a: The a.", "    wrong", ""]):
+            arena = group_paragraphs_in_arena(iter_paragraphs(source))
+            index = arena.first_child[0]
+            while parser.sections.lookup(arena.texts[arena.line_start[index]].partition(':')[0]) is None:
+                index = arena.next_sibling[index]
+            expected = [list(column) for column in (arena.kind, arena.indent, arena.parent,
+                                                    arena.first_child, arena.last_child,
+                                                    arena.next_sibling, arena.line_end)]
+            with self.assertRaises(CartoucheSyntaxError):
+                parser.convert_node(arena, index)
+            actual = [list(column) for column in (arena.kind, arena.indent, arena.parent,
+                                                  arena.first_child, arena.last_child,
+                                                  arena.next_sibling, arena.line_end)]
+            self.assertEqual(actual, expected)
+
+    def test_recovery_is_part_of_configuration(self):
+        self.assertNotEqual(CartoucheParser().configuration(),
+                            CartoucheParser(recover=True).configuration())
+        self.assertTrue(CartoucheParser(recover=True).replace(bulleted_args=True).recover)
+
+
+class LimitTests(unittest.TestCase):
+
+    source = ["Do it.",
+              "",
+              "Args:",
+              "    x: The x,",
+              "        which is described at length.",
+              ""]
+
+    def test_within_limits(self):
+        parser = CartoucheParser(max_lines=len(self.source), max_depth=3, max_time=60)
+        self.assertEqual(parser.parse(self.source), CartoucheParser().parse(self.source))
+
+    def test_too_many_lines(self):
+        with self.assertRaises(CartoucheLimitError):
+            CartoucheParser(max_lines=5).parse(self.source)
+
+    def test_too_deep(self):
+        with self.assertRaises(CartoucheLimitError):
+            CartoucheParser(max_depth=2).parse(self.source)
+
+    def test_too_slow(self):
+        with self.assertRaises(CartoucheLimitError):
+            CartoucheParser(max_time=-1).parse(self.source)
+
+    def test_plain_docstrings_are_not_limited(self):
+        lines = ["Line {0}.".format(i) for i in range(100)]
+        self.assertEqual(CartoucheParser(max_lines=10).parse(lines), lines + [""])
+
+    def test_limits_are_not_part_of_configuration(self):
+        self.assertEqual(CartoucheParser().configuration(),
+                         CartoucheParser(max_lines=10, max_depth=4, max_time=1).configuration())
+        self.assertEqual(CartoucheParser(max_lines=10).replace(recover=True).max_lines, 10)
+
+    def test_parse_many_passes_through(self):
+        result, = parse_many([self.source], workers=1, parser=CartoucheParser(max_lines=5))
+        self.assertEqual(result.lines, self.source)
+        self.assertIsNone(result.error)
+        self.assertIn("more than the limit of 5", result.diagnostics[0].message)
+
+    def test_rewrite_autodoc_passes_through_with_warning(self):
+        class Application(object):
+            cartouche_parser = CartoucheParser(max_depth=2)
+        lines = list(self.source)
+        stderr = sys.stderr
+        sys.stderr = io.StringIO()
+        try:
+            rewrite_autodoc(Application(), 'function', 'module.f', None, None, lines)
+            printed = sys.stderr.getvalue()
+        finally:
+            sys.stderr = stderr
+        self.assertEqual(lines, self.source)
+        self.assertIn("Docstring left unconverted, being nested more than 2 levels deep "
+                      "in docstring for function module.f", printed)
+
+
+class LinearityTests(unittest.TestCase):
+    '''The time taken on adversarial inputs should grow in proportion to
+    their size. Each input is timed at two sizes, and the ratio of the times
+    compared with the ratio of the sizes, with a generous margin since a
+    quadratic algorithm would exceed it many times over.'''
+
+    def assertLinear(self, make_input, function, small=2000, scale=8):
+        def best_time(size):
+            argument = make_input(size)
+            timings = []
+            for _ in range(5):
+                start = time.perf_counter()
+                function(argument)
+                timings.append(time.perf_counter() - start)
+            return min(timings), sum(map(len, argument)) if isinstance(argument, list) else len(argument)
+        small_time, small_size = best_time(small)
+        large_time, large_size = best_time(small * scale)
+        self.assertLess(large_time / small_time, 3 * large_size / small_size)
+
+    def test_tree_builder_sawtooth_indents(self):
+        def sawtooth(size):
+            return ["Do it.", ""] + [" " * (i % 200) + "x" for i in range(size)]
+        self.assertLinear(sawtooth, lambda lines: group_paragraphs_in_arena(iter_paragraphs(lines)))
+
+    def test_tree_builder_deep_nesting(self):
+        def staircase(size):
+            return [" " * i + "x" for i in range(size)] + ["y"] * size
+        self.assertLinear(staircase, lambda lines: group_paragraphs_in_arena(iter_paragraphs(lines)),
+                          small=500, scale=3)
+
+    def test_parse_deep_nesting(self):
+        def staircase(size):
+            return ["Do it.", "", "Args:"] + ["    " + " " * i + "x: y" for i in range(size)]
+        self.assertLinear(staircase, CartoucheParser().parse, small=500, scale=3)
+
+    def test_parse_long_tables(self):
+        def table(size):
+            return ["Do it.", "", "Args:", "    x: A table.", ""] + ["        +" + "-+" * 50] * size
+        self.assertLinear(table, CartoucheParser().parse, small=200)
+
+    def test_args_pattern(self):
+        regex = CartoucheParser(bulleted_args=True).args_regex
+        for make_line in (lambda size: "a" * size + " " * size + "(" + "b." * size,
+                          lambda size: "a" * size + " (" + "b" * size + " " * size,
+                          lambda size: "* " + " " * size + "a" * size):
+            self.assertLinear(make_line, regex.match)
+
+    def test_raises_pattern(self):
+        regex = CartoucheParser(bulleted_raises=True).raises_regex
+        for make_line in (lambda size: "a." * size + " " * size + "b",
+                          lambda size: "- " + "." * size + " " * size):
+            self.assertLinear(make_line, regex.match)
+
+    def test_prescan(self):
+        parser = CartoucheParser()
+        self.assertLinear(lambda size: ["x"] + [" " * size] * 10 + ["Args" * size], parser.is_plain)
+
+
+class CompactTests(unittest.TestCase):
+
+    source = ["Do it.",
+              "",
+              "Args:",
+              "    x (int): The x.",
+              "    y (Thing_): The y.",
+              "",
+              "Usage:",
+              "    Like this::",
+              "",
+              "        a = 1",
+              "",
+              "",
+              "        b = 2",
+              "",
+              "Returns:",
+              "    Nothing.",
+              ""]
+
+    def test_compact(self):
+        self.assertEqual(CartoucheParser(compact=True).parse(self.source),
+                         ["Do it.",
+                          "",
+                          ":param int x: The x.",
+                          "",
+                          ":param y: The y.",
+                          ":type y: Thing_",
+                          "",
+                          ".. rubric:: Usage:",
+                          "",
+                          ".. code-block:: python",
+                          "",
+                          "   Like this::",
+                          "   ",
+                          "       a = 1",
+                          "       ",
+                          "       ",
+                          "       b = 2",
+                          "",
+                          ":returns: Nothing.",
+                          ""])
+
+    def test_only_blank_lines_differ_without_types(self):
+        source = [line for line in self.source if not line.startswith("    x ")]
+        non_blank = lambda lines: [line.rstrip() for line in lines if line.strip()]
+        self.assertEqual(non_blank(CartoucheParser(compact=True).parse(source)),
+                         non_blank(CartoucheParser().parse(source)))
+
+    def test_compact_is_part_of_configuration(self):
+        self.assertNotEqual(CartoucheParser().configuration(),
+                            CartoucheParser(compact=True).configuration())
+        self.assertTrue(CartoucheParser(compact=True).replace(recover=True).compact)
+
+
+class AttributesStyleTests(unittest.TestCase):
+
+    source = ["A point.",
+              "",
+              "Attributes:",
+              "    x (float): The x coordinate.",
+              ""]
+
+    def test_fields(self):
+        self.assertEqual(CartoucheParser(attributes_style='fields').parse(self.source),
+                         ["A point.",
+                          "",
+                          ":ivar x: The x coordinate.",
+                          ":vartype x: float",
+                          ""])
+
+    def test_unknown_style(self):
+        with self.assertRaises(CartoucheError):
+            CartoucheParser(attributes_style='list')
+
+    def test_style_is_part_of_configuration(self):
+        configurations = {CartoucheParser().configuration(),
+                          CartoucheParser(index_attributes=True).configuration(),
+                          CartoucheParser(attributes_style='fields').configuration(),
+                          CartoucheParser(attributes_style='table').configuration(),
+                          CartoucheParser(attributes_style='table',
+                                          index_attributes=True).configuration()}
+        self.assertEqual(len(configurations), 4)
+        parser = CartoucheParser(attributes_style='table').replace(compact=True)
+        self.assertEqual((parser.attributes_style, parser.compact), ('table', True))
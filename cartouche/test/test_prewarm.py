@@ -0,0 +1,105 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import cartouche.parser
+from cartouche.cache import ParseMemo, RenderCache
+from cartouche.diagnostics import Diagnostics
+from cartouche.parser import CartoucheParser, parse_cartouche_text
+from cartouche.prewarm import referenced_names, module_source, prewarm, module_docstrings
+
+__author__ = 'Robert Smallshire'
+
+
+CONVERTED = ["Do it.", "", "Args:", "    x: The x.", ""]
+PLAIN = ["Just text.", ""]
+MALFORMED = ["Do it.", "", "Args:", "    Not an argument", ""]
+WARNED = ["Do it.", "", "Args:", "    x:", ""]
+
+
+class ReferencedNamesTests(unittest.TestCase):
+
+    def test_names(self):
+        text = '\n'.join([".. automodule:: package.module",
+                          "   :members:",
+                          "",
+                          ".. currentmodule:: package.other",
+                          "",
+                          "  .. autoclass:: Thing",
+                          ".. py:module:: package.third",
+                          ".. autosummary::",
+                          ".. note:: automodule:: not.a.directive"])
+        self.assertEqual(referenced_names(text),
+                         ["package.module", "package.other", "Thing", "package.third"])
+
+
+class ModuleSourceTests(unittest.TestCase):
+
+    def test_module(self):
+        self.assertEqual(module_source('cartouche.parser'), cartouche.parser.__file__)
+
+    def test_object_within_module(self):
+        self.assertEqual(module_source('cartouche.parser.CartoucheParser.parse'),
+                         cartouche.parser.__file__)
+
+    def test_unknown(self):
+        self.assertIsNone(module_source('no_such_module_for_cartouche.thing'))
+
+
+class PrewarmTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_fills_memo(self):
+        memo = ParseMemo()
+        parser = CartoucheParser()
+        converted, cached = prewarm([CONVERTED, PLAIN, MALFORMED, WARNED, list(CONVERTED)],
+                                    parser, memo=memo)
+        self.assertEqual((converted, cached), (2, 0))
+        self.assertEqual(memo.get(CONVERTED), parse_cartouche_text(CONVERTED))
+        self.assertIsNone(memo.get(PLAIN))
+        self.assertIsNone(memo.get(MALFORMED))
+        diagnostics = Diagnostics()
+        memo.get(WARNED, diagnostics=diagnostics)
+        self.assertEqual(len(diagnostics), 1)
+
+    def test_skips_docstrings_exceeding_limits(self):
+        memo = ParseMemo()
+        converted, cached = prewarm([CONVERTED], CartoucheParser(max_lines=2), memo=memo)
+        self.assertEqual((converted, cached), (0, 0))
+        self.assertEqual(len(memo), 0)
+
+    def test_fills_cache(self):
+        parser = CartoucheParser()
+        cache = RenderCache(self.directory)
+        self.assertEqual(prewarm([CONVERTED], parser, cache=cache), (1, 0))
+        memo = ParseMemo()
+        self.assertEqual(prewarm([CONVERTED], parser, memo=memo, cache=cache), (0, 1))
+        self.assertEqual(memo.get(CONVERTED), parse_cartouche_text(CONVERTED))
+
+    def test_module_docstrings(self):
+        path = os.path.join(self.directory, 'module.py')
+        with open(path, 'w') as source_file:
+            source_file.write('def f(x):\n    """Do it.\n\n    Args:\n        x: The x.\n    """\n')
+        broken = os.path.join(self.directory, 'broken.py')
+        with open(broken, 'w') as source_file:
+            source_file.write('def f(:\n')
+        self.assertEqual(list(module_docstrings([broken, path], workers=1)), [CONVERTED])
+
+    def test_copies_from_sidecars(self):
+        from cartouche.parser import ParseResult
+        from cartouche.sidecar import Sidecar, SidecarWriter
+        parser = CartoucheParser()
+        path = os.path.join(self.directory, 'cartouche.sidecar')
+        writer = SidecarWriter(parser)
+        writer.add(CONVERTED, ParseResult(["Shipped.", ""], None))
+        writer.write(path)
+        memo = ParseMemo()
+        with Sidecar(path) as sidecar:
+            self.assertEqual(prewarm([CONVERTED], parser, memo=memo, sidecars=[sidecar]), (0, 1))
+        self.assertEqual(memo.get(CONVERTED), ["Shipped.", ""])
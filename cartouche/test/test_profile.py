@@ -0,0 +1,83 @@
+import json
+import unittest
+
+from cartouche.parser import CartoucheParser
+from cartouche.profile import Profile, ProfilingParser, STAGES, bucket
+
+__author__ = 'Robert Smallshire'
+
+
+class BucketTests(unittest.TestCase):
+
+    def test_zero(self):
+        self.assertEqual(bucket(0), 0)
+
+    def test_powers_of_two(self):
+        self.assertEqual(bucket(1), 1)
+        self.assertEqual(bucket(3), 2)
+        self.assertEqual(bucket(4), 3)
+        self.assertEqual(bucket(1000), 10)
+
+
+class ProfileTests(unittest.TestCase):
+
+    def test_record(self):
+        profile = Profile()
+        profile.record('a.f', 0.001)
+        profile.record('a.g', 0.002)
+        self.assertEqual(profile.docstrings, 2)
+        self.assertAlmostEqual(profile.total_time, 0.003)
+        self.assertEqual(sum(profile.latencies.values()), 2)
+
+    def test_slowest(self):
+        profile = Profile(num_slowest=2)
+        for i, name in enumerate(['a', 'b', 'c', 'd']):
+            profile.record(name, (i * 7) % 4)
+        self.assertEqual(sorted(profile.slowest, reverse=True), [(3, 'b'), (2, 'c')])
+
+    def test_merge(self):
+        first = Profile(num_slowest=2)
+        first.record('a', 1.0)
+        first.record_parse((0.1, 0.2, 0.3, 0.4), 5)
+        second = Profile(num_slowest=2)
+        second.record('b', 3.0)
+        second.record('c', 2.0)
+        second.record_parse((0.1, 0.2, 0.3, 0.4), 50)
+        first.merge(second)
+        self.assertEqual(first.docstrings, 3)
+        self.assertEqual(first.parsed, 2)
+        self.assertAlmostEqual(first.stage_times['render'], 0.8)
+        self.assertEqual(first.tree_sizes, {bucket(5): 1, bucket(50): 1})
+        self.assertEqual(sorted(first.slowest, reverse=True), [(3.0, 'b'), (2.0, 'c')])
+
+    def test_as_dict_is_serialisable(self):
+        profile = Profile()
+        profile.record('a', 0.0005)
+        profile.record_parse((0.1, 0.2, 0.3, 0.4), 5)
+        record = json.loads(json.dumps(profile.as_dict()))
+        self.assertEqual(record['latency_histogram'], [dict(below_microseconds=512, count=1)])
+        self.assertEqual(record['tree_size_histogram'], [dict(below_nodes=8, count=1)])
+        self.assertEqual(record['slowest'], [dict(name='a', seconds=0.0005)])
+        self.assertEqual(set(record['stage_seconds']), set(STAGES))
+
+
+class ProfilingParserTests(unittest.TestCase):
+
+    source = """Fetches rows from a Bigtable.
+
+        Args:
+            big_table: An open Bigtable Table instance.
+
+        Returns:
+            A dict mapping keys to the corresponding table row data.
+        """.splitlines()
+
+    def test_same_result(self):
+        parser = CartoucheParser()
+        profile = Profile()
+        result = ProfilingParser(parser, profile).parse(self.source)
+        self.assertEqual(result, parser.parse(self.source))
+        self.assertEqual(profile.parsed, 1)
+        self.assertEqual(sum(profile.tree_sizes.values()), 1)
+        self.assertEqual(ProfilingParser(parser, profile).configuration(),
+                         parser.configuration())
@@ -0,0 +1,179 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from cartouche.cache import RenderCache, ParseMemo, render_digest
+from cartouche.diagnostics import Diagnostics
+from cartouche.parser import (CartoucheParser, ParseResult, parse_many, parse_sidecars,
+                              parse_memoized, parse_cartouche_text)
+from cartouche.sidecar import Sidecar, SidecarWriter, sidecar_path, SIDECAR_FILENAME
+
+__author__ = 'Robert Smallshire'
+
+
+CONVERTED = ["Do it.", "", "Args:", "    x: The x.", ""]
+OTHER = ["Do that.", "", "Returns:", "    Nothing.", ""]
+PLAIN = ["Just text.", ""]
+MALFORMED = ["Do it.", "", "Args:", "    Not an argument", ""]
+WARNED = ["Do it.", "", "Args:", "    x:", ""]
+
+
+class Environment(object):
+
+    def __init__(self):
+        self.docname = 'index'
+        self.cartouche_stats = {}
+
+
+class SidecarTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, SIDECAR_FILENAME)
+        self.parser = CartoucheParser()
+        self.configuration = self.parser.configuration()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, docstrings, parser=None):
+        parser = parser or self.parser
+        writer = SidecarWriter(parser)
+        for lines, result in zip(docstrings, parse_many(docstrings, workers=1, parser=parser)):
+            writer.add(lines, result)
+        writer.write(self.path)
+        return writer
+
+    def test_get(self):
+        self.write([CONVERTED, OTHER])
+        with Sidecar(self.path) as sidecar:
+            self.assertEqual(len(sidecar), 2)
+            for lines in (CONVERTED, OTHER):
+                self.assertEqual(sidecar.get(render_digest(lines, self.configuration)),
+                                 parse_cartouche_text(lines))
+
+    def test_get_missing(self):
+        self.write([CONVERTED])
+        with Sidecar(self.path) as sidecar:
+            self.assertIsNone(sidecar.get(render_digest(OTHER, self.configuration)))
+            self.assertIsNone(sidecar.get(render_digest(CONVERTED, ('other',))))
+
+    def test_empty(self):
+        self.write([])
+        with Sidecar(self.path) as sidecar:
+            self.assertEqual(len(sidecar), 0)
+            self.assertIsNone(sidecar.get(render_digest(CONVERTED, self.configuration)))
+
+    def test_matches(self):
+        self.write([CONVERTED])
+        with Sidecar(self.path) as sidecar:
+            self.assertTrue(sidecar.matches(self.configuration))
+            self.assertFalse(sidecar.matches(CartoucheParser(compact=True).configuration()))
+
+    def test_diagnostics(self):
+        self.write([WARNED])
+        diagnostics = Diagnostics()
+        with Sidecar(self.path) as sidecar:
+            sidecar.get(render_digest(WARNED, self.configuration), diagnostics)
+        self.assertEqual(len(diagnostics), 1)
+
+    def test_skips(self):
+        writer = self.write([PLAIN, MALFORMED])
+        self.assertEqual(len(writer), 0)
+        limited = SidecarWriter(self.parser)
+        self.assertFalse(limited.add(CONVERTED, ParseResult(CONVERTED, None, (), True)))
+
+    def test_many(self):
+        docstrings = [["Do thing {0}.".format(i), "", "Returns:", "    Nothing.", ""]
+                      for i in range(500)]
+        self.write(docstrings)
+        with Sidecar(self.path) as sidecar:
+            for lines in docstrings:
+                self.assertEqual(sidecar.get(render_digest(lines, self.configuration)),
+                                 parse_cartouche_text(lines))
+
+    def test_not_a_sidecar(self):
+        for contents in (b'', b'CARTSIDE', b'Not a sidecar at all'):
+            with open(self.path, 'wb') as sidecar_file:
+                sidecar_file.write(contents)
+            with self.assertRaises(ValueError):
+                Sidecar(self.path)
+
+    def test_truncated(self):
+        self.write([CONVERTED, OTHER])
+        with open(self.path, 'r+b') as sidecar_file:
+            sidecar_file.truncate(30)
+        with self.assertRaises(ValueError):
+            Sidecar(self.path)
+
+
+class SidecarPathTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        package = os.path.join(self.directory, 'cartouche_sidecar_package')
+        os.mkdir(package)
+        open(os.path.join(package, '__init__.py'), 'w').close()
+        self.path = os.path.join(package, SIDECAR_FILENAME)
+        open(self.path, 'w').close()
+        sys.path.insert(0, self.directory)
+
+    def tearDown(self):
+        sys.path.remove(self.directory)
+        shutil.rmtree(self.directory)
+
+    def test_path(self):
+        self.assertEqual(sidecar_path(os.path.join('cartouche_sidecar_package', SIDECAR_FILENAME),
+                                      self.directory),
+                         os.path.join(self.directory, 'cartouche_sidecar_package', SIDECAR_FILENAME))
+
+    def test_package(self):
+        self.assertEqual(os.path.realpath(sidecar_path('cartouche_sidecar_package')),
+                         os.path.realpath(self.path))
+
+    def test_unknown(self):
+        self.assertIsNone(sidecar_path('no_such_package_for_cartouche'))
+        self.assertIsNone(sidecar_path('cartouche.parser'))
+
+
+class ParseSidecarsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        path = os.path.join(self.directory, SIDECAR_FILENAME)
+        writer = SidecarWriter(CartoucheParser())
+        writer.add(CONVERTED, ParseResult(["Shipped.", ""], None))
+        writer.write(path)
+        self.sidecar = Sidecar(path)
+
+    def tearDown(self):
+        self.sidecar.close()
+        shutil.rmtree(self.directory)
+
+    def test_hit(self):
+        env = Environment()
+        self.assertEqual(parse_sidecars([self.sidecar], CONVERTED, env), ["Shipped.", ""])
+        self.assertEqual(env.cartouche_stats['index']['sidecar_hits'], 1)
+
+    def test_miss_parses(self):
+        env = Environment()
+        self.assertEqual(parse_sidecars([self.sidecar], OTHER, env), parse_cartouche_text(OTHER))
+        self.assertEqual(env.cartouche_stats['index']['sidecar_misses'], 1)
+
+    def test_miss_consults_cache(self):
+        cache = RenderCache(os.path.join(self.directory, 'cache'))
+        parse_sidecars([self.sidecar], OTHER, cache=cache)
+        self.assertIsNotNone(cache.get(cache.key(OTHER, CartoucheParser().configuration())))
+
+    def test_other_configuration_parses(self):
+        parser = CartoucheParser(compact=True)
+        self.assertEqual(parse_sidecars([self.sidecar], CONVERTED, parser=parser),
+                         parser.parse(CONVERTED))
+
+    def test_memoized(self):
+        memo = ParseMemo()
+        self.assertEqual(parse_memoized(memo, CONVERTED, sidecars=[self.sidecar]),
+                         ["Shipped.", ""])
+        self.assertEqual(memo.get(CONVERTED), ["Shipped.", ""])
@@ -0,0 +1,318 @@
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+from cartouche.cache import ParseMemo
+from cartouche.extract import extract_file
+from cartouche.parser import CartoucheParser
+from cartouche.sidecar import SidecarWriter
+from cartouche.sphinxext import (discard_unchanged_documents, fingerprint, docstring_location,
+                                 report_errors, prewarm_documents, init_sidecars,
+                                 merge_document_records, report_stats)
+
+__author__ = 'Robert Smallshire'
+
+
+class Config(object):
+    cartouche_track_docstrings = True
+
+
+class Environment(object):
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.srcdir = directory
+        self.reread_always = set()
+        self.all_docs = {}
+        self.dependencies = {}
+        self.cartouche_fingerprints = {}
+
+    def doc2path(self, docname):
+        return os.path.join(self.directory, docname + '.rst')
+
+
+class Application(object):
+
+    def __init__(self, env):
+        self.config = Config()
+        self.extensions = {}
+        self.env = env
+        self.cartouche_fingerprint_memo = {}
+
+
+SOURCE = '''def f(x):
+    """Do it.
+
+    Args:
+        x: The x.
+    """
+    return x
+'''
+
+
+class DiscardUnchangedDocumentsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.module = os.path.join(self.directory, 'module.py')
+        self.write(self.module, SOURCE)
+        self.write(os.path.join(self.directory, 'index.rst'), ".. autofunction:: module.f\n")
+        self.env = Environment(self.directory)
+        self.app = Application(self.env)
+        self.env.all_docs['index'] = time.time_ns() // 1000
+        self.env.dependencies['index'] = {self.module}
+        self.env.cartouche_fingerprints['index'] = {self.module: fingerprint(self.app, self.module)}
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, path, text, modified=None):
+        with open(path, 'w') as source_file:
+            source_file.write(text)
+        if modified is not None:
+            os.utime(path, (modified, modified))
+
+    def outdated(self):
+        changed = {'index'}
+        discard_unchanged_documents(self.app, self.env, set(), changed, set())
+        return changed
+
+    def test_implementation_changed(self):
+        self.write(self.module, SOURCE.replace("return x", "return x + 1"), time.time() + 10)
+        self.assertEqual(self.outdated(), set())
+
+    def test_docstring_changed(self):
+        self.write(self.module, SOURCE.replace("The x.", "The ex."), time.time() + 10)
+        self.assertEqual(self.outdated(), {'index'})
+
+    def test_document_changed(self):
+        self.write(os.path.join(self.directory, 'index.rst'), "Changed\n", time.time() + 10)
+        self.assertEqual(self.outdated(), {'index'})
+
+    def test_other_dependency_changed(self):
+        other = os.path.join(self.directory, 'include.txt')
+        self.write(other, "Included\n", time.time() + 10)
+        self.env.dependencies['index'].add(other)
+        self.assertEqual(self.outdated(), {'index'})
+
+    def test_reread_always(self):
+        self.env.reread_always.add('index')
+        self.write(self.module, SOURCE.replace("return x", "return x + 1"), time.time() + 10)
+        self.assertEqual(self.outdated(), {'index'})
+
+
+class IncrementalBuildTests(unittest.TestCase):
+    '''Builds a project twice, as sphinx-build does when its environment is
+    kept between runs.'''
+
+    def setUp(self):
+        # Sphinx caches the analysis of each module by name, for the life of
+        # the process, so each test has a module of its own.
+        self.module_name = 'cartouche_' + self._testMethodName
+        self.directory = tempfile.mkdtemp()
+        self.source_directory = os.path.join(self.directory, 'source')
+        os.mkdir(self.source_directory)
+        self.module = os.path.join(self.directory, self.module_name + '.py')
+        self.write(self.module, SOURCE)
+        self.write(os.path.join(self.source_directory, 'conf.py'),
+                   "extensions = ['sphinx.ext.autodoc', 'cartouche']\n"
+                   "cartouche_track_docstrings = True\n")
+        self.write(os.path.join(self.source_directory, 'index.rst'),
+                   ".. autofunction:: {module}.f\n".format(module=self.module_name))
+        sys.path.insert(0, self.directory)
+
+    def tearDown(self):
+        sys.path.remove(self.directory)
+        sys.modules.pop(self.module_name, None)
+        shutil.rmtree(self.directory)
+
+    def write(self, path, text, modified=None):
+        with open(path, 'w') as source_file:
+            source_file.write(text)
+        if modified is not None:
+            os.utime(path, (modified, modified))
+
+    def build(self):
+        '''Build the project, returning the names of the documents read.'''
+        from sphinx.application import Sphinx
+        # Autodoc is to import the module as it is now
+        sys.modules.pop(self.module_name, None)
+        app = Sphinx(self.source_directory, self.source_directory,
+                     os.path.join(self.directory, 'build'),
+                     os.path.join(self.directory, 'doctrees'),
+                     'dummy', status=None, warning=io.StringIO())
+        read = []
+        app.connect('source-read', lambda app, docname, source: read.append(docname))
+        app.build()
+        return read
+
+    def test_implementation_changed(self):
+        self.assertEqual(self.build(), ['index'])
+        self.write(self.module, SOURCE.replace("return x", "return x + 1"), time.time() + 10)
+        self.assertEqual(self.build(), [])
+
+    def test_docstring_changed(self):
+        self.assertEqual(self.build(), ['index'])
+        self.write(self.module, SOURCE.replace("The x.", "The ex."), time.time() + 10)
+        self.assertEqual(self.build(), ['index'])
+
+
+class DocstringLocationTests(unittest.TestCase):
+
+    def test_source_file(self):
+        self.assertEqual(docstring_location('index', 'pkg/module.py', 'pkg.module.f', 3),
+                         "pkg/module.py:docstring of pkg.module.f:3")
+
+    def test_without_line(self):
+        self.assertEqual(docstring_location('index', 'pkg/module.py', 'pkg.module.f'),
+                         "pkg/module.py:docstring of pkg.module.f")
+
+    def test_unknown_source_file(self):
+        self.assertEqual(docstring_location('index', None, 'pkg.module.f', 3), ('index', None))
+
+
+class ReportErrorsTests(unittest.TestCase):
+
+    def make_app(self, fail_on_error):
+        env = Environment(tempfile.gettempdir())
+        env.cartouche_errors = {'index': {('pkg/module.py', 'pkg.module.f', 4,
+                                           'Cartouche: Invalid argument syntax'): None}}
+        app = Application(env)
+        app.config.cartouche_fail_on_error = fail_on_error
+        app.statuscode = 0
+        return app
+
+    def test_fails_build(self):
+        app = self.make_app(fail_on_error=True)
+        with self.assertLogs('sphinx.cartouche.sphinxext', 'ERROR') as logs:
+            report_errors(app, None)
+        self.assertEqual(app.statuscode, 1)
+        self.assertEqual(len(logs.records), 2)
+
+    def test_reports_without_failing(self):
+        app = self.make_app(fail_on_error=False)
+        with self.assertLogs('sphinx.cartouche.sphinxext', 'WARNING'):
+            report_errors(app, None)
+        self.assertEqual(app.statuscode, 0)
+
+    def test_nothing_to_report(self):
+        app = self.make_app(fail_on_error=True)
+        app.env.cartouche_errors = {}
+        report_errors(app, None)
+        self.assertEqual(app.statuscode, 0)
+
+
+class PrewarmDocumentsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        with open(os.path.join(self.directory, 'index.rst'), 'w') as document:
+            document.write(".. autofunction:: cartouche.fields.split_fields\n")
+        self.env = Environment(self.directory)
+        self.app = Application(self.env)
+        self.app.config.cartouche_prewarm = True
+        self.app.config.cartouche_prewarm_modules = []
+        self.app.config.cartouche_prewarm_workers = 1
+        self.app.config.source_encoding = 'utf-8'
+        self.app.cartouche_parser = CartoucheParser()
+        self.app.cartouche_memo = ParseMemo()
+        self.app.cartouche_cache = None
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_prewarms_referenced_modules(self):
+        import cartouche.fields
+        prewarm_documents(self.app, self.env, ['index'])
+        docstring, = [docstring for docstring in extract_file(cartouche.fields.__file__)
+                      if docstring.name == 'cartouche.fields.split_fields']
+        self.assertIsNotNone(self.app.cartouche_memo.get(docstring.lines))
+
+    def test_disabled(self):
+        self.app.config.cartouche_prewarm = False
+        prewarm_documents(self.app, self.env, ['index'])
+        self.assertEqual(len(self.app.cartouche_memo), 0)
+
+    def test_nowhere_to_store(self):
+        self.app.cartouche_memo = None
+        with self.assertLogs('sphinx.cartouche.sphinxext', 'WARNING'):
+            prewarm_documents(self.app, self.env, ['index'])
+
+
+class InitSidecarsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        SidecarWriter(CartoucheParser()).write(os.path.join(self.directory, 'docs.sidecar'))
+        with open(os.path.join(self.directory, 'broken.sidecar'), 'w') as sidecar_file:
+            sidecar_file.write("Not a sidecar")
+        SidecarWriter(CartoucheParser(compact=True)).write(os.path.join(self.directory,
+                                                                        'compact.sidecar'))
+        self.app = Application(Environment(self.directory))
+        self.app.confdir = self.directory
+        self.app.cartouche_parser = CartoucheParser()
+
+    def tearDown(self):
+        for sidecar in self.app.cartouche_sidecars or ():
+            sidecar.close()
+        shutil.rmtree(self.directory)
+
+    def test_opens_sidecars(self):
+        self.app.config.cartouche_sidecars = ['docs.sidecar']
+        init_sidecars(self.app)
+        self.assertEqual(len(self.app.cartouche_sidecars), 1)
+
+    def test_unusable_sidecars(self):
+        self.app.config.cartouche_sidecars = ['missing.sidecar', 'broken.sidecar']
+        with self.assertLogs('sphinx.cartouche.sphinxext', 'WARNING') as logs:
+            init_sidecars(self.app)
+        self.assertEqual(len(logs.records), 2)
+        self.assertIsNone(self.app.cartouche_sidecars)
+
+    def test_other_configuration(self):
+        self.app.config.cartouche_sidecars = ['compact.sidecar', 'docs.sidecar']
+        with self.assertLogs('sphinx.cartouche.sphinxext', 'WARNING') as logs:
+            init_sidecars(self.app)
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn("compact.sidecar", logs.output[0])
+        self.assertEqual(len(self.app.cartouche_sidecars), 1)
+
+
+class MergeDocumentRecordsTests(unittest.TestCase):
+    '''Parallel read workers are forked with a copy of the records of the
+    main process, which must not be counted again when they are merged.'''
+
+    def test_counts_each_document_once(self):
+        from collections import Counter
+        env = Environment(None)
+        env.cartouche_stats = {'first': Counter(cache_hits=2)}
+        worker = Environment(None)
+        worker.cartouche_stats = {'first': Counter(cache_hits=2),
+                                  'second': Counter(cache_hits=3, cache_misses=1)}
+        app = Application(env)
+        merge_document_records(app, env, ['second'], worker)
+        merge_document_records(app, env, ['third'], worker)
+        self.assertEqual(env.cartouche_stats, {'first': Counter(cache_hits=2),
+                                               'second': Counter(cache_hits=3, cache_misses=1)})
+        app.cartouche_cache = object()
+        app.cartouche_memo = None
+        with self.assertLogs('sphinx.cartouche.sphinxext', 'INFO') as logs:
+            report_stats(app, None)
+        self.assertIn("render cache 5 hits, 1 misses", logs.output[-1])
+
+    def test_memo_reported_verbosely(self):
+        from collections import Counter
+        from sphinx.util.logging import VERBOSE
+        env = Environment(None)
+        env.cartouche_stats = {'first': Counter(memo_hits=2, memo_misses=1)}
+        app = Application(env)
+        app.cartouche_cache = None
+        app.cartouche_memo = object()
+        with self.assertLogs('sphinx.cartouche.sphinxext', VERBOSE) as logs:
+            report_stats(app, None)
+        self.assertEqual([record.levelno for record in logs.records], [VERBOSE])
+        self.assertIn("memo 2 hits, 1 misses", logs.output[-1])
@@ -7,7 +7,7 @@ version = '1.1.2'
 with open('README.txt', 'r') as readme:
     long_description = readme.read()
 
-requires = ['Sphinx>=0.6']
+requires = ['Sphinx>=1.8']
 
 setup(
     name='cartouche',
@@ -29,12 +29,18 @@ setup(
         'License :: OSI Approved :: BSD License',
         'Operating System :: OS Independent',
         'Programming Language :: Python',
-        "Programming Language :: Python :: 2.7",
         "Programming Language :: Python :: 3",
+        "Programming Language :: Python :: 3 :: Only",
+        "Programming Language :: Python :: 3.7",
+        "Programming Language :: Python :: 3.8",
+        "Programming Language :: Python :: 3.9",
+        "Programming Language :: Python :: 3.10",
+        "Programming Language :: Python :: 3.11",
         'Topic :: Documentation',
         'Topic :: Utilities',
     ],
     platforms='any',
+    python_requires='>=3.7',
     #packages=find_packages(),
     include_package_data=True,
     install_requires=requires,